@@ -0,0 +1,235 @@
+"""
+Позиция с картами атак: для каждого цвета хранится число фигур, атакующих каждую клетку.
+Карты обновляются при выполнении и отмене хода только для изменившихся клеток, фигур, стоявших на них,
+и дальнобойных фигур, чьи лучи проходят через эти клетки. Проверки шаха, рокировки через битое поле
+и безопасности короля становятся обращением к массиву
+"""
+from position import Position, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, \
+    KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, RAYS, ORTHOGONAL, DIAGONAL, DIRECTION
+
+
+class AttackMapPosition(Position):
+    """
+    Позиция, поддерживающая карты атак обоих цветов
+
+    :ivar attacks: Число фигур белых и чёрных, атакующих каждую клетку
+    :type attacks: list[bytearray]
+    """
+    __slots__ = ("attacks",)
+
+    def __init__(self):
+        """
+        Создаёт пустую позицию
+        """
+        super().__init__()
+        self.attacks = [bytearray(64), bytearray(64)]
+
+    @classmethod
+    def initial(cls) -> "AttackMapPosition":
+        """
+        Создаёт начальную расстановку фигур
+
+        :returns: Позиция в начале партии
+        """
+        position = super().initial()
+        position.rebuild_attacks()
+        return position
+
+    @classmethod
+    def from_fen(cls, fen) -> "AttackMapPosition":
+        """
+        Создаёт позицию из записи FEN
+
+        :param fen: Запись позиции в нотации Форсайта-Эдвардса
+        :type fen: str
+        :returns: Позиция с картами атак
+        """
+        position = super().from_fen(fen)
+        position.rebuild_attacks()
+        return position
+
+    @classmethod
+    def from_position(cls, position) -> "AttackMapPosition":
+        """
+        Создаёт позицию с картами атак из обычной позиции
+
+        :param position: Исходная позиция
+        :type position: Position
+        :returns: Позиция с картами атак
+        """
+        new = cls()
+        for sq in position.pieces[0] + position.pieces[1]:
+            Position.add_piece(new, sq, position.board[sq])
+        new.side, new.castling, new.ep = position.side, position.castling, position.ep
+        new.halfmove, new.fullmove, new.history = position.halfmove, position.fullmove, position.history[:]
+        new.repetitions = position.repetitions.copy()
+        new.rebuild_attacks()
+        return new
+
+    def copy(self) -> "AttackMapPosition":
+        """
+        Создаёт независимую копию позиции
+
+        :returns: Копия позиции
+        """
+        position = super().copy()
+        position.attacks = [bytearray(self.attacks[0]), bytearray(self.attacks[1])]
+        return position
+
+    def rebuild_attacks(self):
+        """
+        Полностью пересчитывает карты атак (используется только при создании позиции)
+        """
+        self.attacks = [bytearray(64), bytearray(64)]
+        for color in 0, 1:
+            for sq in self.pieces[color]:
+                self._count(sq, 1)
+
+    def piece_attacks(self, sq) -> list:
+        """
+        Перебирает клетки, атакованные фигурой
+
+        :param sq: Клетка фигуры
+        :type sq: int
+        :returns: Атакованные клетки
+        """
+        board = self.board
+        code = board[sq]
+        ptype = code & 7
+        if ptype == PAWN:
+            return PAWN_ATTACKS[code >> 3][sq]
+        if ptype == KNIGHT:
+            return KNIGHT_TARGETS[sq]
+        if ptype == KING:
+            return KING_TARGETS[sq]
+        found = []
+        rays = RAYS[sq]
+        for d in ORTHOGONAL if ptype == ROOK else DIAGONAL if ptype == BISHOP else range(8):
+            for s in rays[d]:
+                found.append(s)
+                if board[s]:
+                    break
+        return found
+
+    def _count(self, sq, delta):
+        counts = self.attacks[self.board[sq] >> 3]
+        for s in self.piece_attacks(sq):
+            counts[s] += delta
+
+    def _sliders_through(self, squares) -> set:
+        board = self.board
+        found = set()
+        for sq in squares:
+            rays = RAYS[sq]
+            for d in range(8):
+                for s in rays[d]:
+                    code = board[s]
+                    if code:
+                        ptype = code & 7
+                        if ptype == QUEEN or ptype == (ROOK if d & 1 == 0 else BISHOP):
+                            found.add(s)
+                        break
+        return found.difference(squares)
+
+    def _before_change(self, squares) -> set:
+        sliders = self._sliders_through(squares)
+        board = self.board
+        for sq in sliders:
+            self._count(sq, -1)
+        for sq in squares:
+            if board[sq]:
+                self._count(sq, -1)
+        return sliders
+
+    def _after_change(self, squares, sliders):
+        board = self.board
+        for sq in sliders:
+            self._count(sq, 1)
+        for sq in squares:
+            if board[sq]:
+                self._count(sq, 1)
+
+    def make(self, move):
+        """
+        Выполняет ход и обновляет карты атак изменившихся клеток
+
+        :param move: Код хода
+        :type move: int
+        """
+        squares = self.changed_squares(move, self.side)
+        sliders = self._before_change(squares)
+        Position.make(self, move)
+        self._after_change(squares, sliders)
+
+    def unmake(self):
+        """
+        Отменяет последний выполненный ход и возвращает карты атак
+        """
+        squares = self.changed_squares(self.history[-1][0], self.side ^ 1)
+        sliders = self._before_change(squares)
+        Position.unmake(self)
+        self._after_change(squares, sliders)
+
+    def set_square(self, sq, name):
+        """
+        Записывает фигуру на клетку по строковому имени и обновляет карты атак
+
+        :param sq: Клетка
+        :type sq: int
+        :param name: Имя фигуры
+        :type name: str
+        """
+        sliders = self._before_change((sq,))
+        try:
+            Position.set_square(self, sq, name)
+        finally:
+            self._after_change((sq,), sliders)
+
+    def is_attacked(self, sq, by) -> bool:
+        """
+        Проверяет, атакована ли клетка фигурами заданного цвета, по карте атак
+
+        :param sq: Клетка
+        :type sq: int
+        :param by: Цвет атакующих фигур
+        :type by: int
+        :returns: True если клетка атакована
+        """
+        return self.attacks[by][sq] > 0
+
+    def attackers(self, sq, by) -> list:
+        """
+        Находит все фигуры заданного цвета, атакующие клетку. Если по карте клетка не атакована, лучи не просматриваются
+
+        :param sq: Клетка
+        :type sq: int
+        :param by: Цвет атакующих фигур
+        :type by: int
+        :returns: Клетки атакующих фигур
+        """
+        if not self.attacks[by][sq]:
+            return []
+        return Position.attackers(self, sq, by)
+
+    def king_moves(self, sq, checkers) -> list:
+        """
+        Генерирует допустимые ходы короля по карте атак. Поле за королём на линии шаха дальнобойной фигуры
+        исключается отдельно, так как на карте оно закрыто самим королём
+
+        :param sq: Клетка короля
+        :type sq: int
+        :param checkers: Клетки фигур, объявивших шах
+        :type checkers: list[int]
+        :returns: Коды ходов короля
+        """
+        board = self.board
+        opp = board[sq] >> 3 ^ 1
+        attacked = self.attacks[opp]
+        behind = []
+        for c in checkers:
+            if board[c] & 7 in (BISHOP, ROOK, QUEEN):
+                ray = RAYS[sq][DIRECTION[c << 6 | sq]]
+                if ray:
+                    behind.append(ray[0])
+        return [sq | t << 6 for t in KING_TARGETS[sq]
+                if not attacked[t] and (board[t] == EMPTY or board[t] >> 3 == opp) and t not in behind]
@@ -0,0 +1,333 @@
+"""
+Замер производительности генерации ходов, отбора допустимых ходов и отрисовки на постоянном наборе позиций:
+дебют, миттельшпиль, эндшпиль и позиции со взятием на проходе, рокировкой и превращением.
+
+Для каждой позиции замеряются find_valid_moves, simulate, make_move (с пересчётом допустимых ходов после хода)
+и полная отрисовка draw_board на новом холсте. Отрисовка выполняется на CountingCanvas, который считает
+созданные элементы и вызовы холста, поэтому число элементов Tk на ход проверяется без дисплея.
+Результаты сохраняются в базовый файл JSON, с которым сравниваются последующие замеры: время считается
+ухудшившимся, если выросло больше чем на threshold, счётчики холста — больше чем на count_threshold.
+
+Запуск: python -m chess bench [--baseline bench_baseline.json] [--save] [--threshold 0.25] [--count-threshold 0]
+"""
+import argparse
+import json
+import time
+from position import FLAG_DOUBLE, move_to_uci
+
+CORPUS = (
+    ("start", "opening", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "opening", "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("kiwipete", "middlegame", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("closed", "middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("rook_endgame", "endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("queen_endgame", "endgame", "8/8/4k3/8/2K5/8/3Q4/8 w - - 0 1"),
+    ("en_passant", "special", "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"),
+    ("castling", "special", "r3k2r/pppq1ppp/2n2n2/3pp3/3PP3/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 8"),
+    ("promotion", "special", "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1"),
+)
+DEFAULT_BASELINE = "bench_baseline.json"
+THRESHOLD = 0.25
+COUNT_THRESHOLD = 0.0
+MOVES_PER_POSITION = 8
+
+
+class CountingCanvas:
+    """
+    Холст без дисплея, считающий созданные элементы и вызовы, изменяющие элементы
+
+    :ivar items: Параметры созданных элементов по номерам
+    :type items: dict{int: dict}
+    :ivar created: Число созданных элементов
+    :type created: int
+    :ivar calls: Число вызовов холста (создание, itemconfig, coords)
+    :type calls: int
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.created = 0
+        self.calls = 0
+
+    def _create(self, kind, *coords, **options):
+        self.created += 1
+        self.calls += 1
+        self.items[self.created] = dict(options, kind=kind, coords=coords)
+        return self.created
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", *coords, **options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", *coords, **options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", *coords, **options)
+
+    def create_oval(self, *coords, **options):
+        return self._create("oval", *coords, **options)
+
+    def create_polygon(self, *coords, **options):
+        return self._create("polygon", *coords, **options)
+
+    def itemconfig(self, item, **options):
+        self.calls += 1
+        self.items[item].update(options)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        self.items[item]["coords"] = coords
+
+
+class _Widget:
+    def after(self, ms, function, *args):
+        return None
+
+    def after_cancel(self, after_id):
+        pass
+
+    def config(self, **options):
+        pass
+
+    def title(self, text=None):
+        pass
+
+
+def headless_chess(fen):
+    """
+    Создаёт игру с графическим интерфейсом, рисующую на CountingCanvas без окон Tk
+
+    :param fen: Позиция в записи FEN
+    :type fen: str
+    :returns: Игра
+    """
+    from chess import Chess
+    from sprites import SPRITE_NAMES
+    chess = Chess.from_fen(fen)
+    chess.canvas = CountingCanvas()
+    chess.piece_images = {name: name for name in SPRITE_NAMES}
+    chess.board_window = _Widget()
+    chess.player_time = {"white": 600, "black": 600}
+    chess.timer_labels = {"white": _Widget(), "black": _Widget()}
+    chess.show_end_game_dialog = lambda message: None
+    return chess
+
+
+def sample_moves(game, count=MOVES_PER_POSITION) -> list:
+    """
+    Выбирает воспроизводимый набор допустимых ходов позиции: сначала взятия на проходе, рокировки
+    и превращения, затем остальные ходы, взятые равномерно по записи UCI
+
+    :param game: Партия
+    :type game: Game
+    :param count: Наибольшее число ходов
+    :type count: int
+    :returns: Коды ходов
+    """
+    moves = sorted(game.legal, key=move_to_uci)
+    special = [move for move in moves if move >> 12 and not move >> 15 & FLAG_DOUBLE]
+    other = [move for move in moves if move not in special]
+    step = max(len(other) // max(count - len(special), 1), 1)
+    return (special + other[::step])[:count]
+
+
+def _play(game, move):
+    from game import PROMOTION_PIECES
+    frm, to, promo = move & 63, move >> 6 & 63, move >> 12 & 7
+    game.selected_piece_pos = (frm >> 3, frm & 7)
+    game.make_move(to >> 3, to & 7, next((name for name, ptype in PROMOTION_PIECES.items() if ptype == promo), None))
+    game.selected_piece_pos = None
+
+
+def _best_time(function, repeat) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def measure(fen, repeat=5, number=20) -> dict:
+    """
+    Замеряет одну позицию. Время — наименьшее из repeat повторов, в микросекундах на вызов
+
+    :param fen: Позиция в записи FEN
+    :type fen: str
+    :param repeat: Число повторов замера
+    :type repeat: int
+    :param number: Число вызовов в одном повторе
+    :type number: int
+    :returns: Показатели позиции
+    """
+    from game import Game
+    game = Game.from_fen(fen)
+    moves = sample_moves(game)
+    player = game.current_player
+
+    def find_valid_moves():
+        for _ in range(number):
+            game.find_valid_moves()
+
+    def simulate():
+        for _ in range(number):
+            game.simulate(player)
+
+    def make_move():
+        elapsed = 0.0
+        for move in moves:
+            start = time.perf_counter()
+            _play(game, move)
+            elapsed += time.perf_counter() - start
+            game.undo()
+        return elapsed
+
+    def draw_board():
+        games = [headless_chess(fen) for _ in range(number)]
+        start = time.perf_counter()
+        for chess in games:
+            chess.draw_board()
+        return time.perf_counter() - start
+
+    game.simulate(player)
+    results = {
+        "find_valid_moves_us": _best_time(find_valid_moves, repeat) / number * 1e6,
+        "simulate_us": _best_time(simulate, repeat) / number * 1e6,
+        "make_move_us": min(make_move() for _ in range(repeat)) / len(moves) * 1e6,
+        "draw_board_us": min(draw_board() for _ in range(repeat)) / number * 1e6,
+    }
+    results = {name: round(value, 2) for name, value in results.items()}
+    results.update(render_counts(fen))
+    return results
+
+
+def render_counts(fen) -> dict:
+    """
+    Считает элементы холста: созданные при первой отрисовке позиции и созданные и изменённые за ход
+    (среднее по набору ходов, каждый из которых выполняется и отменяется)
+
+    :param fen: Позиция в записи FEN
+    :type fen: str
+    :returns: Счётчики холста
+    """
+    chess = headless_chess(fen)
+    canvas = chess.canvas
+    chess.draw_board()
+    initial = canvas.created
+    created = calls = 0
+    moves = sample_moves(chess)
+    for move in moves:
+        before_created, before_calls = canvas.created, canvas.calls
+        _play(chess, move)
+        created += canvas.created - before_created
+        calls += canvas.calls - before_calls
+        chess.undo_move()
+    return {"items_initial": initial, "items_per_move": round(created / len(moves), 2),
+            "canvas_calls_per_move": round(calls / len(moves), 2)}
+
+
+def run(corpus=CORPUS, repeat=5) -> dict:
+    """
+    Замеряет все позиции набора
+
+    :param corpus: Позиции (имя, вид, FEN)
+    :type corpus: tuple
+    :param repeat: Число повторов замера
+    :type repeat: int
+    :returns: Показатели по именам позиций
+    """
+    return {name: dict(measure(fen, repeat), kind=kind) for name, kind, fen in corpus}
+
+
+def compare(results, baseline, threshold=THRESHOLD, count_threshold=COUNT_THRESHOLD) -> list:
+    """
+    Сравнивает замер с базовым. Показатели времени (оканчиваются на "_us") сравниваются с порогом threshold,
+    счётчики холста — с порогом count_threshold. Позиции и показатели, которых нет в базовом замере, пропускаются
+
+    :param results: Новый замер
+    :type results: dict
+    :param baseline: Базовый замер
+    :type baseline: dict
+    :param threshold: Допустимый относительный рост времени
+    :type threshold: float
+    :param count_threshold: Допустимый относительный рост счётчиков
+    :type count_threshold: float
+    :returns: Описания ухудшений
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            limit = threshold if metric.endswith("_us") else count_threshold
+            if value > old * (1 + limit):
+                regressions.append(f"{name}.{metric}: {old} -> {value} (+{(value / old - 1) * 100 if old else 100:.0f}%)")
+    return regressions
+
+
+def load(path) -> dict:
+    """
+    Читает базовый замер
+
+    :param path: Путь к файлу
+    :type path: str
+    :returns: Показатели по именам позиций
+    :raises OSError: Если файл не удалось прочитать
+    """
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save(path, results):
+    """
+    Сохраняет замер как базовый
+
+    :param path: Путь к файлу
+    :type path: str
+    :param results: Показатели по именам позиций
+    :type results: dict
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=1, sort_keys=True)
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: замеряет набор позиций и сравнивает с базовым замером
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения (1, если есть ухудшения)
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess bench", description="Замер производительности")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="файл базового замера")
+    parser.add_argument("--save", action="store_true", help="сохранить замер как базовый")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="допустимый рост времени (0.25 — 25%%)")
+    parser.add_argument("--count-threshold", type=float, default=COUNT_THRESHOLD,
+                        help="допустимый рост счётчиков холста")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов замера")
+    args = parser.parse_args(argv)
+    results = run(repeat=args.repeat)
+    for name, metrics in results.items():
+        print(f"{name} ({metrics['kind']}): " + ", ".join(f"{metric} {value}" for metric, value in metrics.items()
+                                                          if metric != "kind"))
+    if args.save:
+        save(args.baseline, results)
+        print(f"Базовый замер сохранён: {args.baseline}")
+        return 0
+    try:
+        baseline = load(args.baseline)
+    except OSError:
+        print(f"Нет базового замера {args.baseline}; сохраните его с флагом --save")
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.count_threshold)
+    for line in regressions:
+        print(f"Ухудшение: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
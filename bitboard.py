@@ -0,0 +1,463 @@
+"""
+Генерация ходов на битбордах: 64-битные маски занятости для каждого типа фигур, таблицы атак коня,
+короля и пешек и таблицы атак дальнобойных фигур, индексируемые занятостью линии (вертикали,
+горизонтали или диагонали). Таблицы строятся один раз при импорте модуля.
+
+Бит с номером sq соответствует клетке sq из position.py. Генератор возвращает те же коды ходов,
+что и Position.legal_moves, поэтому ходы выполняются обычными Position.make/unmake
+"""
+from position import Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, FLAG_EP, FLAG_CASTLE, FLAG_DOUBLE, \
+    PROMOTIONS, CASTLING, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, RAYS
+
+FULL = (1 << 64) - 1
+NOT_FILE_A = FULL ^ sum(1 << (row * 8) for row in range(8))
+NOT_FILE_H = FULL ^ sum(1 << (row * 8 + 7) for row in range(8))
+# Клетки, на которые пешка попадает первым шагом из начальной позиции
+RANK_3 = (0xFF << 40, 0xFF << 16)
+
+# Пары противоположных направлений: вертикаль, горизонталь и две диагонали
+LINES = ((0, 4), (2, 6), (1, 5), (3, 7))
+
+
+def _mask(squares) -> int:
+    mask = 0
+    for sq in squares:
+        mask |= 1 << sq
+    return mask
+
+
+def _line_table(sq, dirs) -> tuple:
+    rays = [RAYS[sq][d] for d in dirs]
+    inner = _mask(s for ray in rays for s in ray[:-1])
+    table = {}
+    occ = 0
+    while True:
+        attacks = 0
+        for ray in rays:
+            for s in ray:
+                attacks |= 1 << s
+                if occ >> s & 1:
+                    break
+        table[occ] = attacks
+        occ = (occ - inner) & inner
+        if not occ:
+            break
+    return inner, table
+
+
+KNIGHT_ATTACKS = tuple(_mask(KNIGHT_TARGETS[sq]) for sq in range(64))
+KING_ATTACKS = tuple(_mask(KING_TARGETS[sq]) for sq in range(64))
+PAWN_ATTACKS_BB = tuple(tuple(_mask(PAWN_ATTACKS[color][sq]) for sq in range(64)) for color in range(2))
+
+_tables = [[_line_table(sq, dirs) for sq in range(64)] for dirs in LINES]
+FILE_MASK, FILE_TABLE = [t[0] for t in _tables[0]], [t[1] for t in _tables[0]]
+RANK_MASK, RANK_TABLE = [t[0] for t in _tables[1]], [t[1] for t in _tables[1]]
+ANTI_MASK, ANTI_TABLE = [t[0] for t in _tables[2]], [t[1] for t in _tables[2]]
+DIAG_MASK, DIAG_TABLE = [t[0] for t in _tables[3]], [t[1] for t in _tables[3]]
+del _tables
+
+BETWEEN = [0] * 4096
+for _sq in range(64):
+    for _ray in RAYS[_sq]:
+        _between = 0
+        for _t in _ray:
+            BETWEEN[_sq << 6 | _t] = _between
+            _between |= 1 << _t
+
+
+def rook_attacks(sq, occ) -> int:
+    """
+    Атаки ладьи с клетки при заданной занятости доски
+
+    :param sq: Клетка
+    :type sq: int
+    :param occ: Маска занятых клеток
+    :type occ: int
+    :returns: Маска атакованных клеток
+    """
+    return FILE_TABLE[sq][occ & FILE_MASK[sq]] | RANK_TABLE[sq][occ & RANK_MASK[sq]]
+
+
+def bishop_attacks(sq, occ) -> int:
+    """
+    Атаки слона с клетки при заданной занятости доски
+
+    :param sq: Клетка
+    :type sq: int
+    :param occ: Маска занятых клеток
+    :type occ: int
+    :returns: Маска атакованных клеток
+    """
+    return ANTI_TABLE[sq][occ & ANTI_MASK[sq]] | DIAG_TABLE[sq][occ & DIAG_MASK[sq]]
+
+
+class BitboardPosition(Position):
+    """
+    Позиция, которая вместе с доской поддерживает битборды: маску для каждого кода фигуры и маски занятости цветов.
+    Битборды обновляются при каждом изменении доски, поэтому генератору не нужно строить их заново
+
+    :ivar bb: Маски клеток по кодам фигур
+    :type bb: list[int]
+    :ivar occ: Маски занятых клеток белых и чёрных
+    :type occ: list[int]
+    """
+    __slots__ = ("bb", "occ")
+
+    def __init__(self):
+        """
+        Создаёт пустую позицию
+        """
+        super().__init__()
+        self.bb = [0] * 15
+        self.occ = [0, 0]
+
+    @classmethod
+    def from_position(cls, position) -> "BitboardPosition":
+        """
+        Создаёт позицию с битбордами из обычной позиции
+
+        :param position: Исходная позиция
+        :type position: Position
+        :returns: Позиция с битбордами
+        """
+        new = cls()
+        for sq in position.pieces[0] + position.pieces[1]:
+            new.add_piece(sq, position.board[sq])
+        new.side, new.castling, new.ep = position.side, position.castling, position.ep
+        new.halfmove, new.fullmove, new.history = position.halfmove, position.fullmove, position.history[:]
+        new.repetitions = position.repetitions.copy()
+        return new
+
+    def copy(self) -> "BitboardPosition":
+        """
+        Создаёт независимую копию позиции
+
+        :returns: Копия позиции
+        """
+        position = super().copy()
+        position.bb = self.bb[:]
+        position.occ = self.occ[:]
+        return position
+
+    def add_piece(self, sq, code):
+        """
+        Ставит фигуру на пустую клетку
+
+        :param sq: Клетка
+        :type sq: int
+        :param code: Код фигуры
+        :type code: int
+        """
+        Position.add_piece(self, sq, code)
+        self.bb[code] |= 1 << sq
+        self.occ[code >> 3] |= 1 << sq
+
+    def remove_piece(self, sq):
+        """
+        Убирает фигуру с клетки
+
+        :param sq: Клетка
+        :type sq: int
+        """
+        code = self.board[sq]
+        Position.remove_piece(self, sq)
+        self.bb[code] ^= 1 << sq
+        self.occ[code >> 3] ^= 1 << sq
+
+    def move_piece(self, frm, to):
+        """
+        Переставляет фигуру на пустую клетку
+
+        :param frm: Исходная клетка
+        :type frm: int
+        :param to: Конечная клетка
+        :type to: int
+        """
+        code = self.board[frm]
+        Position.move_piece(self, frm, to)
+        bits = 1 << frm | 1 << to
+        self.bb[code] ^= bits
+        self.occ[code >> 3] ^= bits
+
+    def make(self, move):
+        """
+        Выполняет ход и запоминает всё необходимое для его отмены
+
+        :param move: Код хода
+        :type move: int
+        """
+        Position.make(self, move)
+        promo = move >> 12 & 7
+        if promo:
+            to = move >> 6 & 63
+            color = self.side ^ 1
+            self.bb[PAWN | color << 3] ^= 1 << to
+            self.bb[promo | color << 3] ^= 1 << to
+
+    def unmake(self):
+        """
+        Отменяет последний выполненный ход
+        """
+        move = self.history[-1][0]
+        promo = move >> 12 & 7
+        if promo:
+            to = move >> 6 & 63
+            color = self.side ^ 1
+            self.bb[PAWN | color << 3] ^= 1 << to
+            self.bb[promo | color << 3] ^= 1 << to
+        Position.unmake(self)
+
+
+def bitboards(position) -> tuple:
+    """
+    Возвращает битборды позиции: поддерживаемые BitboardPosition или построенные по спискам фигур
+
+    :param position: Позиция
+    :type position: Position
+    :returns: (маски по кодам фигур, маски занятости белых и чёрных)
+    """
+    if isinstance(position, BitboardPosition):
+        return position.bb, position.occ
+    board = position.board
+    bb = [0] * 15
+    occ = [0, 0]
+    for color in 0, 1:
+        mask = 0
+        for sq in position.pieces[color]:
+            bit = 1 << sq
+            bb[board[sq]] |= bit
+            mask |= bit
+        occ[color] = mask
+    return bb, occ
+
+
+def attackers_to(sq, occ, by, bb) -> int:
+    """
+    Находит фигуры заданного цвета, атакующие клетку
+
+    :param sq: Клетка
+    :type sq: int
+    :param occ: Маска занятых клеток
+    :type occ: int
+    :param by: Цвет атакующих фигур
+    :type by: int
+    :param bb: Маски по кодам фигур
+    :type bb: list[int]
+    :returns: Маска атакующих фигур
+    """
+    base = by << 3
+    queens = bb[base | QUEEN]
+    return (PAWN_ATTACKS_BB[by ^ 1][sq] & bb[base | PAWN]) | (KNIGHT_ATTACKS[sq] & bb[base | KNIGHT]) | \
+        (KING_ATTACKS[sq] & bb[base | KING]) | (rook_attacks(sq, occ) & (bb[base | ROOK] | queens)) | \
+        (bishop_attacks(sq, occ) & (bb[base | BISHOP] | queens))
+
+
+def legal_moves(position) -> list:
+    """
+    Генерирует все допустимые ходы игрока, чей ход, на битбордах.
+    Ходы несвязанных пешек строятся сдвигами сразу для всех пешек
+
+    :param position: Позиция
+    :type position: Position
+    :returns: Коды допустимых ходов (в том же формате, что и Position.legal_moves)
+    """
+    board = position.board
+    side = position.side
+    opp = side ^ 1
+    bb, occ = bitboards(position)
+    us, them = occ[side], occ[opp]
+    occupied = us | them
+    moves = []
+    append = moves.append
+    king = position.kings[side]
+    check_mask = FULL
+    pinned = {}
+    pinned_bb = 0
+    checkers = 0
+    if king >= 0:
+        base = opp << 3
+        checkers = attackers_to(king, occupied, opp, bb)
+        if checkers:
+            if checkers & (checkers - 1):
+                check_mask = 0
+            else:
+                check_mask = checkers | BETWEEN[king << 6 | checkers.bit_length() - 1]
+        snipers = (rook_attacks(king, them) & (bb[base | ROOK] | bb[base | QUEEN])) | \
+                  (bishop_attacks(king, them) & (bb[base | BISHOP] | bb[base | QUEEN]))
+        while snipers:
+            low = snipers & -snipers
+            snipers ^= low
+            sniper = low.bit_length() - 1
+            line = BETWEEN[king << 6 | sniper]
+            blockers = line & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & us:
+                pinned[blockers.bit_length() - 1] = line | low
+                pinned_bb |= blockers
+
+        not_king = occupied ^ (1 << king)
+        targets = KING_ATTACKS[king] & ~us
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            to = low.bit_length() - 1
+            if not attackers_to(to, not_king, opp, bb):
+                append(king | to << 6)
+        if not check_mask:
+            return moves
+
+    own = side << 3
+    free = ~pinned_bb
+    targets_mask = ~us & check_mask
+    pieces = bb[own | KNIGHT] & free
+    while pieces:
+        low = pieces & -pieces
+        pieces ^= low
+        sq = low.bit_length() - 1
+        targets = KNIGHT_ATTACKS[sq] & targets_mask
+        while targets:
+            t = targets & -targets
+            targets ^= t
+            append(sq | (t.bit_length() - 1) << 6)
+    for ptype in BISHOP, ROOK, QUEEN:
+        pieces = bb[own | ptype]
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            sq = low.bit_length() - 1
+            if ptype == BISHOP:
+                targets = bishop_attacks(sq, occupied)
+            elif ptype == ROOK:
+                targets = rook_attacks(sq, occupied)
+            else:
+                targets = rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+            targets &= targets_mask
+            if low & pinned_bb:
+                targets &= pinned[sq]
+            while targets:
+                t = targets & -targets
+                targets ^= t
+                append(sq | (t.bit_length() - 1) << 6)
+
+    pawns = bb[own | PAWN]
+    free_pawns = pawns & free
+    empty = ~occupied & FULL
+    if side == WHITE:
+        single = (free_pawns >> 8) & empty
+        double = ((single & RANK_3[WHITE]) >> 8) & empty & check_mask
+        groups = ((single & check_mask, 8), (double, 16),
+                  (((free_pawns & NOT_FILE_A) >> 9) & them & check_mask, 9),
+                  (((free_pawns & NOT_FILE_H) >> 7) & them & check_mask, 7))
+    else:
+        single = (free_pawns << 8) & empty
+        double = ((single & RANK_3[BLACK]) << 8) & empty & check_mask
+        groups = ((single & check_mask, -8), (double, -16),
+                  (((free_pawns & NOT_FILE_A) << 7) & them & check_mask, -7),
+                  (((free_pawns & NOT_FILE_H) << 9) & them & check_mask, -9))
+    for targets, offset in groups:
+        while targets:
+            t = targets & -targets
+            targets ^= t
+            to = t.bit_length() - 1
+            _append_pawn_move(append, to + offset, to)
+    pieces = pawns & pinned_bb
+    forward = -8 if side == WHITE else 8
+    while pieces:
+        low = pieces & -pieces
+        pieces ^= low
+        sq = low.bit_length() - 1
+        targets = PAWN_ATTACKS_BB[side][sq] & them
+        one = sq + forward
+        if 0 <= one < 64 and not occupied >> one & 1:
+            targets |= 1 << one
+            if sq >> 3 == (6 if side == WHITE else 1) and not occupied >> (one + forward) & 1:
+                targets |= 1 << (one + forward)
+        targets &= check_mask & pinned[sq]
+        while targets:
+            t = targets & -targets
+            targets ^= t
+            _append_pawn_move(append, sq, t.bit_length() - 1)
+    ep = position.ep
+    if ep >= 0:
+        pieces = PAWN_ATTACKS_BB[opp][ep] & pawns
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            sq = low.bit_length() - 1
+            if _ep_is_safe(sq, ep, king, side, bb, occupied):
+                append(sq | ep << 6 | FLAG_EP << 15)
+
+    if king >= 0 and not checkers and position.castling:
+        for right, king_sq, to, rook, rook_to, between in CASTLING[side]:
+            if position.castling & right and board[king_sq] == KING | side << 3 and \
+                    board[rook] == ROOK | side << 3 and not any(occupied >> s & 1 for s in between) and \
+                    not attackers_to(rook_to, occupied, opp, bb) and not attackers_to(to, occupied, opp, bb):
+                append(king_sq | to << 6 | FLAG_CASTLE << 15)
+    return moves
+
+
+def _append_pawn_move(append, sq, to):
+    if to < 8 or to >= 56:
+        for promo in PROMOTIONS:
+            append(sq | to << 6 | promo << 12)
+    elif abs(to - sq) == 16:
+        append(sq | to << 6 | FLAG_DOUBLE << 15)
+    else:
+        append(sq | to << 6)
+
+
+def _ep_is_safe(sq, ep, king, side, bb, occupied) -> bool:
+    if king < 0:
+        return True
+    opp = side ^ 1
+    cap_bit = 1 << (ep + 8 if side == WHITE else ep - 8)
+    pawns = opp << 3 | PAWN
+    bb[pawns] ^= cap_bit
+    safe = not attackers_to(king, occupied ^ (1 << sq) ^ (1 << ep) ^ cap_bit, opp, bb)
+    bb[pawns] ^= cap_bit
+    return safe
+
+
+def all_targets(position) -> dict:
+    """
+    Перебирает клетки, на которые могут пойти все фигуры обоих цветов без учёта шаха собственному королю
+    (битбордовый аналог Position.targets для Chess.find_valid_moves)
+
+    :param position: Позиция
+    :type position: Position
+    :returns: Словарь {клетка фигуры: список конечных клеток}
+    """
+    board = position.board
+    bb, occ = bitboards(position)
+    occupied = occ[0] | occ[1]
+    found = {}
+    for color in 0, 1:
+        us, them = occ[color], occ[color ^ 1]
+        forward = -8 if color == WHITE else 8
+        for sq in position.pieces[color]:
+            ptype = board[sq] & 7
+            if ptype == PAWN:
+                targets = PAWN_ATTACKS_BB[color][sq] & them
+                if position.ep >= 0 and color == position.side:
+                    targets |= PAWN_ATTACKS_BB[color][sq] & (1 << position.ep)
+                one = sq + forward
+                if 0 <= one < 64 and not occupied >> one & 1:
+                    targets |= 1 << one
+                    if sq >> 3 == (6 if color == WHITE else 1) and not occupied >> (one + forward) & 1:
+                        targets |= 1 << (one + forward)
+            elif ptype == KNIGHT:
+                targets = KNIGHT_ATTACKS[sq] & ~us
+            elif ptype == KING:
+                targets = KING_ATTACKS[sq] & ~us
+            elif ptype == BISHOP:
+                targets = bishop_attacks(sq, occupied) & ~us
+            elif ptype == ROOK:
+                targets = rook_attacks(sq, occupied) & ~us
+            else:
+                targets = (rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)) & ~us
+            squares = []
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                squares.append(low.bit_length() - 1)
+            found[sq] = squares
+    return found
@@ -0,0 +1,233 @@
+"""
+Дебютная книга в формате Polyglot (.bin). Файл отображается в память через mmap и не читается целиком:
+записи по 16 байт отсортированы по ключу позиции, поэтому поиск — двоичный поиск по ключу, затрагивающий
+лишь несколько страниц файла. Ключи позиций Position.key() совпадают с ключами Polyglot.
+
+Запуск: python -m chess book FILE [--fen FEN]
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+from perft import START_FEN
+from position import Position, KING, KNIGHT, move_to_uci
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+# Рокировка в Polyglot записывается как ход короля на клетку своей ладьи
+CASTLE_TARGETS = {(60, 63): 62, (60, 56): 58, (4, 7): 6, (4, 0): 2}
+
+
+class BookEntry:
+    """
+    Запись дебютной книги
+
+    :ivar move: Код хода
+    :type move: int
+    :ivar weight: Вес хода
+    :type weight: int
+    :ivar learn: Данные обучения
+    :type learn: int
+    """
+    __slots__ = ("move", "weight", "learn")
+
+    def __init__(self, move, weight, learn=0):
+        self.move = move
+        self.weight = weight
+        self.learn = learn
+
+
+def decode_move(position, raw) -> int:
+    """
+    Переводит ход в кодировке Polyglot в код хода позиции
+
+    :param position: Позиция, в которой делается ход
+    :type position: Position
+    :param raw: Ход Polyglot (16 бит: клетки и фигура превращения)
+    :type raw: int
+    :returns: Код хода
+    """
+    to = (7 - (raw >> 3 & 7)) * 8 + (raw & 7)
+    frm = (7 - (raw >> 9 & 7)) * 8 + (raw >> 6 & 7)
+    promo = raw >> 12 & 7
+    if position.board[frm] & 7 == KING:
+        to = CASTLE_TARGETS.get((frm, to), to)
+    return position.build_move(frm, to, promo + KNIGHT - 1 if promo else 0)
+
+
+def encode_move(position, move) -> int:
+    """
+    Переводит код хода позиции в кодировку Polyglot
+
+    :param position: Позиция, в которой делается ход
+    :type position: Position
+    :param move: Код хода
+    :type move: int
+    :returns: Ход Polyglot
+    """
+    frm, to, promo = move & 63, move >> 6 & 63, move >> 12 & 7
+    if position.board[frm] & 7 == KING:
+        for (king, rook), target in CASTLE_TARGETS.items():
+            if king == frm and target == to:
+                to = rook
+    return ((7 - (to >> 3)) << 3 | to & 7 | (7 - (frm >> 3)) << 9 | (frm & 7) << 6 |
+            (promo - KNIGHT + 1 if promo else 0) << 12)
+
+
+def write_book(path, entries):
+    """
+    Записывает дебютную книгу. Записи сортируются по ключу позиции, ходы одной позиции — по убыванию веса
+
+    :param path: Путь к файлу
+    :type path: str
+    :param entries: Записи (ключ позиции, ход Polyglot, вес[, данные обучения])
+    :type entries: Iterable[tuple]
+    """
+    rows = sorted(((entry[0], -entry[2], entry[1], entry[3] if len(entry) > 3 else 0) for entry in entries))
+    with open(path, "wb") as file:
+        for key, weight, raw, learn in rows:
+            file.write(ENTRY.pack(key, raw, -weight, learn))
+
+
+class OpeningBook:
+    """
+    Дебютная книга Polyglot, отображённая в память
+
+    :ivar path: Путь к файлу книги
+    :type path: str
+    :ivar count: Число записей
+    :type count: int
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Путь к файлу книги
+        :type path: str
+        :raises OSError: Если файл не удалось открыть
+        :raises ValueError: Если размер файла не кратен размеру записи
+        """
+        self.path = path
+        size = os.path.getsize(path)
+        if size % ENTRY.size:
+            raise ValueError(f"Файл не является книгой Polyglot: {path}")
+        self.count = size // ENTRY.size
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self):
+        """
+        Закрывает отображение и файл книги
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _lower_bound(self, key) -> int:
+        data = self._map
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if KEY.unpack_from(data, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def raw_entries(self, key) -> list:
+        """
+        Находит записи позиции по ключу двоичным поиском
+
+        :param key: Ключ позиции Polyglot
+        :type key: int
+        :returns: Записи (ход Polyglot, вес, данные обучения)
+        """
+        data = self._map
+        found = []
+        i = self._lower_bound(key)
+        while i < self.count:
+            entry_key, raw, weight, learn = ENTRY.unpack_from(data, i * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((raw, weight, learn))
+            i += 1
+        return found
+
+    def entries(self, position) -> list:
+        """
+        Находит ходы книги для позиции. Ходы, недопустимые в позиции (при совпадении ключей), пропускаются
+
+        :param position: Позиция
+        :type position: Position
+        :returns: Записи книги
+        """
+        found = self.raw_entries(position.key())
+        if not found:
+            return []
+        legal = set(position.legal_moves())
+        result = []
+        for raw, weight, learn in found:
+            move = decode_move(position, raw)
+            if move in legal:
+                result.append(BookEntry(move, weight, learn))
+        return result
+
+    def find(self, position, best=False, rng=random) -> int:
+        """
+        Выбирает ход книги: случайный с вероятностью, пропорциональной весу, или ход с наибольшим весом
+
+        :param position: Позиция
+        :type position: Position
+        :param best: Выбирать ход с наибольшим весом
+        :type best: bool
+        :param rng: Генератор случайных чисел
+        :type rng: random.Random
+        :returns: Код хода или None, если позиции нет в книге
+        """
+        entries = self.entries(position)
+        if not entries:
+            return None
+        if best:
+            return max(entries, key=lambda entry: entry.weight).move
+        total = sum(entry.weight for entry in entries)
+        if not total:
+            return rng.choice(entries).move
+        point = rng.randrange(total)
+        for entry in entries:
+            point -= entry.weight
+            if point < 0:
+                return entry.move
+        return entries[-1].move
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: выводит ходы книги для позиции
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения (1, если позиции нет в книге)
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess book", description="Ходы дебютной книги Polyglot")
+    parser.add_argument("file", help="файл книги .bin")
+    parser.add_argument("--fen", default=START_FEN, help="позиция в записи FEN")
+    args = parser.parse_args(argv)
+    position = Position.from_fen(args.fen)
+    with OpeningBook(args.file) as book:
+        entries = book.entries(position)
+        total = sum(entry.weight for entry in entries) or 1
+        print(f"Ключ: {position.key():016x}, записей в книге: {book.count}")
+        for entry in entries:
+            print(f"{move_to_uci(entry.move)}: вес {entry.weight} ({entry.weight * 100 / total:.1f}%)")
+    return 0 if entries else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,21 +1,19 @@
-import tkinter as tk
-from copy import deepcopy
-from tkinter import messagebox
-from PIL import ImageTk, Image
-
-
-class UnknownPiece(Exception):
-    """
-    Исключение. Вызывается, если на доске возникает неизвестная фигура (не входящая в стандартный набор фигур в шахматах)
-    """
-    pass
-
-
-class PieceNotOnBoard(Exception):
-    """
-    Исключение. Вызывается, если фигура, с которой пытаются работать, находится на доске, или выполняемый ход приводит к выходу за пределы доски
-    """
-    pass
+"""
+Графический интерфейс игры на tkinter. Правила игры находятся в модуле game; tkinter и Pillow импортируются
+только при открытии окон, поэтому импорт модуля не требует дисплея
+"""
+import math
+import os
+import queue
+import sys
+import threading
+import journal
+import profiler
+import sprites
+from clock import ChessClock
+from game import Game, PROMOTION_PIECES
+from renderer import BoardRenderer
+from position import UnknownPiece, PieceNotOnBoard
 
 
 class CantFindImages(Exception):
@@ -25,9 +23,9 @@ class CantFindImages(Exception):
     pass
 
 
-class Chess:
+class Chess(Game):
     """
-    Класс, реализующий логику и визуализацию игры "Шахматы"
+    Класс, реализующий визуализацию игры "Шахматы" поверх правил Game
 
     :ivar path: Название директории с изображениями фигур
     :type path: str
@@ -35,93 +33,106 @@ class Chess:
     :type time_entry: tk.Entry
     :ivar after_id: Обновление таймера
     :type after_id: tk.Tk().after
-    :ivar w_king_pos: Позиция белого короля
-    :type w_king_pos: tuple(int, int)
-    :ivar b_king_pos: Позиция чёрного короля
-    :type b_king_pos: tuple(int, int)
-    :ivar board: Состояние доски
-    :type board: list[list[str]]
     :ivar board_window: Окно с визуализацией доски
     :type board_window: tk.Tk()
     :ivar canvas: Холст для рисования доски
     :type canvas: tk.Canvas
-    :ivar current_player: Игрок, чнй ход ожидается
-    :type current_player: str
-    :ivar en_passant_target: Пешка, которая может быть взята на проходе
-    :type en_passant_target: tuple(int, int)
-    :ivar king_moved: Запись случившегося хода короля для исключения рокировки
-    :type king_moved: list[bool]
+    :ivar renderer: Сохраняемое представление доски на холсте
+    :type renderer: BoardRenderer
+    :ivar threaded: Пересчитывать допустимые ходы после хода в фоновом потоке (включается при открытии окна доски)
+    :type threaded: bool
+    :ivar pending: Очередь, в которую фоновый поток передаст результат пересчёта (None, если пересчёт не идёт)
+    :type pending: queue.Queue
     :ivar piece_images: Загруженные изображения фигур
     :type piece_images: dict{ImageTk.PhotoImage}
     :ivar player_time: Оставшееся время каждого игрока
     :type player_time: dict
-    :ivar rook_moved: Запись хода ладьи для исключения рокировки
-    :type rook_moved: list[list[bool]]
     :ivar root: Окно настройки
     :type root: tk.Tk()
-    :ivar selected_piece_pos: Запись выбранной фигуры
-    :type selected_piece_pos: tuple(int, int)
     :ivar time_limit: Ограничение времени на игрока, задаётся в настройках
     :type time_limit: float
     :ivar timer_labels: Вывод времени на окно доски
     :type timer_labels: dict
     :ivar timer_running: Состояние таймера
     :type timer_running: bool
-    :ivar valid_moves: Массив возможных ходов
-    :type valid_moves: list[list]
+    :ivar timer_text: Выведенное на часы каждого игрока время
+    :type timer_text: dict
+    :ivar increment: Добавление Фишера за ход в секундах, задаётся в настройках
+    :type increment: float
+    :ivar delay: Задержка Бронштейна в секундах, задаётся в настройках
+    :type delay: float
+    :ivar clock: Шахматные часы партии
+    :type clock: ChessClock
+    :ivar engine_side: Цвет, за который играет компьютер (None — игра двух людей)
+    :type engine_side: str
+    :ivar engine_depth: Ограничение глубины перебора компьютера (None — без ограничения)
+    :type engine_depth: int
+    :ivar engine_time: Ограничение времени на ход компьютера в секундах (None — без ограничения)
+    :type engine_time: float
+    :ivar engine_workers: Число процессов перебора компьютера (больше одного — параллельный перебор)
+    :type engine_workers: int
+    :ivar engine_stop: Событие остановки текущего перебора компьютера
+    :type engine_stop: threading.Event
+    :ivar engine_table: Таблица перестановок компьютера, сохраняемая между ходами партии
+    :type engine_table: tt.TranspositionTable
+    :ivar engine_book_path: Путь к дебютной книге Polyglot компьютера (None — без книги)
+    :type engine_book_path: str
+    :ivar engine_book: Открытая дебютная книга
+    :type engine_book: book.OpeningBook
+    :ivar tablebase_path: Каталог эндшпильных таблиц (None — без таблиц)
+    :type tablebase_path: str
+    :ivar tablebase: Открытые эндшпильные таблицы: используются перебором и для вывода числа ходов до мата
+    :type tablebase: tablebase.Tablebase
+    :ivar journal_path: Путь к журналу партии для восстановления после аварийного завершения (None — без журнала)
+    :type journal_path: str
+    :ivar journal: Журнал текущей партии
+    :type journal: journal.Journal
+    :ivar profile_label: Итоги профилирования последнего полухода поверх окна доски (None — не выводятся)
+    :type profile_label: tk.Label
     """
 
-    def __init__(self, pth='pieces'):
+    def __init__(self, pth='pieces', backend="mailbox"):
         """
         Инициализация необходимых переменных экземпляра класса
 
         :param pth: Название директории, в которой находятся изображения фигур
         :type pth: str
+        :param backend: Генератор ходов: "mailbox" (по доске из 64 клеток) или "bitboard" (на битбордах)
+        :type backend: str
         """
         self.path = pth
         self.piece_images = {}
-        self.current_player = "white"
-        self.selected_piece_pos = None
-        self.board = self.initialize_board()
-        self.king_moved = [False, False]
-        self.rook_moved = [[False, False], [False, False]]
-        self.en_passant_target = None
+        self.renderer = None
+        self.threaded = False
+        self.pending = None
         self.time_limit = 600
         self.timer_labels = {}
         self.timer_running = False
+        self.timer_text = {}
+        self.increment = 0
+        self.delay = 0
+        self.clock = None
         self.after_id = None
-
-    def initialize_board(self) -> list[list[str]]:
-        """
-        Инициализация расстановки фигур в начале партии
-        """
-        board = [['No_piece' for _ in range(8)] for _ in range(8)]
-
-        for col in range(8):
-            board[6][col] = "p_white"
-        board[7][0], board[7][7] = "r_white", "r_white"
-        board[7][1], board[7][6] = "n_white", "n_white"
-        board[7][2], board[7][5] = "b_white", "b_white"
-        board[7][3] = "q_white"
-        board[7][4] = "k_white"
-
-        for col in range(8):
-            board[1][col] = "p_black"
-        board[0][0], board[0][7] = "r_black", "r_black"
-        board[0][1], board[0][6] = "n_black", "n_black"
-        board[0][2], board[0][5] = "b_black", "b_black"
-        board[0][3] = "q_black"
-        board[0][4] = "k_black"
-
-        self.b_king_pos = (0, 4)
-        self.w_king_pos = (7, 4)
-
-        return board
+        self.engine_side = None
+        self.engine_depth = None
+        self.engine_time = 2.0
+        self.engine_workers = 1
+        self.engine_stop = None
+        self.engine_table = None
+        self.engine_book_path = None
+        self.engine_book = None
+        self.tablebase_path = None
+        self.tablebase = None
+        self.journal_path = journal.default_path()
+        self.journal = None
+        self.profile_label = None
+        super().__init__(backend)
 
     def setting(self):
         """
         Вывод окна приветствия и настройки времени на игрока
         """
+        import tkinter as tk
         self.root = tk.Tk()
         self.root.title("Шахматы")
         self.root.geometry("400x200")
@@ -150,6 +161,22 @@ class Chess:
         )
         self.time_entry.pack(pady=10)
 
+        self.engine_button = tk.Button(
+            self.root,
+            text="Игра с компьютером: нет",
+            font=("Arial", 10),
+            command=self.engine_settings
+        )
+        self.engine_button.place(relx=0, rely=1, anchor='sw')
+
+        self.clock_button = tk.Button(
+            self.root,
+            text=self.clock_description(),
+            font=("Arial", 10),
+            command=self.clock_settings
+        )
+        self.clock_button.place(relx=1, rely=1, anchor='se')
+
         start_button = tk.Button(
             self.root,
             text="Начать игру",
@@ -164,10 +191,141 @@ class Chess:
 
         self.root.mainloop()
 
+    def clock_description(self) -> str:
+        """
+        Описывает добавление и задержку для кнопки настройки часов
+
+        :returns: Описание контроля времени
+        """
+        if not self.increment and not self.delay:
+            return "Добавление: нет"
+        parts = []
+        if self.increment:
+            parts.append(f"+{self.increment:g} с за ход")
+        if self.delay:
+            parts.append(f"задержка {self.delay:g} с")
+        return ", ".join(parts)
+
+    def clock_settings(self):
+        """
+        Открывает окно настройки добавления Фишера и задержки Бронштейна
+        """
+        import tkinter as tk
+        from tkinter import messagebox
+        window = tk.Toplevel(self.root)
+        window.title("Контроль времени")
+        window.resizable(False, False)
+
+        tk.Label(window, text="Добавление за ход в секундах (Фишер)", font=("Arial", 10)).pack(pady=(10, 0))
+        increment_entry = tk.Entry(window, width=10, font=("Arial", 11), justify="center")
+        increment_entry.insert(0, f"{self.increment:g}")
+        increment_entry.pack()
+
+        tk.Label(window, text="Задержка в секундах (Бронштейн)", font=("Arial", 10)).pack(pady=(10, 0))
+        delay_entry = tk.Entry(window, width=10, font=("Arial", 11), justify="center")
+        delay_entry.insert(0, f"{self.delay:g}")
+        delay_entry.pack()
+
+        def save():
+            """
+            Проверяет введённые значения и сохраняет контроль времени
+            """
+            try:
+                increment = float(increment_entry.get().strip().replace(',', '.') or 0)
+                delay = float(delay_entry.get().strip().replace(',', '.') or 0)
+            except ValueError:
+                messagebox.showerror("Ошибка", "Добавление и задержка должны быть числами секунд!", parent=window)
+                return
+            if increment < 0 or delay < 0:
+                messagebox.showerror("Ошибка", "Добавление и задержка не могут быть отрицательными!", parent=window)
+                return
+            self.increment = increment
+            self.delay = delay
+            self.clock_button.config(text=self.clock_description())
+            window.destroy()
+
+        tk.Button(window, text="Сохранить", font=("Arial", 10), bg="#4CAF50", fg="white",
+                  command=save).pack(pady=10)
+        window.grab_set()
+
+    def engine_settings(self):
+        """
+        Открывает окно выбора цвета, за который играет компьютер, и ограничений его перебора по глубине и времени
+        """
+        import tkinter as tk
+        from tkinter import messagebox
+        window = tk.Toplevel(self.root)
+        window.title("Игра с компьютером")
+        window.resizable(False, False)
+
+        side = tk.StringVar(window, value=self.engine_side or "")
+        tk.Label(window, text="Компьютер играет", font=("Arial", 11)).pack(pady=(10, 0))
+        for text, value in ("Нет", ""), ("Белыми", "white"), ("Чёрными", "black"):
+            tk.Radiobutton(window, text=text, variable=side, value=value, font=("Arial", 10)).pack(anchor='w', padx=20)
+
+        tk.Label(window, text="Глубина перебора (пусто — без ограничения)", font=("Arial", 10)).pack(pady=(10, 0))
+        depth_entry = tk.Entry(window, width=10, font=("Arial", 11), justify="center")
+        depth_entry.insert(0, "" if self.engine_depth is None else str(self.engine_depth))
+        depth_entry.pack()
+
+        tk.Label(window, text="Время на ход в секундах (пусто — без ограничения)", font=("Arial", 10)).pack(pady=(10, 0))
+        time_entry = tk.Entry(window, width=10, font=("Arial", 11), justify="center")
+        time_entry.insert(0, "" if self.engine_time is None else f"{self.engine_time:g}")
+        time_entry.pack()
+
+        tk.Label(window, text="Число процессов перебора", font=("Arial", 10)).pack(pady=(10, 0))
+        workers_entry = tk.Entry(window, width=10, font=("Arial", 11), justify="center")
+        workers_entry.insert(0, str(self.engine_workers))
+        workers_entry.pack()
+
+        tk.Label(window, text="Дебютная книга Polyglot (.bin, пусто — без книги)", font=("Arial", 10)).pack(pady=(10, 0))
+        book_entry = tk.Entry(window, width=30, font=("Arial", 11), justify="center")
+        book_entry.insert(0, self.engine_book_path or "")
+        book_entry.pack()
+
+        tk.Label(window, text="Каталог эндшпильных таблиц (пусто — без таблиц)", font=("Arial", 10)).pack(pady=(10, 0))
+        tablebase_entry = tk.Entry(window, width=30, font=("Arial", 11), justify="center")
+        tablebase_entry.insert(0, self.tablebase_path or "")
+        tablebase_entry.pack()
+
+        def save():
+            """
+            Проверяет введённые ограничения и сохраняет настройки компьютера
+            """
+            depth_input = depth_entry.get().strip()
+            time_input = time_entry.get().strip().replace(',', '.')
+            try:
+                depth = int(depth_input) if depth_input else None
+                limit = float(time_input) if time_input else None
+                workers = int(workers_entry.get().strip() or 1)
+            except ValueError:
+                messagebox.showerror("Ошибка", "Глубина и число процессов должны быть целыми числами, "
+                                               "время — числом секунд!", parent=window)
+                return
+            if depth is not None and not 1 <= depth <= 64 or limit is not None and limit <= 0 or workers < 1:
+                messagebox.showerror("Ошибка", "Глубина должна быть от 1 до 64, время — положительным, "
+                                               "процессов — не меньше одного!", parent=window)
+                return
+            self.engine_side = side.get() or None
+            self.engine_depth = depth
+            self.engine_workers = workers
+            self.engine_book_path = book_entry.get().strip() or None
+            self.tablebase_path = tablebase_entry.get().strip() or None
+            self.engine_time = limit if limit is not None or depth is not None else 2.0
+            names = {None: "нет", "white": "белыми", "black": "чёрными"}
+            self.engine_button.config(text=f"Игра с компьютером: {names[self.engine_side]}")
+            window.destroy()
+
+        tk.Button(window, text="Сохранить", font=("Arial", 10), bg="#4CAF50", fg="white",
+                  command=save).pack(pady=10)
+        window.grab_set()
+
     def start_game(self):
         """
         Закрывает окно настройки при успешном вводе времени и запускает окно с доской
         """
+        import tkinter as tk
+        from tkinter import messagebox
         time_input = self.time_entry.get().strip().replace(',', '.')
 
         if not time_input:
@@ -187,6 +345,8 @@ class Chess:
                 )
                 return
         self.player_time = {"white": self.time_limit, "black": self.time_limit}
+        self.clock = ChessClock(self.player_time, self.increment, self.delay)
+        self.open_journal()
         try:
             self.root.destroy()
             self.setup_board()
@@ -195,10 +355,74 @@ class Chess:
         except CantFindImages:
             print("Не удалось загрузить изображения фигур")
 
+    def open_journal(self):
+        """
+        Предлагает восстановить прерванную партию из журнала, иначе начинает новый журнал.
+        Восстанавливаются позиция, запись ходов, время игроков и настройки часов
+        """
+        from tkinter import messagebox
+        if self.journal_path is None:
+            return
+        try:
+            data = journal.read_journal(self.journal_path)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError):
+            print("Не удалось прочитать журнал партии")
+            data = None
+        if data is not None and data.entries and min(data.clocks()) > 0:
+            game = Game(self.backend)
+            journal.replay(game, data)
+            if not game.check_game_over() and messagebox.askyesno(
+                    "Прерванная партия", f"Продолжить прерванную партию ({len(game.notation)} полуходов)?"):
+                journal.replay(self, data)
+                self.time_limit, self.increment, self.delay = data.limit, data.increment, data.delay
+                self.player_time = dict(zip(("white", "black"), data.clocks()))
+                self.clock = ChessClock(self.player_time, self.increment, self.delay)
+                try:
+                    self.journal = journal.Journal(self.journal_path)
+                except (OSError, ValueError):
+                    print("Не удалось открыть журнал партии")
+                return
+        try:
+            self.journal = journal.Journal.create(self.journal_path, self.to_fen(), self.time_limit,
+                                                  self.increment, self.delay)
+        except OSError:
+            print("Не удалось создать журнал партии")
+
+    def write_journal(self, kind, record):
+        """
+        Дописывает ход или его отмену в журнал партии вместе с показаниями часов
+
+        :param kind: Вид записи (journal.MOVE или journal.UNDO)
+        :type kind: int
+        :param record: Запись хода
+        :type record: MoveRecord
+        """
+        if self.journal is not None:
+            self.journal.write(kind, record.move, record.san, self.player_time["white"], self.player_time["black"])
+
+    def close_journal(self, remove=False):
+        """
+        Закрывает журнал партии
+
+        :param remove: Удалить файл журнала (партия не будет предложена к восстановлению)
+        :type remove: bool
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if remove and self.journal_path is not None:
+            try:
+                os.remove(self.journal_path)
+            except OSError:
+                pass
+
     def setup_board(self):
         """
         Открывает окно доски, в котором выводит время на игрока, пустой холст для отрисовки доски и кнопку перезапуска игры
         """
+        import tkinter as tk
         try:
             self.board_window = tk.Tk()
             self.board_window.title("Шахматы")
@@ -243,12 +467,18 @@ class Chess:
             canvas.pack()
 
             self.canvas.bind("<Button-1>", self.on_click)
-            self.find_valid_moves()
+            self.threaded = True
+            self.simulate(self.current_player)
             self.draw_board()
             self.start_timer()
+            self.engine_turn()
 
+            buttons_frame = tk.Frame(self.board_window)
+            buttons_frame.pack(pady=10)
+            tk.Button(buttons_frame, text="Отменить ход", font=("Arial", 10), padx=10, pady=5,
+                      command=self.undo_move).pack(side='left', padx=5)
             tk.Button(
-                self.board_window,
+                buttons_frame,
                 text="Начать заново",
                 font=("Arial", 10),
                 bg="#4CAF50",
@@ -256,85 +486,70 @@ class Chess:
                 padx=10,
                 pady=5,
                 command=lambda: self.restart_game(self.board_window)
-            ).pack(pady=10)
+            ).pack(side='left', padx=5)
+            tk.Button(buttons_frame, text="Вернуть ход", font=("Arial", 10), padx=10, pady=5,
+                      command=self.redo_move).pack(side='left', padx=5)
+            self.board_window.bind("<Control-z>", lambda event: self.undo_move())
+            self.board_window.bind("<Control-y>", lambda event: self.redo_move())
+            if profiler.active is not None and profiler.active.overlay:
+                self.profile_label = tk.Label(self.board_window, font=("Arial", 8), fg="#555555")
+                self.profile_label.place(relx=0.5, y=0, anchor='n')
         except tk.TclError:
             print("Failed to load board window")
 
-    def draw_board(self, cell_size=80):
+    def board_renderer(self, cell_size=80) -> BoardRenderer:
+        """
+        Возвращает представление доски для текущего холста. Клетки, подписи и элементы фигур создаются
+        при первом обращении к новому холсту
+
+        :param cell_size: Размер клетки доски
+        :type cell_size: int
+        :returns: Представление доски
         """
-        Рисует на созданном холсте клетки, координаты, вызывает рисование фигур
+        renderer = self.renderer
+        if renderer is None or renderer.canvas is not self.canvas or renderer.cell_size != cell_size:
+            renderer = self.renderer = BoardRenderer(self.canvas, self.piece_images, cell_size)
+        elif renderer.images is not self.piece_images:
+            renderer.images = self.piece_images
+            renderer.shown = ["No_piece"] * 64
+            for item in renderer.pieces:
+                self.canvas.itemconfig(item, state="hidden")
+        return renderer
+
+    def draw_board(self, cell_size=80, squares=None):
+        """
+        Приводит изображение доски в соответствие с позицией. Элементы холста изменяются только
+        на клетках, где фигура поменялась
 
         :param cell_size: размер клетки шахматной доски
         :type cell_size: float
+        :param squares: Клетки, которые могли измениться (None — проверить все клетки)
+        :type squares: tuple(int)
         """
-        for row in range(8):
-            for col in range(8):
-                if (row + col) % 2 == 0:
-                    cell_color = "#F0D9B5"
-                    text_color = "#B58863"
-                else:
-                    cell_color = "#B58863"
-                    text_color = "#F0D9B5"
-
-                x1 = col * cell_size
-                y1 = row * cell_size
-                x2 = x1 + cell_size
-                y2 = y1 + cell_size
-
-                try:
-                    self.canvas.create_rectangle(x1, y1, x2, y2, fill=cell_color, outline=cell_color)
-                except tk.TclError:
-                    print("No canvas to draw a board")
-
-                if row == 7:
-                    letter = chr(ord('a') + col)
-                    text_x = x1 + 3
-                    text_y = y1 + cell_size
-                    self.canvas.create_text(
-                        text_x,
-                        text_y,
-                        text=letter,
-                        font=("Arial", 9),
-                        fill=text_color,
-                        anchor='sw'
-                    )
-                if col == 7:
-                    digit = 8 - row
-                    text_x = x1 - 3 + cell_size
-                    text_y = y1 + 3
-                    self.canvas.create_text(
-                        text_x,
-                        text_y,
-                        text=str(digit),
-                        font=("Arial", 9),
-                        fill=text_color,
-                        anchor='ne'
-                    )
-                try:
-                    self.draw_piece(row, col)
-                except UnknownPiece:
-                    self.board[row][col] = "No_piece"
+        import tkinter as tk
+        try:
+            self.board_renderer(cell_size)
+        except tk.TclError:
+            print("No canvas to draw a board")
+            return
+        for sq in range(64) if squares is None else squares:
+            row, col = sq >> 3, sq & 7
+            try:
+                self.draw_piece(row, col, cell_size)
+            except UnknownPiece:
+                self.board[row][col] = "No_piece"
 
     def load_piece_images(self):
         """
-        Загружает изображения фигур из директории, введённой пользователем
+        Загружает изображения фигур из директории, введённой пользователем. Изображения берутся из кэша:
+        декодирование и масштабирование выполняются один раз, пока исходные файлы не изменятся
 
         :raises CantFindImages: Если не удалось загрузить изображения фигур
         """
-        piece_names = ['pawn', 'knight', 'bishop', 'rook', 'queen', 'king']
-        colors = ['white', 'black']
-
-        images = {}
         try:
-            for color in colors:
-                for piece in piece_names:
-                    img_path = f"{self.path}/{color}_{piece}.png"
-                    img = Image.open(img_path)
-                    img = img.resize((80, 80))
-                    images[f"{color}_{piece}"] = ImageTk.PhotoImage(img)
+            self.piece_images = sprites.photo_images(self.path, 80, self.board_window)
         except FileNotFoundError:
             raise CantFindImages
-        self.piece_images = images
 
     def draw_piece(self, row, col, cell_size=80):
         """
@@ -348,214 +563,7 @@ class Chess:
         :type cell_size: float
         :raises UnknownPiece: Если для рисования на доске находится неизвестная фигура
         """
-        piece = self.board[row][col]
-        if piece != 'No_piece' and piece[0] != 's':
-            img_key = ""
-            x = col * cell_size
-            y = row * cell_size
-            if piece[:2] == "p_":
-                img_key = f"{piece[2:]}_pawn"
-            elif piece[:2] == "r_":
-                img_key = f"{piece[2:]}_rook"
-            elif piece[:2] == "n_":
-                img_key = f"{piece[2:]}_knight"
-            elif piece[:2] == "b_":
-                img_key = f"{piece[2:]}_bishop"
-            elif piece[:2] == "q_":
-                img_key = f"{piece[2:]}_queen"
-            elif piece[:2] == "k_":
-                img_key = f"{piece[2:]}_king"
-            try:
-                self.canvas.create_image(x, y, image=self.piece_images[img_key], anchor='nw')
-            except KeyError:
-                raise UnknownPiece
-
-    def find_valid_rook_move(self, row, col, color) -> list:
-        """
-        Перебор всех возможных ходов ладьёй
-
-        :param row: Ряд, в котором находится фигура
-        :type row: int
-        :param col: Столбец, в который находится фигура
-        :type col: int
-        :param color: Цвет фигуры
-        :type color: str
-        :returns: Возможные ходы ладьёй
-        :raises PieceNotOnBoard: Если фигура, для которой выполняется подбор, находится не в пределах доски
-        """
-        if 0 <= row < 8 and 0 <= col < 8:
-            piece = []
-            if row != 0:
-                for ch_r in range(1, row + 1):
-                    if self.board[row - ch_r][col] == "No_piece" or self.board[row - ch_r][col][0] == "s":
-                        piece.append((row - ch_r, col))
-                    elif self.board[row - ch_r][col][2] != color:
-                        piece.append((row - ch_r, col))
-                        break
-                    else:
-                        break
-            if row != 7:
-                for ch_r in range(1, 8 - row):
-                    if self.board[row + ch_r][col] == "No_piece" or self.board[row + ch_r][col][0] == "s":
-                        piece.append((row + ch_r, col))
-                    elif self.board[row + ch_r][col][2] != color:
-                        piece.append((row + ch_r, col))
-                        break
-                    else:
-                        break
-            if col != 0:
-                for ch_c in range(1, col + 1):
-                    if self.board[row][col - ch_c] == "No_piece" or self.board[row][col - ch_c][0] == "s":
-                        piece.append((row, col - ch_c))
-                    elif self.board[row][col - ch_c][2] != color:
-                        piece.append((row, col - ch_c))
-                        break
-                    else:
-                        break
-            if col != 7:
-                for ch_c in range(1, 8 - col):
-                    if self.board[row][col + ch_c] == "No_piece" or self.board[row][col + ch_c][0] == "s":
-                        piece.append((row, col + ch_c))
-                    elif self.board[row][col + ch_c][2] != color:
-                        piece.append((row, col + ch_c))
-                        break
-                    else:
-                        break
-        else:
-            raise PieceNotOnBoard
-
-        return piece
-
-    def find_valid_bishop_move(self, row, col, color) -> list:
-        """
-        Перебор всех возможных ходов слоном
-
-        :param row: Ряд, в котором находится фигура
-        :type row: int
-        :param col: Столбец, в который находится фигура
-        :type col: int
-        :param color: Цвет фигуры
-        :type color: str
-        :returns: Возможные ходы слоном
-        :raises PieceNotOnBoard: Если фигура, для которой выполняется подбор, находится не в пределах доски
-        """
-        if 0 <= row < 8 and 0 <= col < 8:
-            piece = []
-            nw, sw, se, ne = True, True, True, True
-            for ch in range(1, 7):
-                if nw:
-                    if row - ch >= 0 and col - ch >= 0 and (
-                            self.board[row - ch][col - ch] == "No_piece" or self.board[row - ch][col - ch][0] == "s"):
-                        piece.append((row - ch, col - ch))
-                    elif row - ch >= 0 and col - ch >= 0 and self.board[row - ch][col - ch][2] != color:
-                        piece.append((row - ch, col - ch))
-                        nw = False
-                    else:
-                        nw = False
-                if ne:
-                    if row - ch >= 0 and col + ch <= 7 and (
-                            self.board[row - ch][col + ch] == "No_piece" or self.board[row - ch][col + ch][0] == "s"):
-                        piece.append((row - ch, col + ch))
-                    elif row - ch >= 0 and col + ch <= 7 and self.board[row - ch][col + ch][2] != color:
-                        piece.append((row - ch, col + ch))
-                        ne = False
-                    else:
-                        ne = False
-                if se:
-                    if row + ch <= 7 and col + ch <= 7 and (
-                            self.board[row + ch][col + ch] == "No_piece" or self.board[row + ch][col + ch][0] == "s"):
-                        piece.append((row + ch, col + ch))
-                    elif row + ch <= 7 and col + ch <= 7 and self.board[row + ch][col + ch][2] != color:
-                        piece.append((row + ch, col + ch))
-                        se = False
-                    else:
-                        se = False
-                if sw:
-                    if row + ch <= 7 and col - ch >= 0 and (
-                            self.board[row + ch][col - ch] == "No_piece" or self.board[row + ch][col - ch][0] == "s"):
-                        piece.append((row + ch, col - ch))
-                    elif row + ch <= 7 and col - ch >= 0 and self.board[row + ch][col - ch][2] != color:
-                        piece.append((row + ch, col - ch))
-                        sw = False
-                    else:
-                        sw = False
-        else:
-            raise PieceNotOnBoard
-        return piece
-
-    def find_valid_moves(self) -> list[list]:
-        """
-        Перебирает возможные ходы всех фигур на доске
-
-        :returns: Матрица из возможных ходов
-        """
-        self.valid_moves = deepcopy(self.board)
-        for row in range(8):
-            for col in range(8):
-                piece = self.valid_moves[row][col]
-                if piece == 'No_piece' or piece[0] == "s":
-                    self.valid_moves[row][col] = []
-                elif piece == "p_white":
-                    piece = []
-                    if row - 1 >= 0 and self.board[row - 1][col] == "No_piece":
-                        piece.append((row - 1, col))
-                    if col + 1 <= 7 and row - 1 >= 0 and (self.board[row - 1][col + 1][2] == "b"):
-                        piece.append((row - 1, col + 1))
-                    if col - 1 >= 0 and row - 1 >= 0 and self.board[row - 1][col - 1][2] == "b":
-                        piece.append((row - 1, col - 1))
-                    if row == 6 and self.board[row - 1][col] == "No_piece" and self.board[row - 2][col] == "No_piece":
-                        piece.append((row - 2, col))
-                    self.valid_moves[row][col] = piece
-                elif piece == "p_black":
-                    piece = []
-                    if row + 1 <= 7 and self.board[row + 1][col] == "No_piece":
-                        piece.append((row + 1, col))
-                    if col - 1 >= 0 and row + 1 <= 7 and self.board[row + 1][col - 1][2] == "w":
-                        piece.append((row + 1, col - 1))
-                    if col + 1 <= 7 and row + 1 <= 7 and self.board[row + 1][col + 1][2] == "w":
-                        piece.append((row + 1, col + 1))
-                    if row == 1 and self.board[row + 1][col] == "No_piece" and self.board[row + 2][col] == "No_piece":
-                        piece.append((row + 2, col))
-                    self.valid_moves[row][col] = piece
-                elif piece[0] == "n":
-                    color = piece[2]
-                    piece = []
-                    for ch_r in 1, -1, 2, -2:
-                        ch_col = [1, -1] if abs(ch_r) == 2 else [2, -2]
-                        for ch_c in ch_col:
-                            if 0 <= row + ch_r <= 7 and 0 <= col + ch_c <= 7 and self.board[row + ch_r][col + ch_c][
-                                2] != color:
-                                piece.append((row + ch_r, col + ch_c))
-                    self.valid_moves[row][col] = piece
-                elif piece[0] == "r":
-                    color = piece[2]
-                    try:
-                        self.valid_moves[row][col] = self.find_valid_rook_move(row, col, color)
-                    except PieceNotOnBoard:
-                        self.board[row][col] = 'No_piece'
-                elif piece[0] == "b":
-                    color = piece[2]
-                    try:
-                        self.valid_moves[row][col] = self.find_valid_bishop_move(row, col, color)
-                    except PieceNotOnBoard:
-                        self.board[row][col] = 'No_piece'
-                elif piece[0] == "q":
-                    color = piece[2]
-                    try:
-                        self.valid_moves[row][col] = self.find_valid_rook_move(row, col, color) + self.find_valid_bishop_move(
-                            row, col, color)
-                    except PieceNotOnBoard:
-                        self.board[row][col] = 'No_piece'
-                else:
-                    color = piece[2]
-                    piece = []
-                    for ch_r in -1, 0, 1:
-                        for ch_c in -1, 0, 1:
-                            if 0 <= row + ch_r <= 7 and 0 <= col + ch_c <= 7 and self.board[row + ch_r][col + ch_c][
-                                2] != color:
-                                piece.append((row + ch_r, col + ch_c))
-                    self.valid_moves[row][col] = piece
-        return self.valid_moves
+        self.board_renderer(cell_size).set_piece(row * 8 + col, self.board[row][col])
 
     def draw_pos_moves(self, row, col):
         """
@@ -566,25 +574,22 @@ class Chess:
         :param col: Столбец выбранной фигуры
         :type col: int
         """
+        targets = []
         for (pos_c, pos_r) in self.valid_moves[row][col]:
             if 0 <= pos_r <= 7 and 0 <= pos_c <= 7:
-                if self.board[pos_c][pos_r] == "No_piece" or \
-                        (self.board[pos_c][pos_r][0] == "s" and
-                         self.board[self.selected_piece_pos[0]][self.selected_piece_pos[1]][0] != "p"):
-                    self.canvas.create_oval(pos_r * 80 + 30, pos_c * 80 + 30, pos_r * 80 + 50, pos_c * 80 + 50,
-                                            fill="#829769", outline="#829769")
-                else:
-                    c = 18
-                    self.canvas.create_polygon(pos_r * 80, pos_c * 80, pos_r * 80 + c, pos_c * 80, pos_r * 80,
-                                               pos_c * 80 + c, fill="#829769", outline="#829769")
-                    self.canvas.create_polygon(pos_r * 80, (pos_c + 1) * 80, pos_r * 80, (pos_c + 1) * 80 - c,
-                                               pos_r * 80 + c, (pos_c + 1) * 80, fill="#829769", outline="#829769")
-                    self.canvas.create_polygon((pos_r + 1) * 80, (pos_c + 1) * 80, (pos_r + 1) * 80,
-                                               (pos_c + 1) * 80 - c,
-                                               (pos_r + 1) * 80 - c, (pos_c + 1) * 80, fill="#829769",
-                                               outline="#829769")
-                    self.canvas.create_polygon((pos_r + 1) * 80, pos_c * 80, (pos_r + 1) * 80 - c, pos_c * 80,
-                                               (pos_r + 1) * 80, pos_c * 80 + c, fill="#829769", outline="#829769")
+                capture = not (self.board[pos_c][pos_r] == "No_piece" or
+                               (self.board[pos_c][pos_r][0] == "s" and
+                                self.board[self.selected_piece_pos[0]][self.selected_piece_pos[1]][0] != "p"))
+                targets.append((pos_c * 8 + pos_r, capture))
+        self.board_renderer().show_moves(targets)
+
+    def clear_selection(self):
+        """
+        Снимает выделение выбранной фигуры и убирает подсказки ходов
+        """
+        if self.renderer is not None and self.renderer.canvas is self.canvas:
+            self.renderer.select(None)
+            self.renderer.show_moves([])
 
     def on_click(self, event):
         """
@@ -596,7 +601,7 @@ class Chess:
         col = event.x // 80
         row = event.y // 80
 
-        if not (0 <= row < 8 and 0 <= col < 8):
+        if self.pending is not None or not (0 <= row < 8 and 0 <= col < 8):
             return
 
         piece = self.board[row][col]
@@ -610,26 +615,14 @@ class Chess:
             if self.selected_piece_pos is None:
                 if piece != "No_piece" and piece[2] == self.current_player[0]:
                     self.selected_piece_pos = (row, col)
-                    self.canvas.delete("all")
-                    self.draw_board()
-                    self.canvas.create_rectangle(col * 80, row * 80, (col + 1) * 80, (row + 1) * 80, fill="#829769",
-                                                 outline="#829769")
-                    self.draw_piece(row, col)
+                    self.board_renderer().select(row * 8 + col)
                     self.draw_pos_moves(row, col)
 
             elif self.selected_piece_pos == (row, col):
-                self.canvas.delete("all")
-                self.draw_board()
+                self.clear_selection()
                 self.selected_piece_pos = None
             elif piece[2] == self.current_player[0]:
-                self.canvas.delete("all")
-                self.draw_board()
-                self.canvas.create_rectangle(col * 80, row * 80, (col + 1) * 80, (row + 1) * 80, fill="#829769",
-                                             outline="#829769")
-                try:
-                    self.draw_piece(row, col)
-                except UnknownPiece:
-                    self.board[row][col] = "No_piece"
+                self.board_renderer().select(row * 8 + col)
                 self.selected_piece_pos = (row, col)
                 self.draw_pos_moves(row, col)
                 try:
@@ -649,193 +642,266 @@ class Chess:
                     else:
                         print("No king on board")
 
-    def make_move(self, row, col):
+    def after_move(self):
+        """
+        Переключает таймер и перерисовывает изменившиеся клетки сразу после хода. Допустимые ходы и состояние
+        партии пересчитываются в фоновом потоке, если открыто окно доски, иначе — сразу
         """
-        Выполняет ход выбранной фигурой на выбранную клетку, проверяет на условия завершения игры и обновляет доску
+        if self.clock is not None:
+            self.undo_stack[-1].clock = dict(self.clock.remaining)
+        self.stop_timer()
+        self.start_timer()
+        self.write_journal(journal.MOVE, self.undo_stack[-1])
+        self.clear_selection()
+        self.draw_board(squares=self.position.changed_squares(self.position.history[-1][0], self.position.side ^ 1))
+        if self.threaded:
+            self.analyse_in_background()
+        else:
+            self.update_moves()
+            self.finish_move()
 
-        :param row: Ряд, в который перемещается выбранная фигура
-        :type row: int
-        :param col: Столбец, в который перемещается выбранная фигура
-        :type col: int
-        :raises PieceNotOnBoard: Если выбранная фигура или конечная клетка за пределами доски
-        """
-        if 0 <= self.selected_piece_pos[0] < 8 and 0 <= self.selected_piece_pos[
-            1] < 8 and 0 <= row < 8 and 0 <= col < 8:
-            piece = self.board[self.selected_piece_pos[0]][self.selected_piece_pos[1]]
-            for r in range(8):
-                for c in range(8):
-                    if self.board[r][c][0] == "s" and (r, c) != (row, col):
-                        self.board[r][c] = "No_piece"
-            if piece[0] == 'p' and abs(self.selected_piece_pos[0] - row) == 2:
-                piece_pos = self.selected_piece_pos
-                if self.board[piece_pos[0]][piece_pos[1]] == "p_white":
-                    self.board[piece_pos[0] - 1][piece_pos[1]] = "s_white"
-                else:
-                    self.board[piece_pos[0] + 1][piece_pos[1]] = "s_black"
-                self.en_passant_target = (piece_pos[0] + 2, piece_pos[1]) if self.board[piece_pos[0]][piece_pos[1]][2] == "b" \
-                    else (piece_pos[0] - 2, piece_pos[1])
-            if self.board[row][col][0] == "s" and piece[0] == "p":
-                self.board[self.en_passant_target[0]][self.en_passant_target[1]] = "No_piece"
-            if self.selected_piece_pos == self.w_king_pos:
-                if col - self.w_king_pos[1] == 2:
-                    self.w_king_pos = (row, col)
-                    self.board[row][col - 1] = "r_white"
-                    self.board[row][7] = "No_piece"
-                elif col - self.w_king_pos[1] == -2:
-                    self.w_king_pos = (row, col)
-                    self.board[row][col + 1] = "r_white"
-                    self.board[row][0] = "No_piece"
-                self.w_king_pos = (row, col)
-                self.king_moved[1] = True
-            elif self.selected_piece_pos == self.b_king_pos:
-                if col - self.b_king_pos[1] == 2:
-                    self.b_king_pos = (row, col)
-                    self.board[row][col - 1] = "r_black"
-                    self.board[row][7] = "No_piece"
-                elif col - self.b_king_pos[1] == -2:
-                    self.b_king_pos = (row, col)
-                    self.board[row][col + 1] = "r_black"
-                    self.board[row][0] = "No_piece"
-                self.b_king_pos = (row, col)
-                self.king_moved[0] = True
-            for x in 0, 1:
-                for y in 0, 1:
-                    if self.selected_piece_pos == (x * 7, y * 7):
-                        self.rook_moved[x][y] = True
-            self.board[row][col] = piece
-            self.board[self.selected_piece_pos[0]][self.selected_piece_pos[1]] = "No_piece"
-            if piece == "p_white" and row == 0:
-                self.promote(row, col)
-            elif piece == "p_black" and row == 7:
-                self.promote(row, col)
+    def undo_move(self):
+        """
+        Отменяет последний ход, а при игре с компьютером — и его ответ, чтобы снова ходил человек.
+        Текущий перебор компьютера прерывается; перерисовываются только клетки, изменённые отменёнными ходами.
+        Часы возвращаются к показаниям до первого отменённого хода, добавление за отмену не начисляется
+        """
+        if self.pending is not None:
+            if self.engine_stop is None:
+                return
+            self.engine_stop.set()
+            self.engine_stop = None
+            self.pending = None
+        squares = set()
+        records = []
+        record = self.undo()
+        while record is not None:
+            records.append(record)
+            squares.update(self.position.changed_squares(record.move, self.position.side))
+            if self.current_player != self.engine_side or not self.undo_stack:
+                break
+            record = self.undo()
+        if not squares:
+            return
+        self.rewind_timer(records[-1].clock)
+        self.start_timer()
+        for record in records:
+            self.write_journal(journal.UNDO, record)
+        self.clear_selection()
+        self.draw_board(squares=squares)
+        self.finish_move()
+
+    def redo_move(self):
+        """
+        Повторяет последний отменённый ход
+        """
+        if self.pending is None:
+            self.redo()
+
+    def analyse_in_background(self):
+        """
+        Запускает пересчёт допустимых ходов и состояния партии на копии позиции в фоновом потоке.
+        Пока результат не получен, клики по доске игнорируются, а цикл событий Tk не блокируется
+        """
+        results = queue.Queue(maxsize=1)
+        self.pending = results
+        snapshot = self.snapshot()
+        threading.Thread(target=lambda: results.put(snapshot.analyse()), daemon=True).start()
+        self.board_window.after(5, self.poll_analysis, results)
+
+    def poll_analysis(self, results):
+        """
+        Проверяет, готов ли результат фонового пересчёта, и применяет его в потоке Tk
+
+        :param results: Очередь с результатом пересчёта
+        :type results: queue.Queue
+        """
+        if results is not self.pending:
+            return
+        try:
+            snapshot = results.get_nowait()
+        except queue.Empty:
+            self.board_window.after(5, self.poll_analysis, results)
+            return
+        self.pending = None
+        self.valid_moves = snapshot.valid_moves
+        self.legal, self.legal_key = snapshot.legal, snapshot.legal_key
+        self.status = snapshot.status
+        self.finish_move()
+
+    def finish_move(self):
+        """
+        Выделяет короля под шахом и проверяет условия завершения игры по вычисленному состоянию партии
+        """
+        self.highlight_checked_king()
+        self.check_game_over()
+        self.show_tablebase()
+        self.show_profile()
+        self.engine_turn()
+
+    def show_profile(self):
+        """
+        Выводит поверх окна доски итоги профилирования последнего полухода, если они включены
+        """
+        if self.profile_label is not None:
+            self.profile_label.config(text=profiler.active.summary(limit=3))
+
+    def engine_turn(self):
+        """
+        Запускает перебор компьютера, если сейчас его ход и партия не окончена
+        """
+        if self.threaded and self.result is None and self.current_player == self.engine_side:
+            self.engine_move_in_background()
+
+    def open_book(self):
+        """
+        Открывает дебютную книгу, выбранную в настройках, если она ещё не открыта
+
+        :returns: Открытая книга или None, если книга не выбрана или не открывается
+        """
+        import book
+        if self.engine_book is not None and self.engine_book.path != self.engine_book_path:
+            self.engine_book.close()
+            self.engine_book = None
+        if self.engine_book is None and self.engine_book_path:
+            try:
+                self.engine_book = book.OpeningBook(self.engine_book_path)
+            except (OSError, ValueError):
+                print("Не удалось открыть дебютную книгу")
+                self.engine_book_path = None
+        return self.engine_book
+
+    def open_tablebase(self):
+        """
+        Открывает каталог эндшпильных таблиц, выбранный в настройках, если он ещё не открыт
+
+        :returns: Открытые таблицы или None, если каталог не выбран или не существует
+        """
+        import tablebase
+        if self.tablebase is not None and self.tablebase.directory != self.tablebase_path:
+            self.tablebase.close()
+            self.tablebase = None
+        if self.tablebase is None and self.tablebase_path:
+            try:
+                self.tablebase = tablebase.Tablebase(self.tablebase_path)
+            except OSError:
+                print("Не удалось открыть эндшпильные таблицы")
+                self.tablebase_path = None
+        return self.tablebase
+
+    def show_tablebase(self):
+        """
+        Выводит в заголовке окна результат позиции по эндшпильным таблицам: кто и через сколько ходов ставит мат
+        """
+        tablebase = self.open_tablebase()
+        if tablebase is None or self.result is not None:
+            return
+        mate = tablebase.mate_in(self.position)
+        if mate is None:
+            return
+        if not mate:
+            self.board_window.title("Шахматы — ничья по эндшпильным таблицам")
+            return
+        moves = abs(mate)
+        word = "ход" if moves % 10 == 1 and moves % 100 != 11 else \
+            "хода" if 2 <= moves % 10 <= 4 and not 12 <= moves % 100 <= 14 else "ходов"
+        winner = "Белые" if (self.current_player == "white") == (mate > 0) else "Чёрные"
+        self.board_window.title(f"Шахматы — {winner} ставят мат в {moves} {word}")
+
+    def engine_move_in_background(self):
+        """
+        Запускает поиск хода компьютера на копии позиции в фоновом потоке: сначала ход ищется в дебютной книге,
+        затем перебором. Пока ход не найден, клики по доске игнорируются, а цикл событий Tk не блокируется
+        """
+        import search
+        import tt
+        results = queue.Queue(maxsize=1)
+        self.pending = results
+        self.engine_stop = threading.Event()
+        if self.engine_table is None:
+            self.engine_table = tt.TranspositionTable(search.HASH_MB)
+        position = self.position.copy()
+        depth, limit, stop, table = self.engine_depth, self.engine_time, self.engine_stop, self.engine_table
+        workers, opening_book, tablebase = self.engine_workers, self.open_book(), self.open_tablebase()
+
+        def think():
+            """
+            Выбирает ход компьютера и передаёт результат в очередь: (результат, взят ли ход из книги)
+            """
+            move = opening_book.find(position) if opening_book is not None else None
+            if move is not None:
+                results.put((search.SearchResult(move, 0, 0, 0, 0.0, [move]), True))
+            elif workers > 1:
+                import smp
+                results.put((smp.parallel_search(position, depth, limit, workers, search.HASH_MB, stop, tablebase),
+                             False))
             else:
-                self.find_valid_moves()
-                self.canvas.delete("all")
-                self.draw_board()
-                self.highlight_checked_king()
-                if self.current_player == "white":
-                    self.current_player = "black"
-                else:
-                    self.current_player = "white"
-                self.stop_timer()
-                self.start_timer()
-                self.simulate("b" if self.current_player == "black" else "w")
-                self.castle()
-                self.is_mate()
-                self.is_stalemate()
-        else:
-            raise PieceNotOnBoard
+                results.put((search.best_move(position, depth, limit, stop, table=table, tablebase=tablebase), False))
 
-    def highlight_checked_king(self):
+        threading.Thread(target=think, daemon=True).start()
+        self.board_window.after(20, self.poll_engine, results)
+
+    def poll_engine(self, results):
         """
-        Выделяет короля, который находится под шахом
+        Проверяет, найден ли ход компьютера, и выполняет его в потоке Tk. Глубина, число узлов и скорость
+        перебора выводятся в заголовке окна. Ход, найденный после окончания партии (например, по времени),
+        отбрасывается
 
-        :raises PieceNotOnBoard: Если король находится за пределами доски
+        :param results: Очередь с результатом перебора
+        :type results: queue.Queue
         """
-        king_on_check = (0, 0)
-        if self.is_square_under_attack(self.w_king_pos[0], self.w_king_pos[1], 'w'):
-            king_on_check = self.w_king_pos
-        elif self.is_square_under_attack(self.b_king_pos[0], self.b_king_pos[1], 'b'):
-            king_on_check = self.b_king_pos
-        if 0 <= king_on_check[0] < 8 and 0 <= king_on_check[1] < 8:
-            if self.is_square_under_attack(self.w_king_pos[0], self.w_king_pos[1], 'w') or \
-                    self.is_square_under_attack(self.b_king_pos[0], self.b_king_pos[1], 'b'):
-                self.canvas.create_rectangle(king_on_check[1] * 80, king_on_check[0] * 80, (king_on_check[1] + 1) * 80,
-                                             (king_on_check[0] + 1) * 80, outline='red', width=4)
+        if results is not self.pending:
+            return
+        try:
+            result, from_book = results.get_nowait()
+        except queue.Empty:
+            self.board_window.after(20, self.poll_engine, results)
+            return
+        self.pending = None
+        self.engine_stop = None
+        if result.move is None or self.result is not None:
+            return
+        if from_book:
+            self.board_window.title("Шахматы — ход из дебютной книги")
         else:
-            raise PieceNotOnBoard
+            self.board_window.title(f"Шахматы — глубина {result.depth}, узлов {result.nodes}, {result.nps} узл/с")
+        frm, to, promo = result.move & 63, result.move >> 6 & 63, result.move >> 12 & 7
+        promotion = next((name for name, ptype in PROMOTION_PIECES.items() if ptype == promo), None)
+        self.selected_piece_pos = (frm >> 3, frm & 7)
+        self.make_move(to >> 3, to & 7, promotion)
+        self.selected_piece_pos = None
 
-    def is_square_under_attack(self, row, col, color) -> bool:
+    def game_over(self, message):
         """
-        Проверяет, находится ли клетка под атакой фигуры противника
+        Завершает партию (матом, патом, ничьей или по времени): фиксирует результат, прерывает перебор
+        компьютера, останавливает таймер, удаляет журнал, чтобы оконченная партия не предлагалась
+        к восстановлению, и выводит окно завершения игры
 
-        :param row: Ряд клетки для проверки
-        :type row: int
-        :param col: Столбец клетки для проверки
-        :type col: int
-        :param color: Цвет фигуры на проверяемой клетке
-        :type color: str
-        :returns: Находится ли фигура под атакой
+        :param message: Сообщение о результате партии
+        :type message: str
         """
-        opp_col = "b" if color[0] == "w" else "w"
-        for brd_r in range(8):
-            for brd_c in range(8):
-                if self.board[brd_r][brd_c][2] == opp_col and (row, col) in self.valid_moves[brd_r][brd_c] and \
-                        self.board[row][col] != "No_piece":
-                    return True
-        return False
+        super().game_over(message)
+        if self.engine_stop is not None:
+            self.engine_stop.set()
+        self.stop_timer()
+        if profiler.active is not None:
+            profiler.active.dump()
+        self.close_journal(remove=True)
+        self.show_end_game_dialog(message)
 
-    def simulate(self, player):
+    def highlight_checked_king(self):
         """
-        Исключает ходы, приводящие к шаху собственного короля
+        Выделяет короля, который находится под шахом
 
-        :param player: Цвет игрока для проверки
-        :type player: str
+        :raises PieceNotOnBoard: Если король находится за пределами доски
         """
-        if player[0] == "w" or player[0] == "b":
-            valid_after_simulate = [[[] for _ in range(8)] for _ in range(8)]
-            for row in range(8):
-                for col in range(8):
-                    moves = self.valid_moves[row][col]
-                    for move in moves:
-                        row_move, col_move = move
-                        on_cell_piece = self.board[row_move][col_move]
-                        self.board[row][col], self.board[row_move][col_move] = "No_piece", self.board[row][col]
-                        self.find_valid_moves()
-                        if player == "w":
-                            if self.board[row_move][col_move] == "k_white":
-                                if not self.is_square_under_attack(row_move, col_move, "w"):
-                                    valid_after_simulate[row][col].append(move)
-                            elif not self.is_square_under_attack(self.w_king_pos[0], self.w_king_pos[1], "w"):
-                                valid_after_simulate[row][col].append(move)
-                        else:
-                            if self.board[row_move][col_move] == "k_black":
-                                if not self.is_square_under_attack(row_move, col_move, "b"):
-                                    valid_after_simulate[row][col].append(move)
-                            elif not self.is_square_under_attack(self.b_king_pos[0], self.b_king_pos[1], "b"):
-                                valid_after_simulate[row][col].append(move)
-                        self.board[row][col], self.board[row_move][col_move] = self.board[row_move][
-                            col_move], on_cell_piece
-                        self.find_valid_moves()
-            self.valid_moves = valid_after_simulate
-
-    def no_moves(self) -> bool:
-        """
-        Проверяет, может ли игрок сделать ход
-
-        :returns: True если игрок не может сделать ход
-        """
-        for row in range(8):
-            for col in range(8):
-                if self.board[row][col][2] == self.current_player[0] and self.valid_moves[row][col] != []:
-                    return False
-        return True
-
-    def is_mate(self) -> bool:
-        """
-        Проверяет, получил ли ходящий игрок мат
-
-        :returns: True если игрок получил мат
-        """
-        king = self.w_king_pos if self.current_player == "white" else self.b_king_pos
-        if self.is_square_under_attack(king[0], king[1], self.current_player[0]) and self.no_moves():
-            self.stop_timer()
-            self.show_end_game_dialog("Мат! Победили " + ("Чёрные" if self.current_player == "white" else "Белые"))
-            return True
-        return False
-
-    def is_stalemate(self) -> bool:
-        """
-        Проверяет, является ли позиция игрока патом
-
-        :returns: True если позиция патовая
-        """
-        king = self.w_king_pos if self.current_player == "white" else self.b_king_pos
-        if not self.is_square_under_attack(king[0], king[1], self.current_player[0]) and self.no_moves():
-            self.stop_timer()
-            self.show_end_game_dialog("Пат! Ничья")
-            return True
-        return False
+        king_on_check = self.w_king_pos if self.current_player == "white" else self.b_king_pos
+        if not (0 <= king_on_check[0] < 8 and 0 <= king_on_check[1] < 8):
+            raise PieceNotOnBoard
+        if self.game_status().in_check:
+            self.board_renderer().show_check(king_on_check[0] * 8 + king_on_check[1])
+        elif self.renderer is not None and self.renderer.canvas is self.canvas:
+            self.renderer.show_check(None)
 
     def show_end_game_dialog(self, message):
         """
@@ -844,6 +910,7 @@ class Chess:
         :param message: Сообщение, которое необходимо вывести в окне завершения игры
         :type message: str
         """
+        import tkinter as tk
         self.stop_timer()
         end_window = tk.Toplevel(self.board_window)
         end_window.title("Игра окончена")
@@ -894,80 +961,126 @@ class Chess:
         :type end_window: tk.Toplevel
         """
         self.stop_timer()
+        if self.engine_stop is not None:
+            self.engine_stop.set()
+        self.close_journal(remove=True)
+        if profiler.active is not None:
+            if self.result is None:
+                profiler.active.dump()
+            profiler.active.reset()
+        self.close_engine_files()
         end_window.destroy()
         self.board_window.destroy() if end_window != self.board_window else None
 
-        self.__init__()
+        book_path, tablebase_path = self.engine_book_path, self.tablebase_path
+        self.__init__(pth=self.path, backend=self.backend)
+        self.engine_book_path, self.tablebase_path = book_path, tablebase_path
         self.setting()
 
+    def close_engine_files(self):
+        """
+        Закрывает отображённые в память дебютную книгу и эндшпильные таблицы. Пути к ним сохраняются,
+        и файлы открываются заново при следующем обращении
+        """
+        if self.engine_book is not None:
+            self.engine_book.close()
+            self.engine_book = None
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+
     def format_time(self, seconds) -> str:
         """
-        Форматирует время (формат ММ:СС)
+        Форматирует время (формат ММ:СС). Неполная секунда округляется вверх, поэтому 00:00 выводится,
+        только когда время вышло
 
         :param seconds: Количество секунд
         :type seconds: float
         :returns: Отформатированное время
         """
+        seconds = max(math.ceil(seconds), 0)
         mins = seconds // 60
         secs = seconds % 60
         return f"{mins:02d}:{secs:02d}"
 
-    def update_timer(self):
+    def show_time(self, player):
         """
-        Каждую секунду обновляет таймер игроков
+        Выводит остаток времени игрока, если выводимое значение изменилось
+
+        :param player: Игрок
+        :type player: str
+        :returns: Остаток времени в секундах
         """
-        if self.player_time[self.current_player] > 0:
-            self.player_time[self.current_player] -= 1
-            self.timer_labels[self.current_player].config(text=self.format_time(self.player_time[self.current_player]))
-            if self.player_time[self.current_player] == 0:
-                winner = "Чёрные" if self.current_player == "white" else "Белые"
-                self.stop_timer()
-                self.show_end_game_dialog(f"Время вышло! Победили {winner}")
-                return
+        left = self.clock.left(player)
+        text = self.format_time(left)
+        if self.timer_text.get(player) != text:
+            self.timer_text[player] = text
+            self.timer_labels[player].config(text=text)
+        return left
 
-        self.after_id = self.board_window.after(1000, self.update_timer)
+    def update_timer(self):
+        """
+        Обновляет часы игрока, чей ход, и планирует следующее обновление на момент смены выводимого значения
+        """
+        player = self.clock.running
+        if self.show_time(player) <= 0:
+            self.after_id = None
+            self.game_over("Время вышло! Победили " + ("Чёрные" if player == "white" else "Белые"))
+            return
+        self.after_id = self.board_window.after(math.ceil(self.clock.next_change() * 1000), self.update_timer)
 
     def start_timer(self):
         """
-        Запускает таймер для текущего игрока
+        Запускает часы текущего игрока
         """
         if not self.timer_running:
+            if self.clock is None:
+                self.clock = ChessClock(self.player_time, self.increment, self.delay)
             self.timer_running = True
+            self.clock.start(self.current_player)
             self.update_timer()
 
     def stop_timer(self):
         """
-        Останавливает таймер (при переходе хода или окончании игры)
+        Останавливает часы (при переходе хода или окончании игры), списывая время хода с учётом добавления
+        и задержки
         """
-        if self.timer_running and self.after_id is not None:
-            self.board_window.after_cancel(self.after_id)
-            self.after_id = None
+        if self.timer_running:
+            if self.after_id is not None:
+                self.board_window.after_cancel(self.after_id)
+                self.after_id = None
             self.timer_running = False
+            player = self.clock.running
+            self.clock.stop()
+            self.show_time(player)
 
-    def castle(self):
+    def rewind_timer(self, clock):
         """
-        Проверяет на возможность выполнения рокировки
+        Останавливает часы при отмене ходов без добавления и задержки и возвращает показания,
+        сохранённые до первого отменённого хода
+
+        :param clock: Остаток времени игроков до отменённого хода (None — списать потраченное время)
+        :type clock: dict{str: float}
         """
-        for c in 0, 1:
-            color = "w" if c == 1 else "b"
-            if not (self.rook_moved[c][0] or self.king_moved[c]) and \
-                    all(x == "No_piece" for x in self.board[c * 7][1:4]) and \
-                    all(not (self.is_square_under_attack(c * 7, x, color)) for x in (2, 3, 4)):
-                self.valid_moves[c * 7][4].append((c * 7, 2))
-            if not (self.rook_moved[c][1] or self.king_moved[c]) and \
-                    all(x == "No_piece" for x in self.board[c * 7][5:7]) and \
-                    all(not (self.is_square_under_attack(c * 7, x, color)) for x in (4, 5, 6)):
-                self.valid_moves[c * 7][4].append((c * 7, 6))
+        if self.after_id is not None:
+            self.board_window.after_cancel(self.after_id)
+            self.after_id = None
+        self.timer_running = False
+        if self.clock is not None:
+            self.clock.restore(clock)
+            for player in "white", "black":
+                self.show_time(player)
 
     def promote(self, row, col):
         """
-        Выполняет превращение пешки при достижении последней горизонтали
+        Открывает окно выбора фигуры для превращения пешки при достижении последней горизонтали
 
         :param row: Ряд клетки с пешкой
         :type row: int
         :param col: Столбец клетки с пешкой
         :type col: int
         """
+        import tkinter as tk
         def select_piece(piece_type):
             """
             Заменяет пешку на выбранную фигуру и проводит все необходимые проверки
@@ -975,21 +1088,7 @@ class Chess:
             :param piece_type: Выбранная фигура
             :type piece_type: str
             """
-            new_piece = f"{piece_type[0] if piece_type != "knight" else "n"}_{color}"
-            self.board[row][col] = new_piece
-            self.find_valid_moves()
-            opponent_king = self.b_king_pos if color == "white" else self.w_king_pos
-            is_check = self.is_square_under_attack(opponent_king[0], opponent_king[1], "b" if color == "white" else "w")
-            self.canvas.delete("all")
-            self.draw_board()
-
-            if is_check:
-                self.highlight_checked_king()
-            self.current_player = "black" if self.current_player == "white" else "white"
-            self.simulate("b" if self.current_player == "black" else "w")
-            self.castle()
-            self.is_mate()
-            self.is_stalemate()
+            self.complete_promotion(piece_type)
             promote_window.destroy()
 
         if (self.current_player == "white" and row == 0) or (self.current_player == "black" and row == 7):
@@ -1015,6 +1114,38 @@ class Chess:
 
 
 if __name__ == "__main__":
+    sys.modules.setdefault("chess", sys.modules[__name__])  # bench и другие модули получают те же классы
+    if "--profile" in sys.argv:
+        index = sys.argv.index("--profile")
+        del sys.argv[index]
+        report = sys.argv.pop(index) if index < len(sys.argv) and sys.argv[index].endswith((".json", ".csv")) \
+            else None
+        profiler.enable((Game, Chess), report)
+    else:
+        profiler.enable_from_environment((Game, Chess))
+    if len(sys.argv) > 1 and sys.argv[1] == "perft":
+        import perft
+        sys.exit(perft.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "pgn":
+        import pgn
+        sys.exit(pgn.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        import search
+        sys.exit(search.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "book":
+        import book
+        sys.exit(book.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "tablebase":
+        import tablebase
+        sys.exit(tablebase.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "journal":
+        sys.exit(journal.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        import bench
+        sys.exit(bench.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "server":
+        import server
+        sys.exit(server.main(sys.argv[2:]))
     paths = input('Введите относительный путь папки, где находятся фигуры\nПо умолчанию папка называется "pieces"\n-> ')
     paths = paths.strip('/')
     chess = Chess(pth=paths if paths else "pieces")
@@ -0,0 +1,110 @@
+"""
+Шахматные часы. Время хода измеряется по time.monotonic() от начала хода до его передачи, поэтому
+на показания не влияют ни перевод системных часов, ни задержки цикла событий Tk, ни время обработки хода
+"""
+import math
+import time
+
+
+class ChessClock:
+    """
+    Шахматные часы с добавлением Фишера и задержкой Бронштейна
+
+    :ivar remaining: Остаток времени каждого игрока в секундах на начало текущего хода
+    :type remaining: dict{str: float}
+    :ivar increment: Добавление Фишера: секунды, прибавляемые после каждого сделанного хода
+    :type increment: float
+    :ivar delay: Задержка Бронштейна: после хода возвращается потраченное на него время, но не больше задержки
+    :type delay: float
+    :ivar running: Игрок, чьи часы идут (None — часы остановлены)
+    :type running: str
+    :ivar started: Момент начала текущего хода по монотонным часам
+    :type started: float
+    """
+    __slots__ = ("remaining", "increment", "delay", "running", "started", "_now")
+
+    def __init__(self, remaining, increment=0.0, delay=0.0, now=time.monotonic):
+        """
+        :param remaining: Начальное время каждого игрока в секундах (словарь изменяется часами)
+        :type remaining: dict{str: float}
+        :param increment: Добавление Фишера в секундах
+        :type increment: float
+        :param delay: Задержка Бронштейна в секундах
+        :type delay: float
+        :param now: Источник монотонного времени
+        :type now: function
+        """
+        self.remaining = remaining
+        self.increment = increment
+        self.delay = delay
+        self.running = None
+        self.started = 0.0
+        self._now = now
+
+    def start(self, player):
+        """
+        Запускает часы игрока
+
+        :param player: Игрок ("white" или "black")
+        :type player: str
+        """
+        self.running = player
+        self.started = self._now()
+
+    def stop(self) -> float:
+        """
+        Останавливает идущие часы и списывает время хода. Если время не вышло, игроку возвращается
+        задержка Бронштейна (не больше потраченного) и прибавляется добавление Фишера
+
+        :returns: Время хода в секундах (0, если часы не шли)
+        """
+        player = self.running
+        if player is None:
+            return 0.0
+        elapsed = self._now() - self.started
+        left = self.remaining[player] - elapsed
+        if left > 0:
+            left += min(elapsed, self.delay) + self.increment
+        self.remaining[player] = max(left, 0.0)
+        self.running = None
+        return elapsed
+
+    def restore(self, remaining=None):
+        """
+        Останавливает часы без добавления и задержки (при отмене ходов) и возвращает сохранённые показания.
+        Если показаний нет, игроку, чьи часы шли, списывается потраченное время
+
+        :param remaining: Остаток времени игроков, сохранённый до отменённого хода
+        :type remaining: dict{str: float}
+        """
+        if remaining is not None:
+            self.remaining.update(remaining)
+        elif self.running is not None:
+            self.remaining[self.running] = max(self.left(self.running), 0.0)
+        self.running = None
+
+    def left(self, player) -> float:
+        """
+        Вычисляет остаток времени игрока на текущий момент
+
+        :param player: Игрок
+        :type player: str
+        :returns: Остаток в секундах (может быть отрицательным, если время вышло, а часы ещё идут)
+        """
+        if player != self.running:
+            return self.remaining[player]
+        return self.remaining[player] - (self._now() - self.started)
+
+    def next_change(self) -> float:
+        """
+        Вычисляет, через сколько секунд изменится показание идущих часов, выводимых с точностью до секунды
+        (с округлением вверх)
+
+        :returns: Время до смены показания в секундах (0, если время вышло или часы остановлены)
+        """
+        if self.running is None:
+            return 0.0
+        left = self.left(self.running)
+        if left <= 0:
+            return 0.0
+        return left - (math.ceil(left) - 1)
@@ -0,0 +1,704 @@
+"""
+Правила игры без графического интерфейса: позиция, генерация допустимых ходов, выполнение ходов, рокировка,
+превращение пешки и определение окончания партии. Модуль не импортирует tkinter и Pillow, поэтому подходит
+для пакетной обработки партий и фоновых процессов
+"""
+from attacks import AttackMapPosition
+from position import BoardView, GameStatus, PieceNotOnBoard, WHITE, BLACK, COLOR_NAMES, \
+    ROOK_DIRS, BISHOP_DIRS, FLAG_CASTLE, QUEEN, ROOK, BISHOP, KNIGHT, CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ
+from san import InvalidSan, MoveIndex, check_suffix
+
+
+BACKENDS = ("mailbox", "bitboard")
+PROMOTION_PIECES = {"queen": QUEEN, "rook": ROOK, "bishop": BISHOP, "knight": KNIGHT}
+
+
+class IllegalMove(Exception):
+    """
+    Исключение. Вызывается, если запрошенный ход не входит в число допустимых ходов позиции
+    """
+    pass
+
+
+class StaleMoves(Exception):
+    """
+    Исключение. Вызывается, если допустимые ходы сгенерированы не для текущей позиции (например, фоновый
+    пересчёт после хода ещё не применён), и запись хода в SAN по ним была бы неверной
+    """
+    pass
+
+
+class MoveRecord:
+    """
+    Запись сделанного хода для отмены и повтора. Взятая фигура, права на рокировку и поле взятия на проходе
+    позиции хранятся в истории Position и восстанавливаются Position.unmake; запись хранит только состояние партии,
+    которое позиция не ведёт
+
+    :ivar move: Код хода (клетки, фигура превращения, признак)
+    :type move: int
+    :ivar en_passant_target: Пешка, которую можно было взять на проходе до хода
+    :type en_passant_target: tuple(int, int)
+    :ivar w_king_pos: Положение белого короля до хода
+    :type w_king_pos: tuple(int, int)
+    :ivar b_king_pos: Положение чёрного короля до хода
+    :type b_king_pos: tuple(int, int)
+    :ivar moved: Записи о ходах королей и ладей до хода, упакованные в биты
+    :type moved: int
+    :ivar san: Запись хода в SAN
+    :type san: str
+    :ivar clock: Остаток времени игроков до хода (заполняется окном доски, None без часов)
+    :type clock: dict{str: float}
+    """
+    __slots__ = ("move", "en_passant_target", "w_king_pos", "b_king_pos", "moved", "san", "clock")
+
+    def __init__(self, move, en_passant_target, w_king_pos, b_king_pos, moved, san=None):
+        self.move = move
+        self.en_passant_target = en_passant_target
+        self.w_king_pos = w_king_pos
+        self.b_king_pos = b_king_pos
+        self.moved = moved
+        self.san = san
+        self.clock = None
+
+
+class Game:
+    """
+    Класс, реализующий правила игры "Шахматы" без графического интерфейса
+
+    :ivar w_king_pos: Позиция белого короля
+    :type w_king_pos: tuple(int, int)
+    :ivar b_king_pos: Позиция чёрного короля
+    :type b_king_pos: tuple(int, int)
+    :ivar backend: Выбранный генератор ходов ("mailbox" или "bitboard")
+    :type backend: str
+    :ivar position: Компактное представление позиции, по которому генерируются ходы
+    :type position: Position
+    :ivar board: Строковое представление позиции (запись в клетку изменяет позицию)
+    :type board: BoardView
+    :ivar current_player: Игрок, чей ход ожидается
+    :type current_player: str
+    :ivar en_passant_target: Пешка, которая может быть взята на проходе
+    :type en_passant_target: tuple(int, int)
+    :ivar king_moved: Запись случившегося хода короля для исключения рокировки
+    :type king_moved: list[bool]
+    :ivar rook_moved: Запись хода ладьи для исключения рокировки
+    :type rook_moved: list[list[bool]]
+    :ivar selected_piece_pos: Запись выбранной фигуры
+    :type selected_piece_pos: tuple(int, int)
+    :ivar promotion_move: Ход пешки на последнюю горизонталь, ожидающий выбора фигуры
+    :type promotion_move: int
+    :ivar valid_moves: Массив возможных ходов
+    :type valid_moves: list[list]
+    :ivar legal: Коды допустимых ходов ходящего игрока, включая рокировки и все превращения
+    :type legal: list[int]
+    :ivar legal_key: Ключ позиции, для которой сгенерированы legal (None — ещё не сгенерированы)
+    :type legal_key: int
+    :ivar notation: Сделанные ходы в записи SAN
+    :type notation: list[str]
+    :ivar undo_stack: Записи сделанных ходов, которые можно отменить
+    :type undo_stack: list[MoveRecord]
+    :ivar redo_stack: Записи отменённых ходов, которые можно повторить (последний отменённый — в конце)
+    :type redo_stack: list[MoveRecord]
+    :ivar status: Состояние партии, вычисленное для текущего полухода (None, если ещё не вычислено)
+    :type status: GameStatus
+    :ivar result: Сообщение о результате партии (None, пока партия не окончена)
+    :type result: str
+    """
+
+    def __init__(self, backend="mailbox"):
+        """
+        Инициализация начальной позиции и допустимых ходов белых
+
+        :param backend: Генератор ходов: "mailbox" (по доске из 64 клеток) или "bitboard" (на битбордах)
+        :type backend: str
+        :raises ValueError: Если генератор ходов неизвестен
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный генератор ходов: {backend}")
+        self.backend = backend
+        self.status = None
+        self.result = None
+        self.notation = []
+        self.legal = []
+        self.legal_key = None
+        self.undo_stack = []
+        self.redo_stack = []
+        self.board = self.initialize_board()
+        self.selected_piece_pos = None
+        self.promotion_move = None
+        self.king_moved = [False, False]
+        self.rook_moved = [[False, False], [False, False]]
+        self.en_passant_target = None
+        self.simulate(self.current_player)
+
+    def initialize_board(self) -> BoardView:
+        """
+        Инициализация расстановки фигур в начале партии
+        """
+        self.position = self.position_class().initial()
+        self.b_king_pos = (0, 4)
+        self.w_king_pos = (7, 4)
+
+        return self.board
+
+    @classmethod
+    def from_fen(cls, fen, **kwargs) -> "Game":
+        """
+        Создаёт партию из позиции в нотации FEN без воспроизведения ходов
+
+        :param fen: Запись позиции в нотации Форсайта-Эдвардса
+        :type fen: str
+        :param kwargs: Аргументы конструктора (backend, ...)
+        :returns: Партия с заданной позицией
+        :raises ValueError: Если запись FEN некорректна
+        :raises UnknownPiece: Если в записи встретилась неизвестная фигура
+        """
+        game = cls(**kwargs)
+        game.set_fen(fen)
+        return game
+
+    def set_fen(self, fen):
+        """
+        Устанавливает позицию из записи FEN и согласует с ней записи о ходах короля и ладей, положения королей
+        и пешку, которую можно взять на проходе
+
+        :param fen: Запись позиции в нотации Форсайта-Эдвардса
+        :type fen: str
+        :raises ValueError: Если запись FEN некорректна
+        :raises UnknownPiece: Если в записи встретилась неизвестная фигура
+        """
+        position = self.position_class().from_fen(fen)
+        self.position = position
+        w_king, b_king = position.kings
+        self.w_king_pos = (w_king >> 3, w_king & 7) if w_king >= 0 else (-1, -1)
+        self.b_king_pos = (b_king >> 3, b_king & 7) if b_king >= 0 else (-1, -1)
+        castling = position.castling
+        self.rook_moved = [[not castling & CASTLE_BQ, not castling & CASTLE_BK],
+                           [not castling & CASTLE_WQ, not castling & CASTLE_WK]]
+        self.king_moved = [not castling & (CASTLE_BK | CASTLE_BQ), not castling & (CASTLE_WK | CASTLE_WQ)]
+        if position.ep >= 0:
+            sq = position.ep + (8 if position.side == WHITE else -8)
+            self.en_passant_target = (sq >> 3, sq & 7)
+        else:
+            self.en_passant_target = None
+        self.status = None
+        self.result = None
+        self.notation = []
+        self.undo_stack = []
+        self.redo_stack = []
+        self.selected_piece_pos = None
+        self.promotion_move = None
+        self.update_moves()
+
+    def to_fen(self) -> str:
+        """
+        Записывает текущую позицию в нотации FEN
+
+        :returns: Запись FEN
+        """
+        return self.position.to_fen()
+
+    @property
+    def board(self) -> BoardView:
+        """
+        Строковое представление позиции в прежнем формате list[list[str]]
+        """
+        return BoardView(self.position)
+
+    @board.setter
+    def board(self, rows):
+        if isinstance(rows, BoardView) and rows.position is getattr(self, "position", None):
+            return
+        side = self.position.side if hasattr(self, "position") else WHITE
+        self.position = self.position_class().from_rows(rows, side)
+        self.status = None
+
+    def position_class(self) -> type:
+        """
+        Возвращает класс позиции для выбранного генератора ходов: генератору по доске нужна позиция с картами атак,
+        битбордам — позиция, поддерживающая маски фигур
+
+        :returns: AttackMapPosition или BitboardPosition
+        """
+        if self.backend == "bitboard":
+            from bitboard import BitboardPosition
+            return BitboardPosition
+        return AttackMapPosition
+
+    def legal_moves(self) -> list:
+        """
+        Генерирует допустимые ходы игрока, чей ход, выбранным генератором
+
+        :returns: Коды допустимых ходов
+        """
+        if self.backend == "bitboard":
+            import bitboard
+            return bitboard.legal_moves(self.position)
+        return self.position.legal_moves()
+
+    @property
+    def current_player(self) -> str:
+        """
+        Игрок, чей ход ожидается ("white" или "black")
+        """
+        return COLOR_NAMES[self.position.side]
+
+    @current_player.setter
+    def current_player(self, player):
+        self.position.side = WHITE if player == "white" else BLACK
+        self.status = None
+
+    def find_valid_rook_move(self, row, col, color) -> list:
+        """
+        Перебор всех возможных ходов ладьёй
+
+        :param row: Ряд, в котором находится фигура
+        :type row: int
+        :param col: Столбец, в который находится фигура
+        :type col: int
+        :param color: Цвет фигуры
+        :type color: str
+        :returns: Возможные ходы ладьёй
+        :raises PieceNotOnBoard: Если фигура, для которой выполняется подбор, находится не в пределах доски
+        """
+        if 0 <= row < 8 and 0 <= col < 8:
+            targets = self.position.slider_targets(row * 8 + col, ROOK_DIRS, WHITE if color[0] == "w" else BLACK)
+        else:
+            raise PieceNotOnBoard
+
+        return [(t >> 3, t & 7) for t in targets]
+
+    def find_valid_bishop_move(self, row, col, color) -> list:
+        """
+        Перебор всех возможных ходов слоном
+
+        :param row: Ряд, в котором находится фигура
+        :type row: int
+        :param col: Столбец, в который находится фигура
+        :type col: int
+        :param color: Цвет фигуры
+        :type color: str
+        :returns: Возможные ходы слоном
+        :raises PieceNotOnBoard: Если фигура, для которой выполняется подбор, находится не в пределах доски
+        """
+        if 0 <= row < 8 and 0 <= col < 8:
+            targets = self.position.slider_targets(row * 8 + col, BISHOP_DIRS, WHITE if color[0] == "w" else BLACK)
+        else:
+            raise PieceNotOnBoard
+        return [(t >> 3, t & 7) for t in targets]
+
+    def find_valid_moves(self) -> list[list]:
+        """
+        Перебирает возможные ходы всех фигур на доске (без учёта шаха собственному королю).
+        Просматриваются только клетки из списков фигур, а не вся доска
+
+        :returns: Матрица из возможных ходов
+        """
+        self.valid_moves = [[[] for _ in range(8)] for _ in range(8)]
+        position = self.position
+        if self.backend == "bitboard":
+            import bitboard
+            for sq, targets in bitboard.all_targets(position).items():
+                self.valid_moves[sq >> 3][sq & 7] = [(t >> 3, t & 7) for t in targets]
+            return self.valid_moves
+        for color in WHITE, BLACK:
+            for sq in position.pieces[color]:
+                self.valid_moves[sq >> 3][sq & 7] = [(t >> 3, t & 7) for t in position.targets(sq)]
+        return self.valid_moves
+
+    def make_move(self, row, col, promotion=None):
+        """
+        Выполняет ход выбранной фигурой на выбранную клетку и проверяет на условия завершения игры
+
+        :param row: Ряд, в который перемещается выбранная фигура
+        :type row: int
+        :param col: Столбец, в который перемещается выбранная фигура
+        :type col: int
+        :param promotion: Фигура для превращения пешки ("queen", "rook", "bishop", "knight").
+            Если не задана, выбор запрашивается методом promote
+        :type promotion: str
+        :raises PieceNotOnBoard: Если выбранная фигура или конечная клетка за пределами доски
+        """
+        if 0 <= self.selected_piece_pos[0] < 8 and 0 <= self.selected_piece_pos[
+            1] < 8 and 0 <= row < 8 and 0 <= col < 8:
+            piece = self.board[self.selected_piece_pos[0]][self.selected_piece_pos[1]]
+            move = self.position.build_move(self.selected_piece_pos[0] * 8 + self.selected_piece_pos[1], row * 8 + col)
+            self.refresh_legal()
+            self.redo_stack.clear()
+            if (piece == "p_white" and row == 0) or (piece == "p_black" and row == 7):
+                self.promotion_move = move
+                if promotion is None:
+                    self.promote(row, col)
+                else:
+                    self.complete_promotion(promotion)
+            else:
+                self.push_move(move)
+                self.after_move()
+        else:
+            raise PieceNotOnBoard
+
+    def play(self, frm, to, promotion="queen"):
+        """
+        Выполняет ход с клетки на клетку, предварительно проверив, что он допустим
+
+        :param frm: Клетка, с которой делается ход
+        :type frm: tuple(int, int)
+        :param to: Клетка, на которую делается ход
+        :type to: tuple(int, int)
+        :param promotion: Фигура для превращения пешки
+        :type promotion: str
+        :raises IllegalMove: Если ход недопустим или партия уже окончена
+        """
+        if self.result is not None or not (0 <= frm[0] < 8 and 0 <= frm[1] < 8) or \
+                self.board[frm[0]][frm[1]][2] != self.current_player[0] or to not in self.valid_moves[frm[0]][frm[1]]:
+            raise IllegalMove(f"Недопустимый ход: {frm} -> {to}")
+        self.selected_piece_pos = frm
+        self.make_move(to[0], to[1], promotion)
+        self.selected_piece_pos = None
+
+    def play_san(self, san):
+        """
+        Выполняет ход, записанный в SAN. Ход ищется среди уже сгенерированных допустимых ходов
+
+        :param san: Запись хода ("e4", "Nbd7", "O-O", "e8=N")
+        :type san: str
+        :raises IllegalMove: Если запись некорректна, ход недопустим или партия уже окончена
+        """
+        try:
+            move = MoveIndex(self.position, self.refresh_legal()).parse(san)
+        except InvalidSan as exc:
+            raise IllegalMove(str(exc))
+        frm, to, promo = move & 63, move >> 6 & 63, move >> 12 & 7
+        promotion = next((name for name, ptype in PROMOTION_PIECES.items() if ptype == promo), "queen")
+        self.play((frm >> 3, frm & 7), (to >> 3, to & 7), promotion)
+
+    def push_move(self, move, san=None):
+        """
+        Выполняет ход в позиции, обновляет записи о ходах короля и ладей, положения королей и пешку, которую
+        можно взять на проходе, и добавляет запись SAN в notation. Исходная клетка уточняется по уже
+        сгенерированным допустимым ходам. Состояние до хода сохраняется в undo_stack
+
+        :param move: Код хода
+        :type move: int
+        :param san: Готовая запись хода в SAN (при восстановлении партии допустимые ходы не генерируются)
+        :type san: str
+        :raises StaleMoves: Если запись SAN не задана, а допустимые ходы не пересчитаны для текущей позиции
+        """
+        frm, to = move & 63, move >> 6 & 63
+        frm_pos, to_pos = (frm >> 3, frm & 7), (to >> 3, to & 7)
+        record = MoveRecord(move, self.en_passant_target, self.w_king_pos, self.b_king_pos, self.moved_flags())
+        double_push = self.board[frm_pos[0]][frm_pos[1]][0] == 'p' and abs(frm_pos[0] - to_pos[0]) == 2
+        self.en_passant_target = to_pos if double_push else None
+        if frm_pos == self.w_king_pos:
+            self.w_king_pos = to_pos
+            self.king_moved[1] = True
+        elif frm_pos == self.b_king_pos:
+            self.b_king_pos = to_pos
+            self.king_moved[0] = True
+        for x in 0, 1:
+            for y in 0, 1:
+                if frm_pos == (x * 7, y * 7) or to_pos == (x * 7, y * 7):
+                    self.rook_moved[x][y] = True
+        if san is None:
+            text = MoveIndex(self.position, self.current_legal()).san(move)
+            self.position.make(move)
+            san = text + check_suffix(self.position)
+        else:
+            self.position.make(move)
+        record.san = san
+        self.notation.append(record.san)
+        self.undo_stack.append(record)
+
+    def current_legal(self) -> list:
+        """
+        Возвращает допустимые ходы, проверив, что они сгенерированы для текущей позиции
+
+        :returns: Коды допустимых ходов
+        :raises StaleMoves: Если допустимые ходы сгенерированы для другой позиции
+        """
+        if self.legal_key != self.position.key():
+            raise StaleMoves("Допустимые ходы не пересчитаны для текущей позиции")
+        return self.legal
+
+    def refresh_legal(self) -> list:
+        """
+        Пересчитывает допустимые ходы, если они сгенерированы для другой позиции (например, после изменения
+        расстановки через board)
+
+        :returns: Коды допустимых ходов текущей позиции
+        """
+        if self.legal_key != self.position.key():
+            self.legal = self.legal_moves()
+            self.legal_key = self.position.key()
+        return self.legal
+
+    def moved_flags(self) -> int:
+        """
+        Упаковывает записи о ходах королей и ладей в биты: 0-1 — короли (чёрный, белый), 2-5 — ладьи
+
+        :returns: Записи в виде числа
+        """
+        flags = self.king_moved[0] | self.king_moved[1] << 1
+        for x in 0, 1:
+            for y in 0, 1:
+                flags |= self.rook_moved[x][y] << (2 + x * 2 + y)
+        return flags
+
+    def undo(self, update=True) -> MoveRecord:
+        """
+        Отменяет последний ход за O(1): позиция возвращается Position.unmake, состояние партии — из записи хода.
+        Запись переносится в redo_stack, допустимые ходы пересчитываются
+
+        :param update: Пересчитать допустимые ходы (при восстановлении партии они пересчитываются один раз в конце)
+        :type update: bool
+        :returns: Запись отменённого хода или None, если отменять нечего
+        """
+        if not self.undo_stack:
+            return None
+        record = self.undo_stack.pop()
+        self.position.unmake()
+        self.en_passant_target = record.en_passant_target
+        self.w_king_pos, self.b_king_pos = record.w_king_pos, record.b_king_pos
+        moved = record.moved
+        self.king_moved = [bool(moved & 1), bool(moved & 2)]
+        self.rook_moved = [[bool(moved >> 2 & 1), bool(moved >> 3 & 1)], [bool(moved >> 4 & 1), bool(moved >> 5 & 1)]]
+        self.notation.pop()
+        self.redo_stack.append(record)
+        self.result = None
+        self.selected_piece_pos = None
+        self.promotion_move = None
+        if update:
+            self.update_moves()
+        return record
+
+    def redo(self) -> MoveRecord:
+        """
+        Повторяет последний отменённый ход
+
+        :returns: Запись повторённого хода или None, если повторять нечего
+        """
+        if not self.redo_stack:
+            return None
+        record = self.redo_stack.pop()
+        self.push_move(record.move)
+        self.after_move()
+        return self.undo_stack[-1]
+
+    def after_move(self):
+        """
+        Пересчитывает допустимые ходы ходящего игрока после выполненного хода и проверяет условия завершения игры
+        """
+        self.update_moves()
+        self.check_game_over()
+
+    def update_moves(self):
+        """
+        Пересчитывает допустимые ходы ходящего игрока, включая рокировку
+        """
+        self.simulate(self.current_player)
+        self.castle()
+
+    def snapshot(self) -> "Game":
+        """
+        Создаёт независимую копию состояния правил (позиции и записей о ходах короля и ладей)
+        для вычислений в другом потоке
+
+        :returns: Копия партии без графического интерфейса
+        """
+        game = Game.__new__(Game)
+        game.backend = self.backend
+        game.position = self.position.copy()
+        game.w_king_pos, game.b_king_pos = self.w_king_pos, self.b_king_pos
+        game.king_moved = self.king_moved[:]
+        game.rook_moved = [flags[:] for flags in self.rook_moved]
+        game.en_passant_target = self.en_passant_target
+        game.selected_piece_pos = None
+        game.promotion_move = None
+        game.valid_moves = self.valid_moves
+        game.legal = self.legal
+        game.legal_key = self.legal_key
+        game.notation = self.notation[:]
+        game.undo_stack = []
+        game.redo_stack = []
+        game.status = None
+        game.result = self.result
+        return game
+
+    def analyse(self) -> "Game":
+        """
+        Пересчитывает допустимые ходы и состояние партии
+
+        :returns: Эта же партия с вычисленными valid_moves и status
+        """
+        self.update_moves()
+        self.game_status()
+        return self
+
+    def check_game_over(self) -> bool:
+        """
+        Проверяет мат, пат и ничью по одному вычисленному состоянию партии
+
+        :returns: True если партия окончена
+        """
+        return self.is_mate() or self.is_stalemate() or self.is_draw()
+
+    def game_over(self, message):
+        """
+        Фиксирует результат партии
+
+        :param message: Сообщение о результате партии
+        :type message: str
+        """
+        self.result = message
+
+    def game_status(self) -> GameStatus:
+        """
+        Возвращает состояние партии для ходящего игрока. Состояние вычисляется один раз за полуход
+        (после пересчёта допустимых ходов) и используется выделением шаха и проверками мата и пата
+
+        :returns: Состояние партии
+        """
+        if self.status is None:
+            king = self.w_king_pos if self.current_player == "white" else self.b_king_pos
+            in_check = self.is_square_under_attack(king[0], king[1], self.current_player[0])
+            if self.no_moves():
+                self.status = GameStatus.CHECKMATE if in_check else GameStatus.STALEMATE
+            else:
+                self.status = GameStatus.CHECK if in_check else GameStatus.ONGOING
+        return self.status
+
+    def is_square_under_attack(self, row, col, color) -> bool:
+        """
+        Проверяет, находится ли клетка под атакой фигуры противника (по карте атак позиции, без перебора доски)
+
+        :param row: Ряд клетки для проверки
+        :type row: int
+        :param col: Столбец клетки для проверки
+        :type col: int
+        :param color: Цвет фигуры на проверяемой клетке
+        :type color: str
+        :returns: Находится ли фигура под атакой
+        """
+        if self.board[row][col] == "No_piece":
+            return False
+        return self.position.is_attacked(row * 8 + col, BLACK if color[0] == "w" else WHITE)
+
+    def simulate(self, player):
+        """
+        Исключает ходы, приводящие к шаху собственного короля.
+        Допустимые ходы берутся из генератора позиции, построенного на обратимом выполнении ходов
+
+        :param player: Цвет игрока для проверки
+        :type player: str
+        """
+        if player[0] == "w" or player[0] == "b":
+            valid_after_simulate = [[[] for _ in range(8)] for _ in range(8)]
+            position = self.position
+            side = position.side
+            position.side = WHITE if player[0] == "w" else BLACK
+            moves = self.legal_moves()
+            for move in moves:
+                if move >> 15 & FLAG_CASTLE or move >> 12 & 7 not in (0, QUEEN):
+                    continue
+                frm, to = move & 63, move >> 6 & 63
+                valid_after_simulate[frm >> 3][frm & 7].append((to >> 3, to & 7))
+            if position.side == side:
+                self.legal = moves
+                self.legal_key = position.key()
+            position.side = side
+            self.valid_moves = valid_after_simulate
+            self.status = None
+
+    def no_moves(self) -> bool:
+        """
+        Проверяет, может ли игрок сделать ход
+
+        :returns: True если игрок не может сделать ход
+        """
+        for sq in self.position.pieces[self.position.side]:
+            if self.valid_moves[sq >> 3][sq & 7]:
+                return False
+        return True
+
+    def is_mate(self) -> bool:
+        """
+        Проверяет, получил ли ходящий игрок мат
+
+        :returns: True если игрок получил мат
+        """
+        if self.game_status() is GameStatus.CHECKMATE:
+            self.game_over("Мат! Победили " + ("Чёрные" if self.current_player == "white" else "Белые"))
+            return True
+        return False
+
+    def is_stalemate(self) -> bool:
+        """
+        Проверяет, является ли позиция игрока патом
+
+        :returns: True если позиция патовая
+        """
+        if self.game_status() is GameStatus.STALEMATE:
+            self.game_over("Пат! Ничья")
+            return True
+        return False
+
+    def is_draw(self) -> bool:
+        """
+        Проверяет ничью по троекратному повторению позиции, правилу 50 ходов и недостатку материала.
+        Повторения определяются по ключу Zobrist позиции, материал — по счётчикам фигур, без просмотра доски
+
+        :returns: True если зафиксирована ничья
+        """
+        if self.game_status().is_over:
+            return False
+        if self.position.is_repetition():
+            message = "Ничья! Троекратное повторение позиции"
+        elif self.position.is_fifty_moves():
+            message = "Ничья! Правило 50 ходов"
+        elif self.position.is_insufficient_material():
+            message = "Ничья! Недостаточно материала"
+        else:
+            return False
+        self.game_over(message)
+        return True
+
+    def castle(self):
+        """
+        Проверяет на возможность выполнения рокировки ходящим игроком: король и ладья не ходили,
+        клетки между ними свободны, король не под шахом и не проходит через битые поля
+
+        :returns: Число добавленных в допустимые ходы рокировок
+        """
+        c = 1 if self.current_player == "white" else 0
+        if self.king_moved[c]:
+            return 0
+        added = 0
+        for move in self.position.castling_moves():
+            to = move >> 6 & 63
+            if not self.rook_moved[c][1 if to & 7 == 6 else 0]:
+                self.valid_moves[to >> 3][4].append((to >> 3, to & 7))
+                self.status = None
+                added += 1
+        return added
+
+    def promote(self, row, col):
+        """
+        Запрашивает фигуру для превращения пешки. Без графического интерфейса пешка превращается в ферзя
+
+        :param row: Ряд клетки с пешкой
+        :type row: int
+        :param col: Столбец клетки с пешкой
+        :type col: int
+        """
+        self.complete_promotion("queen")
+
+    def complete_promotion(self, piece_type):
+        """
+        Выполняет ожидающий ход пешки с превращением в выбранную фигуру и проводит все необходимые проверки
+
+        :param piece_type: Выбранная фигура ("queen", "rook", "bishop", "knight")
+        :type piece_type: str
+        """
+        self.push_move(self.promotion_move | PROMOTION_PIECES[piece_type] << 12)
+        self.promotion_move = None
+        self.after_move()
@@ -0,0 +1,290 @@
+"""
+Журнал партии для восстановления после аварийного завершения. После каждого хода и каждой отмены в файл
+дописывается запись фиксированного размера, а fsync выполняется пачками: не чаще одного раза на SYNC_RECORDS
+записей или SYNC_SECONDS секунд. Запись передаётся операционной системе сразу, поэтому при падении процесса
+теряется не больше текущего хода; fsync защищает от потери записей при сбое самой системы.
+
+Формат: заголовок HEADER (MAGIC, длина FEN, время на игрока, добавление и задержка), начальная позиция в FEN,
+затем записи RECORD по 24 байта: вид записи и код хода, остаток времени белых и чёрных в миллисекундах,
+запись хода в SAN и CRC32 первых 20 байт. Оборванная или повреждённая запись и всё, что за ней, при чтении
+отбрасываются.
+
+Запуск: python -m chess journal FILE
+"""
+import argparse
+import os
+import struct
+import time
+import zlib
+
+MAGIC = b"CHJ1"
+HEADER = struct.Struct("<4sHddd")
+RECORD = struct.Struct("<III8sI")
+MOVE, UNDO = 1, 2
+SYNC_RECORDS = 16
+SYNC_SECONDS = 1.0
+
+
+def default_path() -> str:
+    """
+    Возвращает путь журнала по умолчанию ($XDG_STATE_HOME/chess/game.journal или ~/.local/state/chess/game.journal)
+
+    :returns: Путь к файлу журнала
+    """
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "chess", "game.journal")
+
+
+class JournalEntry:
+    """
+    Запись журнала
+
+    :ivar kind: Вид записи (MOVE или UNDO)
+    :type kind: int
+    :ivar move: Код хода (0 для отмены)
+    :type move: int
+    :ivar san: Запись хода в SAN
+    :type san: str
+    :ivar white: Остаток времени белых в секундах после записи
+    :type white: float
+    :ivar black: Остаток времени чёрных в секундах после записи
+    :type black: float
+    """
+    __slots__ = ("kind", "move", "san", "white", "black")
+
+    def __init__(self, kind, move, san, white, black):
+        self.kind = kind
+        self.move = move
+        self.san = san
+        self.white = white
+        self.black = black
+
+
+class JournalData:
+    """
+    Прочитанный журнал
+
+    :ivar fen: Начальная позиция партии
+    :type fen: str
+    :ivar limit: Время на игрока в секундах
+    :type limit: float
+    :ivar increment: Добавление Фишера в секундах
+    :type increment: float
+    :ivar delay: Задержка Бронштейна в секундах
+    :type delay: float
+    :ivar entries: Целые записи журнала
+    :type entries: list[JournalEntry]
+    :ivar size: Длина целой части файла в байтах
+    :type size: int
+    """
+    __slots__ = ("fen", "limit", "increment", "delay", "entries", "size")
+
+    def __init__(self, fen, limit, increment, delay, entries, size):
+        self.fen = fen
+        self.limit = limit
+        self.increment = increment
+        self.delay = delay
+        self.entries = entries
+        self.size = size
+
+    def clocks(self) -> tuple:
+        """
+        Возвращает остаток времени игроков по последней записи
+
+        :returns: (время белых, время чёрных) в секундах
+        """
+        if not self.entries:
+            return self.limit, self.limit
+        return self.entries[-1].white, self.entries[-1].black
+
+
+def read_journal(path) -> JournalData:
+    """
+    Читает журнал. Чтение останавливается на первой оборванной или повреждённой записи
+
+    :param path: Путь к файлу журнала
+    :type path: str
+    :returns: Содержимое журнала
+    :raises OSError: Если файл не удалось прочитать
+    :raises ValueError: Если файл не является журналом партии
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"Файл не является журналом партии: {path}")
+    magic, fen_length, limit, increment, delay = HEADER.unpack_from(data)
+    start = HEADER.size + fen_length
+    if magic != MAGIC or len(data) < start:
+        raise ValueError(f"Файл не является журналом партии: {path}")
+    fen = data[HEADER.size:start].decode("ascii")
+    entries = []
+    offset = start
+    while offset + RECORD.size <= len(data):
+        word, white, black, san, crc = RECORD.unpack_from(data, offset)
+        if zlib.crc32(data[offset:offset + RECORD.size - 4]) != crc:
+            break
+        entries.append(JournalEntry(word >> 24, word & 0xFFFFFF, san.rstrip(b"\0").decode("ascii"),
+                                    white / 1000, black / 1000))
+        offset += RECORD.size
+    return JournalData(fen, limit, increment, delay, entries, offset)
+
+
+class Journal:
+    """
+    Журнал партии, открытый для дописывания
+
+    :ivar path: Путь к файлу журнала
+    :type path: str
+    :ivar pending: Число записей, дописанных после последнего fsync
+    :type pending: int
+    :ivar sync_records: Число записей, после которого выполняется fsync
+    :type sync_records: int
+    :ivar sync_seconds: Время после последнего fsync, по истечении которого очередная запись выполняет fsync
+    :type sync_seconds: float
+    """
+
+    def __init__(self, path, sync_records=SYNC_RECORDS, sync_seconds=SYNC_SECONDS):
+        """
+        Открывает существующий журнал для дописывания. Оборванная запись в конце файла отрезается
+
+        :param path: Путь к файлу журнала
+        :type path: str
+        :param sync_records: Число записей, после которого выполняется fsync
+        :type sync_records: int
+        :param sync_seconds: Наибольшее время между fsync при продолжении записи
+        :type sync_seconds: float
+        :raises OSError: Если файл не удалось открыть
+        :raises ValueError: Если файл не является журналом партии
+        """
+        size = read_journal(path).size
+        self.path = path
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self.pending = 0
+        self._file = open(path, "r+b")
+        self._file.truncate(size)
+        self._file.seek(size)
+        self._synced = time.monotonic()
+
+    @classmethod
+    def create(cls, path, fen, limit, increment=0.0, delay=0.0, **kwargs) -> "Journal":
+        """
+        Создаёт новый журнал (существующий файл перезаписывается) и открывает его для дописывания
+
+        :param path: Путь к файлу журнала
+        :type path: str
+        :param fen: Начальная позиция партии
+        :type fen: str
+        :param limit: Время на игрока в секундах
+        :type limit: float
+        :param increment: Добавление Фишера в секундах
+        :type increment: float
+        :param delay: Задержка Бронштейна в секундах
+        :type delay: float
+        :param kwargs: Параметры fsync (sync_records, sync_seconds)
+        :returns: Открытый журнал
+        :raises OSError: Если файл не удалось создать
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = fen.encode("ascii")
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(header), limit, increment, delay) + header)
+            file.flush()
+            os.fsync(file.fileno())
+        return cls(path, **kwargs)
+
+    def write(self, kind, move, san, white, black):
+        """
+        Дописывает запись. Данные сразу передаются системе, fsync выполняется пачками
+
+        :param kind: Вид записи (MOVE или UNDO)
+        :type kind: int
+        :param move: Код хода
+        :type move: int
+        :param san: Запись хода в SAN (до 8 символов)
+        :type san: str
+        :param white: Остаток времени белых в секундах
+        :type white: float
+        :param black: Остаток времени чёрных в секундах
+        :type black: float
+        """
+        body = RECORD.pack(kind << 24 | move, max(round(white * 1000), 0), max(round(black * 1000), 0),
+                           (san or "").encode("ascii"), 0)[:RECORD.size - 4]
+        self._file.write(body + struct.pack("<I", zlib.crc32(body)))
+        self._file.flush()
+        self.pending += 1
+        if self.pending >= self.sync_records or time.monotonic() - self._synced >= self.sync_seconds:
+            self.sync()
+
+    def sync(self):
+        """
+        Сбрасывает дописанные записи на диск
+        """
+        if self.pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.pending = 0
+        self._synced = time.monotonic()
+
+    def close(self):
+        """
+        Сбрасывает записи на диск и закрывает файл
+        """
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def replay(game, data):
+    """
+    Восстанавливает партию из журнала: устанавливает начальную позицию и выполняет записанные ходы и отмены
+    без генерации допустимых ходов на каждом полуходе (запись SAN берётся из журнала). Каждой записи хода
+    возвращаются показания часов до хода (по предыдущей записи журнала), чтобы отмена хода после восстановления
+    возвращала часы. Допустимые ходы пересчитываются один раз в конце
+
+    :param game: Партия, в которую восстанавливается позиция
+    :type game: Game
+    :param data: Прочитанный журнал
+    :type data: JournalData
+    """
+    game.set_fen(data.fen)
+    clock = {"white": data.limit, "black": data.limit}
+    for entry in data.entries:
+        if entry.kind == UNDO:
+            game.undo(update=False)
+        else:
+            game.push_move(entry.move, entry.san)
+            game.undo_stack[-1].clock = clock
+        clock = {"white": entry.white, "black": entry.black}
+    game.redo_stack.clear()
+    game.update_moves()
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: восстанавливает партию из журнала и выводит ходы и время
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения
+    """
+    from game import Game
+    parser = argparse.ArgumentParser(prog="python -m chess journal", description="Восстановление партии из журнала")
+    parser.add_argument("file", help="файл журнала")
+    args = parser.parse_args(argv)
+    data = read_journal(args.file)
+    game = Game()
+    start = time.perf_counter()
+    replay(game, data)
+    elapsed = time.perf_counter() - start
+    white, black = data.clocks()
+    print(f"Начальная позиция: {data.fen}\nЗаписей: {len(data.entries)}, восстановлено за {elapsed * 1000:.1f} мс\n"
+          f"Ходы: {' '.join(game.notation)}\nПозиция: {game.to_fen()}\n"
+          f"Время: белые {white:.1f} с, чёрные {black:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+"""
+Подсчёт числа позиций в дереве ходов (perft) для проверки корректности и измерения скорости генератора ходов.
+
+Запуск: python -m chess perft --depth 4 [--fen FEN] [--backend mailbox] [--jobs N] [--check]
+Ходы из корня распределяются между процессами пула, для каждого хода выводится число листьев (divide)
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from position import Position, move_to_uci
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Эталонные позиции и число листьев на глубинах 1, 2, 3, ...
+REFERENCE_POSITIONS = (
+    ("start", START_FEN, (20, 400, 8902, 197281, 4865609)),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     (48, 2039, 97862, 4085603)),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", (14, 191, 2812, 43238, 674624)),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", (6, 264, 9467, 422333)),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", (44, 1486, 62379, 2103487)),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     (46, 2079, 89890, 3894594)),
+)
+
+BACKENDS = ("position", "mailbox", "bitboard")
+
+
+def load_backend(backend) -> tuple:
+    """
+    Возвращает класс позиции и функцию генерации допустимых ходов для выбранного генератора:
+    "position" — доска из 64 клеток, "mailbox" — та же доска с картами атак (как в игре), "bitboard" — битборды
+
+    :param backend: Название генератора ходов
+    :type backend: str
+    :returns: (класс позиции, функция генерации ходов)
+    :raises ValueError: Если генератор неизвестен
+    """
+    if backend == "position":
+        return Position, Position.legal_moves
+    if backend == "mailbox":
+        from attacks import AttackMapPosition
+        return AttackMapPosition, AttackMapPosition.legal_moves
+    if backend == "bitboard":
+        import bitboard
+        return bitboard.BitboardPosition, bitboard.legal_moves
+    raise ValueError(f"Неизвестный генератор ходов: {backend}")
+
+
+def perft(position, depth, legal_moves=Position.legal_moves) -> int:
+    """
+    Считает число листьев дерева допустимых ходов заданной глубины. На последнем уровне ходы не выполняются
+
+    :param position: Позиция
+    :type position: Position
+    :param depth: Глубина
+    :type depth: int
+    :param legal_moves: Функция генерации допустимых ходов
+    :type legal_moves: function
+    :returns: Число листьев
+    """
+    if depth == 0:
+        return 1
+    moves = legal_moves(position)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make(move)
+        nodes += perft(position, depth - 1, legal_moves)
+        position.unmake()
+    return nodes
+
+
+def _perft_after(fen, move, depth, backend) -> int:
+    position_class, legal_moves = load_backend(backend)
+    position = position_class.from_fen(fen)
+    position.make(move)
+    return perft(position, depth, legal_moves)
+
+
+def divide(fen, depth, backend="position", jobs=None) -> dict:
+    """
+    Считает число листьев отдельно для каждого хода из корневой позиции. Ходы распределяются между процессами пула
+
+    :param fen: Корневая позиция в записи FEN
+    :type fen: str
+    :param depth: Глубина (не меньше 1)
+    :type depth: int
+    :param backend: Генератор ходов
+    :type backend: str
+    :param jobs: Число процессов (None — по числу ядер, 1 — без пула)
+    :type jobs: int
+    :returns: Число листьев для каждого хода в записи UCI
+    """
+    position_class, legal_moves = load_backend(backend)
+    moves = legal_moves(position_class.from_fen(fen))
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or depth <= 2:
+        counts = [_perft_after(fen, move, depth - 1, backend) for move in moves]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(moves) or 1)) as pool:
+            counts = list(pool.map(_perft_after, [fen] * len(moves), moves, [depth - 1] * len(moves),
+                                   [backend] * len(moves)))
+    return {move_to_uci(move): count for move, count in zip(moves, counts)}
+
+
+def check_reference(depth, backend="position", jobs=None) -> bool:
+    """
+    Сверяет perft эталонных позиций с известными значениями на глубинах до depth
+
+    :param depth: Максимальная глубина
+    :type depth: int
+    :param backend: Генератор ходов
+    :type backend: str
+    :param jobs: Число процессов
+    :type jobs: int
+    :returns: True если все значения совпали
+    """
+    passed = True
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for d in range(1, min(depth, len(expected)) + 1):
+            start = time.perf_counter()
+            nodes = sum(divide(fen, d, backend, jobs).values())
+            elapsed = time.perf_counter() - start
+            ok = nodes == expected[d - 1]
+            passed = passed and ok
+            print(f"{name:10} depth {d}: {nodes:>10} {'OK' if ok else f'ОШИБКА (ожидалось {expected[d - 1]})'}"
+                  f"  {elapsed:.2f} с")
+    return passed
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess perft", description="Подсчёт perft и divide")
+    parser.add_argument("--depth", type=int, default=4, help="глубина перебора")
+    parser.add_argument("--fen", default=START_FEN, help="корневая позиция в записи FEN")
+    parser.add_argument("--backend", choices=BACKENDS, default="position", help="генератор ходов")
+    parser.add_argument("--jobs", type=int, default=None, help="число процессов (по умолчанию — по числу ядер)")
+    parser.add_argument("--check", action="store_true", help="сверить эталонные позиции до заданной глубины")
+    args = parser.parse_args(argv)
+    if args.depth < 1:
+        parser.error("глубина должна быть не меньше 1")
+    if args.check:
+        return 0 if check_reference(args.depth, args.backend, args.jobs) else 1
+    start = time.perf_counter()
+    counts = divide(args.fen, args.depth, args.backend, args.jobs)
+    elapsed = time.perf_counter() - start
+    for move, count in counts.items():
+        print(f"{move}: {count}")
+    nodes = sum(counts.values())
+    print(f"\nХодов: {len(counts)}\nПозиций: {nodes}\nВремя: {elapsed:.3f} с\n"
+          f"Позиций в секунду: {nodes / max(elapsed, 1e-9):.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
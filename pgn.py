@@ -0,0 +1,257 @@
+"""
+Потоковое чтение партий в формате PGN и проверка их допустимости в пуле процессов.
+
+Файл читается построчно, партии выдаются по одной, поэтому архив любого размера не загружается в память целиком.
+Ходы каждой партии воспроизводятся по правилам игры: запись SAN сопоставляется с допустимыми ходами позиции,
+после чего ход выполняется. Партии раздаются процессам пакетами (chunksize), результаты возвращаются
+в порядке партий в файле или по мере готовности. Ошибка в партии не прерывает обработку остальных.
+
+Запуск: python -m chess pgn FILE [--jobs N] [--chunksize 64] [--unordered] [--backend position]
+"""
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from functools import partial
+from perft import BACKENDS, START_FEN, load_backend
+from position import UnknownPiece
+from san import InvalidSan, MoveIndex
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+class PgnGame:
+    """
+    Партия, прочитанная из файла PGN
+
+    :ivar index: Порядковый номер партии в файле (с нуля)
+    :type index: int
+    :ivar headers: Заголовки партии ("Event", "White", "FEN", ...)
+    :type headers: dict{str: str}
+    :ivar moves: Ходы основного варианта в записи SAN
+    :type moves: list[str]
+    :ivar result: Результат из текста ходов ("1-0", "0-1", "1/2-1/2", "*")
+    :type result: str
+    """
+    __slots__ = ("index", "headers", "moves", "result")
+
+    def __init__(self, index, headers, moves, result="*"):
+        self.index = index
+        self.headers = headers
+        self.moves = moves
+        self.result = result
+
+
+class GameReport:
+    """
+    Результат проверки партии
+
+    :ivar index: Порядковый номер партии в файле
+    :type index: int
+    :ivar headers: Заголовки партии
+    :type headers: dict{str: str}
+    :ivar plies: Число выполненных полуходов
+    :type plies: int
+    :ivar fen: Позиция после последнего выполненного хода
+    :type fen: str
+    :ivar error: Описание ошибки (None, если все ходы допустимы)
+    :type error: str
+    :ivar positions: Позиции после каждого полухода в записи FEN (если запрошены)
+    :type positions: list[str]
+    """
+    __slots__ = ("index", "headers", "plies", "fen", "error", "positions")
+
+    def __init__(self, index, headers, plies, fen, error=None, positions=None):
+        self.index = index
+        self.headers = headers
+        self.plies = plies
+        self.fen = fen
+        self.error = error
+        self.positions = positions
+
+    @property
+    def ok(self) -> bool:
+        """
+        True, если партия прочитана без ошибок
+        """
+        return self.error is None
+
+
+def _parse_header(line) -> tuple:
+    body = line.strip()[1:-1].strip()
+    name, _, value = body.partition(" ")
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return name, value
+
+
+def read_games(stream):
+    """
+    Читает партии из файла PGN по одной. Комментарии, варианты и числовые пометки ходов ($1) пропускаются
+
+    :param stream: Открытый текстовый файл или любой итератор строк
+    :type stream: io.TextIOBase
+    :returns: Генератор партий
+    :rtype: Iterator[PgnGame]
+    """
+    index = 0
+    headers, moves, result = {}, [], None
+    comment = False
+    variations = 0
+    for line in stream:
+        if not comment and not variations:
+            stripped = line.lstrip()
+            if stripped.startswith("["):
+                if moves or result is not None:
+                    yield PgnGame(index, headers, moves, result or "*")
+                    index += 1
+                    headers, moves, result = {}, [], None
+                name, value = _parse_header(stripped)
+                headers[name] = value
+                continue
+            if stripped.startswith("%"):
+                continue
+        for token in line.replace("{", " { ").replace("}", " } ").replace("(", " ( ").replace(")", " ) ").split():
+            if comment:
+                comment = token != "}"
+            elif token == "{":
+                comment = True
+            elif token[0] == ";":
+                break
+            elif token == "(":
+                variations += 1
+            elif token == ")":
+                variations = max(variations - 1, 0)
+            elif variations or token[0] == "$":
+                continue
+            elif token in RESULTS:
+                result = token
+            else:
+                if token[0].isdigit() and not token.startswith("0-0"):
+                    token = token.lstrip("0123456789").lstrip(".")
+                if token:
+                    moves.append(token)
+    if headers or moves or result is not None:
+        yield PgnGame(index, headers, moves, result or "*")
+
+
+def replay(game, backend="position", positions=False) -> GameReport:
+    """
+    Воспроизводит ходы партии с проверкой допустимости каждого хода
+
+    :param game: Партия
+    :type game: PgnGame
+    :param backend: Генератор ходов ("position", "mailbox", "bitboard")
+    :type backend: str
+    :param positions: Сохранять ли позиции после каждого полухода
+    :type positions: bool
+    :returns: Результат проверки партии
+    """
+    position_class, legal_moves = load_backend(backend)
+    fens = [] if positions else None
+    try:
+        position = position_class.from_fen(game.headers.get("FEN", START_FEN))
+    except (ValueError, UnknownPiece):
+        return GameReport(game.index, game.headers, 0, None, f"Некорректная начальная позиция: "
+                                                             f"{game.headers.get('FEN')}", fens)
+    error = None
+    plies = 0
+    for san in game.moves:
+        try:
+            move = MoveIndex(position, legal_moves(position)).parse(san)
+        except InvalidSan as exc:
+            error = f"Полуход {plies + 1}: {exc}"
+            break
+        position.make(move)
+        plies += 1
+        if positions:
+            fens.append(position.to_fen())
+    return GameReport(game.index, game.headers, plies, position.to_fen(), error, fens)
+
+
+def _bounded(games, slots, stop):
+    for game in games:
+        slots.acquire()
+        if stop.is_set():
+            return
+        yield game
+
+
+def validate(games, backend="position", jobs=None, chunksize=64, ordered=True, positions=False):
+    """
+    Проверяет партии в пуле процессов. Партии раздаются процессам пакетами по chunksize;
+    число партий, отправленных в пул, но ещё не полученных, ограничено, поэтому поток партий читается
+    по мере обработки
+
+    :param games: Партии (например, генератор read_games)
+    :type games: Iterable[PgnGame]
+    :param backend: Генератор ходов
+    :type backend: str
+    :param jobs: Число процессов (None — по числу ядер, 1 — без пула)
+    :type jobs: int
+    :param chunksize: Число партий в одном задании процесса
+    :type chunksize: int
+    :param ordered: Возвращать результаты в порядке партий (иначе — по мере готовности)
+    :type ordered: bool
+    :param positions: Сохранять ли позиции после каждого полухода
+    :type positions: bool
+    :returns: Генератор результатов проверки
+    :rtype: Iterator[GameReport]
+    """
+    load_backend(backend)
+    worker = partial(replay, backend=backend, positions=positions)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        yield from map(worker, games)
+        return
+    window = 4 * jobs * chunksize
+    slots = threading.Semaphore(window)
+    stop = threading.Event()
+    with multiprocessing.Pool(jobs) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        try:
+            for report in imap(worker, _bounded(games, slots, stop), chunksize):
+                slots.release()
+                yield report
+        finally:
+            stop.set()
+            slots.release(window)
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: проверяет партии файла и выводит ошибки и скорость обработки
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения (1, если в файле есть ошибочные партии)
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess pgn", description="Проверка партий в формате PGN")
+    parser.add_argument("file", help="файл PGN")
+    parser.add_argument("--backend", choices=BACKENDS, default="position", help="генератор ходов")
+    parser.add_argument("--jobs", type=int, default=None, help="число процессов (по умолчанию — по числу ядер)")
+    parser.add_argument("--chunksize", type=int, default=64, help="число партий в одном задании процесса")
+    parser.add_argument("--unordered", action="store_true", help="выводить результаты по мере готовности")
+    args = parser.parse_args(argv)
+    if args.chunksize < 1:
+        parser.error("chunksize должен быть не меньше 1")
+    games = errors = plies = 0
+    start = time.perf_counter()
+    with open(args.file, encoding="utf-8", errors="replace") as stream:
+        for report in validate(read_games(stream), args.backend, args.jobs, args.chunksize, not args.unordered):
+            games += 1
+            plies += report.plies
+            if not report.ok:
+                errors += 1
+                print(f"Партия {report.index + 1} ({report.headers.get('White', '?')} - "
+                      f"{report.headers.get('Black', '?')}): {report.error}")
+    elapsed = time.perf_counter() - start
+    print(f"\nПартий: {games}\nС ошибками: {errors}\nПолуходов: {plies}\nВремя: {elapsed:.3f} с\n"
+          f"Партий в секунду: {games / max(elapsed, 1e-9):.0f}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
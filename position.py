@@ -0,0 +1,1082 @@
+"""
+Компактное представление шахматной позиции: доска bytearray из 64 клеток с целочисленными кодами фигур,
+списки фигур каждого цвета, очередь хода, права на рокировку и поле взятия на проходе.
+
+Клетка задаётся числом row * 8 + col, где row = 0 соответствует восьмой горизонтали (как в Chess.board).
+Код фигуры: тип (1..6) | цвет << 3, пустая клетка кодируется нулём.
+Ход кодируется одним целым числом: from | to << 6 | promo << 12 | flag << 15
+"""
+from enum import Enum
+from zobrist import PIECE_KEYS, CASTLE_KEYS, EP_KEYS, SIDE_KEY
+
+
+class UnknownPiece(Exception):
+    """
+    Исключение. Вызывается, если на доске возникает неизвестная фигура (не входящая в стандартный набор фигур в шахматах)
+    """
+    pass
+
+
+class PieceNotOnBoard(Exception):
+    """
+    Исключение. Вызывается, если фигура, с которой пытаются работать, находится на доске, или выполняемый ход приводит к выходу за пределы доски
+    """
+    pass
+
+
+class GameStatus(Enum):
+    """
+    Состояние партии для игрока, чей ход
+    """
+    ONGOING = "ongoing"
+    CHECK = "check"
+    CHECKMATE = "checkmate"
+    STALEMATE = "stalemate"
+
+    @property
+    def is_over(self) -> bool:
+        """
+        Партия окончена (мат или пат)
+        """
+        return self in (GameStatus.CHECKMATE, GameStatus.STALEMATE)
+
+    @property
+    def in_check(self) -> bool:
+        """
+        Король игрока, чей ход, находится под шахом
+        """
+        return self in (GameStatus.CHECK, GameStatus.CHECKMATE)
+
+
+WHITE, BLACK = 0, 1
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+
+FLAG_EP, FLAG_CASTLE, FLAG_DOUBLE = 1, 2, 4
+
+COLOR_NAMES = ("white", "black")
+PIECE_LETTERS = " pnbrqk"
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+NAME_TO_CODE = {f"{PIECE_LETTERS[t]}_{COLOR_NAMES[c]}": t | c << 3 for c in (WHITE, BLACK) for t in range(1, 7)}
+CODE_TO_NAME = {code: name for name, code in NAME_TO_CODE.items()}
+FEN_TO_CODE = {(PIECE_LETTERS[t].upper() if c == WHITE else PIECE_LETTERS[t]): t | c << 3
+               for c in (WHITE, BLACK) for t in range(1, 7)}
+CODE_TO_FEN = {code: letter for letter, code in FEN_TO_CODE.items()}
+FEN_CASTLING = ((CASTLE_WK, "K"), (CASTLE_WQ, "Q"), (CASTLE_BK, "k"), (CASTLE_BQ, "q"))
+
+BACK_RANK = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)
+
+# Направления в порядке: вверх, вверх-вправо, вправо, вниз-вправо, вниз, вниз-влево, влево, вверх-влево
+STEPS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+KNIGHT_STEPS = ((1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1))
+ORTHOGONAL = (0, 2, 4, 6)
+DIAGONAL = (1, 3, 5, 7)
+ROOK_DIRS = (0, 4, 6, 2)
+BISHOP_DIRS = (7, 1, 3, 5)
+
+
+def _targets(sq, steps) -> tuple:
+    row, col = sq >> 3, sq & 7
+    return tuple((row + r) * 8 + col + c for r, c in steps if 0 <= row + r < 8 and 0 <= col + c < 8)
+
+
+def _ray(sq, step) -> tuple:
+    row, col = sq >> 3, sq & 7
+    ray = []
+    row, col = row + step[0], col + step[1]
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray.append(row * 8 + col)
+        row, col = row + step[0], col + step[1]
+    return tuple(ray)
+
+
+KNIGHT_TARGETS = tuple(_targets(sq, KNIGHT_STEPS) for sq in range(64))
+KING_TARGETS = tuple(_targets(sq, STEPS) for sq in range(64))
+RAYS = tuple(tuple(_ray(sq, step) for step in STEPS) for sq in range(64))
+PAWN_ATTACKS = (tuple(_targets(sq, ((-1, 1), (-1, -1))) for sq in range(64)),
+                tuple(_targets(sq, ((1, -1), (1, 1))) for sq in range(64)))
+
+DIRECTION = [-1] * 4096
+for _sq in range(64):
+    for _d in range(8):
+        for _t in RAYS[_sq][_d]:
+            DIRECTION[_sq << 6 | _t] = _d
+
+CASTLE_MASK = bytearray([15] * 64)
+CASTLE_MASK[60] &= ~(CASTLE_WK | CASTLE_WQ)
+CASTLE_MASK[63] &= ~CASTLE_WK
+CASTLE_MASK[56] &= ~CASTLE_WQ
+CASTLE_MASK[4] &= ~(CASTLE_BK | CASTLE_BQ)
+CASTLE_MASK[7] &= ~CASTLE_BK
+CASTLE_MASK[0] &= ~CASTLE_BQ
+
+# Ход короля при рокировке -> (право, клетка ладьи, куда встаёт ладья, клетки, которые должны быть свободны)
+CASTLING = {
+    WHITE: ((CASTLE_WK, 60, 62, 63, 61, (61, 62)), (CASTLE_WQ, 60, 58, 56, 59, (57, 58, 59))),
+    BLACK: ((CASTLE_BK, 4, 6, 7, 5, (5, 6)), (CASTLE_BQ, 4, 2, 0, 3, (1, 2, 3))),
+}
+CASTLE_ROOK = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+
+
+def encode_move(frm, to, promo=0, flag=0) -> int:
+    """
+    Кодирует ход одним целым числом
+
+    :param frm: Клетка, с которой делается ход
+    :type frm: int
+    :param to: Клетка, на которую делается ход
+    :type to: int
+    :param promo: Тип фигуры для превращения пешки (0, если превращения нет)
+    :type promo: int
+    :param flag: Флаги хода (FLAG_EP, FLAG_CASTLE, FLAG_DOUBLE)
+    :type flag: int
+    :returns: Код хода
+    """
+    return frm | to << 6 | promo << 12 | flag << 15
+
+
+def square_name(sq) -> str:
+    """
+    Возвращает название клетки в алгебраической нотации
+
+    :param sq: Клетка
+    :type sq: int
+    :returns: Название клетки ("e4")
+    """
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+
+def parse_square(name) -> int:
+    """
+    Переводит название клетки в алгебраической нотации в номер клетки
+
+    :param name: Название клетки ("e4")
+    :type name: str
+    :returns: Клетка
+    :raises ValueError: Если название клетки некорректно
+    """
+    if len(name) != 2 or name[0] not in "abcdefgh" or name[1] not in "12345678":
+        raise ValueError(f"Некорректное название клетки: {name}")
+    return (8 - int(name[1])) * 8 + "abcdefgh".index(name[0])
+
+
+def move_to_uci(move) -> str:
+    """
+    Записывает ход в формате UCI ("e2e4", "e7e8q")
+
+    :param move: Код хода
+    :type move: int
+    :returns: Запись хода
+    """
+    promo = move >> 12 & 7
+    return square_name(move & 63) + square_name(move >> 6 & 63) + (PIECE_LETTERS[promo] if promo else "")
+
+
+class Position:
+    """
+    Шахматная позиция с обратимым выполнением ходов (make/unmake)
+
+    :ivar board: Коды фигур на 64 клетках
+    :type board: bytearray
+    :ivar pieces: Списки клеток с фигурами белых и чёрных
+    :type pieces: tuple(list[int], list[int])
+    :ivar index: Номер клетки в списке фигур её цвета
+    :type index: bytearray
+    :ivar kings: Клетки королей белых и чёрных (-1, если короля нет)
+    :type kings: list[int]
+    :ivar side: Цвет игрока, чей ход (WHITE или BLACK)
+    :type side: int
+    :ivar castling: Права на рокировку (битовая маска CASTLE_*)
+    :type castling: int
+    :ivar ep: Поле, через которое перепрыгнула пешка последним ходом (-1, если взятия на проходе нет)
+    :type ep: int
+    :ivar halfmove: Число полуходов без взятий и ходов пешками
+    :type halfmove: int
+    :ivar fullmove: Номер хода
+    :type fullmove: int
+    :ivar history: Стек записей для отмены ходов
+    :type history: list[tuple]
+    :ivar piece_key: Часть ключа Zobrist, зависящая только от расстановки фигур
+    :type piece_key: int
+    :ivar material: Число фигур каждого кода на доске
+    :type material: bytearray
+    :ivar repetitions: Сколько раз в партии встречалась позиция с данным ключом
+    :type repetitions: dict{int: int}
+    """
+    __slots__ = ("board", "pieces", "index", "kings", "side", "castling", "ep", "halfmove", "fullmove", "history",
+                 "piece_key", "material", "repetitions")
+
+    def __init__(self):
+        """
+        Создаёт пустую позицию
+        """
+        self.board = bytearray(64)
+        self.pieces = ([], [])
+        self.index = bytearray(64)
+        self.kings = [-1, -1]
+        self.side = WHITE
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.history = []
+        self.piece_key = 0
+        self.material = bytearray(16)
+        self.repetitions = {}
+
+    @classmethod
+    def initial(cls) -> "Position":
+        """
+        Создаёт начальную расстановку фигур
+
+        :returns: Позиция в начале партии
+        """
+        position = cls()
+        for col in range(8):
+            position.add_piece(col, BACK_RANK[col] | BLACK << 3)
+            position.add_piece(8 + col, PAWN | BLACK << 3)
+            position.add_piece(48 + col, PAWN)
+            position.add_piece(56 + col, BACK_RANK[col])
+        position.castling = CASTLE_WK | CASTLE_WQ | CASTLE_BK | CASTLE_BQ
+        position.repetitions = {position.key(): 1}
+        return position
+
+    @classmethod
+    def from_rows(cls, rows, side=WHITE, castling=None) -> "Position":
+        """
+        Создаёт позицию из строкового представления доски (list[list[str]])
+
+        :param rows: Доска в виде матрицы строк ("p_white", "No_piece", "s_black", ...)
+        :type rows: list[list[str]]
+        :param side: Цвет игрока, чей ход
+        :type side: int
+        :param castling: Права на рокировку. Если не заданы, определяются по расстановке королей и ладей
+        :type castling: int
+        :returns: Позиция
+        :raises UnknownPiece: Если на доске записана неизвестная фигура
+        """
+        position = cls()
+        position.side = side
+        for row in range(8):
+            for col in range(8):
+                name = rows[row][col]
+                if name != "No_piece":
+                    position.set_square(row * 8 + col, name)
+        position.castling = position.castling_from_placement() if castling is None else castling
+        position.repetitions = {position.key(): 1}
+        return position
+
+    @classmethod
+    def from_fen(cls, fen) -> "Position":
+        """
+        Создаёт позицию из записи FEN
+
+        :param fen: Запись позиции в нотации Форсайта-Эдвардса
+        :type fen: str
+        :returns: Позиция
+        :raises ValueError: Если запись FEN некорректна: горизонталь не из 8 клеток, не по одному королю
+            у каждой стороны, пешка на первой или последней горизонтали или поле взятия на проходе,
+            за которым не стоит только что сходившая пешка
+        :raises UnknownPiece: Если в записи встречается неизвестная фигура
+        """
+        fields = fen.split()
+        if len(fields) < 4 or fields[1] not in ("w", "b"):
+            raise ValueError(f"Некорректная запись FEN: {fen}")
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError(f"Некорректная запись FEN: {fen}")
+        position = cls()
+        add_piece = position.add_piece
+        for row, rank in enumerate(ranks):
+            sq, end = row * 8, row * 8 + 8
+            for ch in rank:
+                if ch.isdigit():
+                    if not "1" <= ch <= "8":
+                        raise ValueError(f"Некорректное число пустых клеток в записи FEN: {fen}")
+                    sq += ord(ch) - 48
+                else:
+                    code = FEN_TO_CODE.get(ch)
+                    if code is None:
+                        raise UnknownPiece
+                    if sq < end:
+                        add_piece(sq, code)
+                    sq += 1
+                if sq > end:
+                    break
+            if sq != end:
+                raise ValueError(f"Горизонталь {8 - row} не из 8 клеток в записи FEN: {fen}")
+        for color in WHITE, BLACK:
+            if position.material[KING | color << 3] != 1:
+                raise ValueError(f"У каждой стороны должен быть ровно один король: {fen}")
+        for sq in range(8):
+            if position.board[sq] & 7 == PAWN or position.board[56 + sq] & 7 == PAWN:
+                raise ValueError(f"Пешка на первой или последней горизонтали: {fen}")
+        position.side = WHITE if fields[1] == "w" else BLACK
+        castling = 0
+        if fields[2] != "-":
+            for ch in fields[2]:
+                if ch not in "KQkq":
+                    raise ValueError(f"Некорректная запись FEN: {fen}")
+                castling |= (CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ)["KQkq".index(ch)]
+        position.castling = castling & position.castling_from_placement()
+        position.ep = -1 if fields[3] == "-" else parse_square(fields[3])
+        if position.ep >= 0:
+            ep, forward = position.ep, 8 if position.side == WHITE else -8
+            if ep >> 3 != (2 if position.side == WHITE else 5) or position.board[ep] or \
+                    position.board[ep - forward] or position.board[ep + forward] != PAWN | (position.side ^ 1) << 3:
+                raise ValueError(f"Некорректное поле взятия на проходе в записи FEN: {fen}")
+        if len(fields) >= 6:
+            position.halfmove, position.fullmove = int(fields[4]), int(fields[5])
+        position.repetitions = {position.key(): 1}
+        return position
+
+    def to_fen(self) -> str:
+        """
+        Записывает позицию в нотации FEN
+
+        :returns: Запись FEN
+        """
+        board = self.board
+        ranks = []
+        for start in range(0, 64, 8):
+            rank = ""
+            empty = 0
+            for code in board[start:start + 8]:
+                if code:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    rank += CODE_TO_FEN[code]
+                else:
+                    empty += 1
+            ranks.append(rank + str(empty) if empty else rank)
+        castling = "".join(letter for right, letter in FEN_CASTLING if self.castling & right) or "-"
+        ep = square_name(self.ep) if self.ep >= 0 else "-"
+        return f"{'/'.join(ranks)} {'wb'[self.side]} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def to_rows(self) -> list[list[str]]:
+        """
+        Переводит позицию в строковое представление доски
+
+        :returns: Доска в виде матрицы строк
+        """
+        return [[self.piece_name(row * 8 + col) for col in range(8)] for row in range(8)]
+
+    def copy(self) -> "Position":
+        """
+        Создаёт независимую копию позиции
+
+        :returns: Копия позиции
+        """
+        position = type(self).__new__(type(self))
+        position.board = bytearray(self.board)
+        position.pieces = (self.pieces[0][:], self.pieces[1][:])
+        position.index = bytearray(self.index)
+        position.kings = self.kings[:]
+        position.side = self.side
+        position.castling = self.castling
+        position.ep = self.ep
+        position.halfmove = self.halfmove
+        position.fullmove = self.fullmove
+        position.history = self.history[:]
+        position.piece_key = self.piece_key
+        position.material = bytearray(self.material)
+        position.repetitions = self.repetitions.copy()
+        return position
+
+    def piece_name(self, sq) -> str:
+        """
+        Возвращает строковое имя фигуры на клетке. Поле взятия на проходе отображается меткой "s_<цвет пешки>"
+
+        :param sq: Клетка
+        :type sq: int
+        :returns: Имя фигуры
+        """
+        code = self.board[sq]
+        if code:
+            return CODE_TO_NAME[code]
+        if sq == self.ep:
+            return "s_black" if self.side == WHITE else "s_white"
+        return "No_piece"
+
+    def set_square(self, sq, name):
+        """
+        Записывает фигуру на клетку по строковому имени (используется при редактировании доски)
+
+        :param sq: Клетка
+        :type sq: int
+        :param name: Имя фигуры ("q_white", "No_piece", "s_black", ...)
+        :type name: str
+        :raises UnknownPiece: Если имя фигуры неизвестно
+        """
+        if name != "No_piece" and name[:2] != "s_" and name not in NAME_TO_CODE:
+            raise UnknownPiece
+        if self.board[sq]:
+            self.remove_piece(sq)
+        if name[:2] == "s_":
+            self.ep = sq
+        else:
+            if sq == self.ep:
+                self.ep = -1
+            if name != "No_piece":
+                self.add_piece(sq, NAME_TO_CODE[name])
+        lost = ~CASTLE_MASK[sq] & 15
+        if lost:
+            self.castling = (self.castling & ~lost) | (self.castling_from_placement() & lost)
+
+    def castling_from_placement(self) -> int:
+        """
+        Определяет права на рокировку по тому, стоят ли короли и ладьи на начальных клетках
+
+        :returns: Битовая маска прав на рокировку
+        """
+        rights = 0
+        for side in WHITE, BLACK:
+            for right, king, _, rook, _, _ in CASTLING[side]:
+                if self.board[king] == KING | side << 3 and self.board[rook] == ROOK | side << 3:
+                    rights |= right
+        return rights
+
+    def add_piece(self, sq, code):
+        """
+        Ставит фигуру на пустую клетку
+
+        :param sq: Клетка
+        :type sq: int
+        :param code: Код фигуры
+        :type code: int
+        """
+        self.board[sq] = code
+        pieces = self.pieces[code >> 3]
+        self.index[sq] = len(pieces)
+        pieces.append(sq)
+        self.piece_key ^= PIECE_KEYS[code][sq]
+        self.material[code] += 1
+        if code & 7 == KING:
+            self.kings[code >> 3] = sq
+
+    def remove_piece(self, sq):
+        """
+        Убирает фигуру с клетки
+
+        :param sq: Клетка
+        :type sq: int
+        """
+        code = self.board[sq]
+        self.board[sq] = EMPTY
+        pieces = self.pieces[code >> 3]
+        last = pieces.pop()
+        if last != sq:
+            i = self.index[sq]
+            pieces[i] = last
+            self.index[last] = i
+        self.piece_key ^= PIECE_KEYS[code][sq]
+        self.material[code] -= 1
+        if code & 7 == KING and self.kings[code >> 3] == sq:
+            self.kings[code >> 3] = -1
+
+    def move_piece(self, frm, to):
+        """
+        Переставляет фигуру на пустую клетку
+
+        :param frm: Исходная клетка
+        :type frm: int
+        :param to: Конечная клетка
+        :type to: int
+        """
+        code = self.board[frm]
+        self.board[to] = code
+        self.board[frm] = EMPTY
+        i = self.index[frm]
+        self.pieces[code >> 3][i] = to
+        self.index[to] = i
+        keys = PIECE_KEYS[code]
+        self.piece_key ^= keys[frm] ^ keys[to]
+        if code & 7 == KING:
+            self.kings[code >> 3] = to
+
+    def replace_piece(self, sq, code):
+        """
+        Заменяет фигуру на клетке другой фигурой того же цвета (превращение пешки и его отмена)
+
+        :param sq: Клетка
+        :type sq: int
+        :param code: Код новой фигуры
+        :type code: int
+        """
+        old = self.board[sq]
+        self.board[sq] = code
+        self.piece_key ^= PIECE_KEYS[old][sq] ^ PIECE_KEYS[code][sq]
+        self.material[old] -= 1
+        self.material[code] += 1
+
+    def build_move(self, frm, to, promo=0) -> int:
+        """
+        Кодирует ход с клетки на клетку, определяя флаги (рокировка, взятие на проходе, ход пешки на два поля)
+
+        :param frm: Исходная клетка
+        :type frm: int
+        :param to: Конечная клетка
+        :type to: int
+        :param promo: Тип фигуры для превращения пешки
+        :type promo: int
+        :returns: Код хода
+        """
+        ptype = self.board[frm] & 7
+        flag = 0
+        if ptype == PAWN:
+            if abs(to - frm) == 16:
+                flag = FLAG_DOUBLE
+            elif to == self.ep and (to - frm) % 8:
+                flag = FLAG_EP
+        elif ptype == KING and abs(to - frm) == 2:
+            flag = FLAG_CASTLE
+        return frm | to << 6 | promo << 12 | flag << 15
+
+    def changed_squares(self, move, side) -> tuple:
+        """
+        Перечисляет клетки, содержимое которых меняет ход: исходная и конечная клетки, клетка пешки,
+        взятой на проходе, и клетки ладьи при рокировке
+
+        :param move: Код хода
+        :type move: int
+        :param side: Цвет игрока, делающего ход
+        :type side: int
+        :returns: Изменяемые клетки
+        """
+        frm, to, flag = move & 63, move >> 6 & 63, move >> 15
+        if flag & FLAG_EP:
+            return frm, to, to + 8 if side == WHITE else to - 8
+        if flag & FLAG_CASTLE:
+            return (frm, to) + CASTLE_ROOK[to]
+        return frm, to
+
+    def make(self, move):
+        """
+        Выполняет ход и запоминает всё необходимое для его отмены
+
+        :param move: Код хода
+        :type move: int
+        """
+        board = self.board
+        side = self.side
+        frm, to, promo, flag = move & 63, move >> 6 & 63, move >> 12 & 7, move >> 15
+        code = board[frm]
+        if flag & FLAG_EP:
+            cap_sq = to + 8 if side == WHITE else to - 8
+            captured = board[cap_sq]
+            self.remove_piece(cap_sq)
+        else:
+            captured = board[to]
+            if captured:
+                self.remove_piece(to)
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove))
+        self.move_piece(frm, to)
+        if promo:
+            self.replace_piece(to, promo | side << 3)
+        elif flag & FLAG_CASTLE:
+            rook_from, rook_to = CASTLE_ROOK[to]
+            self.move_piece(rook_from, rook_to)
+        self.castling &= CASTLE_MASK[frm] & CASTLE_MASK[to]
+        self.ep = (frm + to) >> 1 if flag & FLAG_DOUBLE else -1
+        self.halfmove = 0 if captured or code & 7 == PAWN else self.halfmove + 1
+        if side == BLACK:
+            self.fullmove += 1
+        self.side = side ^ 1
+        key = self.key()
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+
+    def unmake(self):
+        """
+        Отменяет последний выполненный ход
+        """
+        key = self.key()
+        if self.repetitions.get(key, 0) > 1:
+            self.repetitions[key] -= 1
+        else:
+            self.repetitions.pop(key, None)
+        move, captured, self.castling, self.ep, self.halfmove = self.history.pop()
+        side = self.side ^ 1
+        self.side = side
+        if side == BLACK:
+            self.fullmove -= 1
+        frm, to, promo, flag = move & 63, move >> 6 & 63, move >> 12 & 7, move >> 15
+        if promo:
+            self.replace_piece(to, PAWN | side << 3)
+        elif flag & FLAG_CASTLE:
+            rook_from, rook_to = CASTLE_ROOK[to]
+            self.move_piece(rook_to, rook_from)
+        self.move_piece(to, frm)
+        if captured:
+            if flag & FLAG_EP:
+                self.add_piece(to + 8 if side == WHITE else to - 8, captured)
+            else:
+                self.add_piece(to, captured)
+
+    def key(self) -> int:
+        """
+        Вычисляет 64-битный ключ Zobrist позиции (совместимый с Polyglot) из поддерживаемого ключа расстановки,
+        очереди хода, прав на рокировку и поля взятия на проходе. Вертикаль взятия на проходе учитывается,
+        только если рядом стоит пешка, которая может его выполнить
+
+        :returns: Ключ позиции
+        """
+        key = self.piece_key ^ CASTLE_KEYS[self.castling]
+        side = self.side
+        if side == WHITE:
+            key ^= SIDE_KEY
+        ep = self.ep
+        if ep >= 0:
+            pawn = PAWN | side << 3
+            for s in PAWN_ATTACKS[side ^ 1][ep]:
+                if self.board[s] == pawn:
+                    key ^= EP_KEYS[ep & 7]
+                    break
+        return key
+
+    def is_repetition(self, count=3) -> bool:
+        """
+        Проверяет, встречалась ли текущая позиция в партии заданное число раз
+
+        :param count: Требуемое число повторений
+        :type count: int
+        :returns: True если позиция повторилась count раз
+        """
+        return self.repetitions.get(self.key(), 0) >= count
+
+    def is_fifty_moves(self) -> bool:
+        """
+        Проверяет правило 50 ходов: последние 50 ходов каждой стороны сделаны без взятий и ходов пешками
+
+        :returns: True если можно зафиксировать ничью
+        """
+        return self.halfmove >= 100
+
+    def is_insufficient_material(self) -> bool:
+        """
+        Проверяет, что ни одна сторона не может поставить мат: остались только короли и не более одной лёгкой фигуры,
+        либо только слоны, стоящие на полях одного цвета. Решение принимается по счётчикам материала
+
+        :returns: True если материала для мата недостаточно
+        """
+        material = self.material
+        for color in WHITE, BLACK:
+            base = color << 3
+            if material[base | PAWN] or material[base | ROOK] or material[base | QUEEN]:
+                return False
+        knights = material[KNIGHT] + material[KNIGHT | BLACK << 3]
+        bishops = material[BISHOP] + material[BISHOP | BLACK << 3]
+        if knights + bishops <= 1:
+            return True
+        if knights:
+            return False
+        colors = {(sq >> 3 ^ sq) & 1 for sq in self.pieces[WHITE] + self.pieces[BLACK] if self.board[sq] & 7 == BISHOP}
+        return len(colors) == 1
+
+    def is_attacked(self, sq, by) -> bool:
+        """
+        Проверяет, атакована ли клетка фигурами заданного цвета. Поиск идёт от самой клетки
+
+        :param sq: Клетка
+        :type sq: int
+        :param by: Цвет атакующих фигур
+        :type by: int
+        :returns: True если клетка атакована
+        """
+        board = self.board
+        base = by << 3
+        pawn = base | PAWN
+        for s in PAWN_ATTACKS[by ^ 1][sq]:
+            if board[s] == pawn:
+                return True
+        knight = base | KNIGHT
+        for s in KNIGHT_TARGETS[sq]:
+            if board[s] == knight:
+                return True
+        king = base | KING
+        for s in KING_TARGETS[sq]:
+            if board[s] == king:
+                return True
+        rays = RAYS[sq]
+        rook, queen = base | ROOK, base | QUEEN
+        for d in ORTHOGONAL:
+            for s in rays[d]:
+                code = board[s]
+                if code:
+                    if code == rook or code == queen:
+                        return True
+                    break
+        bishop = base | BISHOP
+        for d in DIAGONAL:
+            for s in rays[d]:
+                code = board[s]
+                if code:
+                    if code == bishop or code == queen:
+                        return True
+                    break
+        return False
+
+    def attackers(self, sq, by) -> list:
+        """
+        Находит все фигуры заданного цвета, атакующие клетку
+
+        :param sq: Клетка
+        :type sq: int
+        :param by: Цвет атакующих фигур
+        :type by: int
+        :returns: Клетки атакующих фигур
+        """
+        board = self.board
+        base = by << 3
+        found = [s for s in PAWN_ATTACKS[by ^ 1][sq] if board[s] == base | PAWN]
+        found += [s for s in KNIGHT_TARGETS[sq] if board[s] == base | KNIGHT]
+        found += [s for s in KING_TARGETS[sq] if board[s] == base | KING]
+        rays = RAYS[sq]
+        for d in range(8):
+            slider = base | (ROOK if d & 1 == 0 else BISHOP)
+            for s in rays[d]:
+                code = board[s]
+                if code:
+                    if code == slider or code == base | QUEEN:
+                        found.append(s)
+                    break
+        return found
+
+    def pins(self, king, side) -> dict:
+        """
+        Находит связанные фигуры, просматривая лучи от короля
+
+        :param king: Клетка короля
+        :type king: int
+        :param side: Цвет короля
+        :type side: int
+        :returns: Словарь {клетка связанной фигуры: клетки луча, по которым она может ходить}
+        """
+        board = self.board
+        pins = {}
+        opp = (side ^ 1) << 3
+        rays = RAYS[king]
+        for d in range(8):
+            slider = opp | (ROOK if d & 1 == 0 else BISHOP)
+            own = -1
+            for i, s in enumerate(rays[d]):
+                code = board[s]
+                if code:
+                    if code >> 3 == side:
+                        if own >= 0:
+                            break
+                        own = s
+                    else:
+                        if own >= 0 and (code == slider or code == opp | QUEEN):
+                            pins[own] = rays[d][:i + 1]
+                        break
+        return pins
+
+    def targets(self, sq) -> list:
+        """
+        Перебирает клетки, на которые может пойти фигура без учёта шаха собственному королю
+
+        :param sq: Клетка фигуры
+        :type sq: int
+        :returns: Конечные клетки ходов
+        """
+        board = self.board
+        code = board[sq]
+        color = code >> 3
+        ptype = code & 7
+        if ptype == PAWN:
+            found = []
+            step = -8 if color == WHITE else 8
+            one = sq + step
+            if 0 <= one < 64 and not board[one]:
+                found.append(one)
+            for t in PAWN_ATTACKS[color][sq]:
+                if (board[t] and board[t] >> 3 != color) or (t == self.ep and color == self.side):
+                    found.append(t)
+            if (sq >> 3) == (6 if color == WHITE else 1) and not board[one] and not board[one + step]:
+                found.append(one + step)
+            return found
+        if ptype == KNIGHT:
+            return [t for t in KNIGHT_TARGETS[sq] if not board[t] or board[t] >> 3 != color]
+        if ptype == KING:
+            return [t for t in KING_TARGETS[sq] if not board[t] or board[t] >> 3 != color]
+        if ptype == ROOK:
+            return self.slider_targets(sq, ROOK_DIRS, color)
+        if ptype == BISHOP:
+            return self.slider_targets(sq, BISHOP_DIRS, color)
+        return self.slider_targets(sq, ROOK_DIRS, color) + self.slider_targets(sq, BISHOP_DIRS, color)
+
+    def slider_targets(self, sq, dirs, color) -> list:
+        """
+        Перебирает клетки по лучам дальнобойной фигуры до первой занятой клетки
+
+        :param sq: Клетка фигуры
+        :type sq: int
+        :param dirs: Номера направлений
+        :type dirs: tuple(int)
+        :param color: Цвет фигуры
+        :type color: int
+        :returns: Конечные клетки ходов
+        """
+        board = self.board
+        found = []
+        rays = RAYS[sq]
+        for d in dirs:
+            for t in rays[d]:
+                code = board[t]
+                if code:
+                    if code >> 3 != color:
+                        found.append(t)
+                    break
+                found.append(t)
+        return found
+
+    def castling_moves(self) -> list:
+        """
+        Перебирает доступные рокировки игрока, чей ход: право не потеряно, клетки между королём и ладьёй свободны,
+        король не под шахом и не проходит через атакованные поля
+
+        :returns: Коды ходов рокировки
+        """
+        board = self.board
+        side = self.side
+        opp = side ^ 1
+        moves = []
+        for right, king, to, rook, rook_to, between in CASTLING[side]:
+            if self.castling & right and board[king] == KING | side << 3 and board[rook] == ROOK | side << 3 and \
+                    not any(board[s] for s in between) and not self.is_attacked(king, opp) and \
+                    not self.is_attacked(rook_to, opp) and not self.is_attacked(to, opp):
+                moves.append(king | to << 6 | FLAG_CASTLE << 15)
+        return moves
+
+    def _constraints(self) -> tuple:
+        board = self.board
+        side = self.side
+        king = self.kings[side]
+        if king < 0:
+            return [], {}, None
+        checkers = self.attackers(king, side ^ 1)
+        pins = self.pins(king, side)
+        block = None
+        if len(checkers) == 1:
+            checker = checkers[0]
+            block = {checker}
+            if board[checker] & 7 in (BISHOP, ROOK, QUEEN):
+                for s in RAYS[king][DIRECTION[king << 6 | checker]]:
+                    if s == checker:
+                        break
+                    block.add(s)
+        return checkers, pins, block
+
+    def _piece_moves(self, sq, checkers, pins, block, moves):
+        board = self.board
+        side = self.side
+        opp = side ^ 1
+        append = moves.append
+        ptype = board[sq] & 7
+        if ptype == KING:
+            moves += self.king_moves(sq, checkers)
+            return
+        if len(checkers) > 1:
+            return
+        pin = pins.get(sq)
+        if ptype == PAWN:
+            last_rank = 0 if side == WHITE else 7
+            for t in self.targets(sq):
+                if t == self.ep and not board[t]:
+                    if self._ep_is_safe(sq, t, self.kings[side], opp):
+                        append(sq | t << 6 | FLAG_EP << 15)
+                    continue
+                if (block is not None and t not in block) or (pin is not None and t not in pin):
+                    continue
+                if t >> 3 == last_rank:
+                    for promo in PROMOTIONS:
+                        append(sq | t << 6 | promo << 12)
+                elif abs(t - sq) == 16:
+                    append(sq | t << 6 | FLAG_DOUBLE << 15)
+                else:
+                    append(sq | t << 6)
+        elif ptype == KNIGHT:
+            if pin is not None:
+                return
+            for t in KNIGHT_TARGETS[sq]:
+                target = board[t]
+                if (not target or target >> 3 == opp) and (block is None or t in block):
+                    append(sq | t << 6)
+        else:
+            rays = RAYS[sq]
+            dirs = ORTHOGONAL if ptype == ROOK else DIAGONAL if ptype == BISHOP else range(8)
+            for d in dirs:
+                for t in rays[d]:
+                    target = board[t]
+                    if target and target >> 3 == side:
+                        break
+                    if (block is None or t in block) and (pin is None or t in pin):
+                        append(sq | t << 6)
+                    if target:
+                        break
+
+    def legal_moves(self) -> list:
+        """
+        Генерирует все допустимые ходы игрока, чей ход. Шахи и связки находятся один раз от клетки короля,
+        ходы короля и взятие на проходе проверяются на доске без копирования
+
+        :returns: Коды допустимых ходов
+        """
+        checkers, pins, block = self._constraints()
+        moves = []
+        for sq in self.pieces[self.side]:
+            self._piece_moves(sq, checkers, pins, block, moves)
+        if self.kings[self.side] >= 0 and not checkers and self.castling:
+            moves += self.castling_moves()
+        return moves
+
+    def iter_legal_moves(self):
+        """
+        Лениво перебирает допустимые ходы игрока, чей ход. Ходы генерируются по одной фигуре: сначала король,
+        затем остальные фигуры и рокировки, поэтому перебор можно прервать после первого найденного хода.
+        Между шагами перебора позицию можно изменять, если перед следующим шагом она возвращается обратно
+
+        :returns: Генератор кодов допустимых ходов
+        """
+        checkers, pins, block = self._constraints()
+        king = self.kings[self.side]
+        if king >= 0:
+            yield from self.king_moves(king, checkers)
+        if len(checkers) < 2:
+            for sq in tuple(self.pieces[self.side]):
+                if sq != king:
+                    moves = []
+                    self._piece_moves(sq, checkers, pins, block, moves)
+                    yield from moves
+        if king >= 0 and not checkers and self.castling:
+            yield from self.castling_moves()
+
+    def has_legal_move(self) -> bool:
+        """
+        Проверяет, есть ли у игрока, чей ход, хотя бы один допустимый ход. Генерация останавливается на первом ходе
+
+        :returns: True если допустимый ход есть
+        """
+        for _ in self.iter_legal_moves():
+            return True
+        return False
+
+    def status(self) -> "GameStatus":
+        """
+        Определяет состояние партии для игрока, чей ход. Требует не более одной частичной генерации ходов
+
+        :returns: Состояние партии
+        """
+        check = self.in_check()
+        if self.has_legal_move():
+            return GameStatus.CHECK if check else GameStatus.ONGOING
+        return GameStatus.CHECKMATE if check else GameStatus.STALEMATE
+
+    def king_moves(self, sq, checkers) -> list:
+        """
+        Генерирует допустимые ходы короля: король снимается с доски, и каждое поле проверяется на атаку
+
+        :param sq: Клетка короля
+        :type sq: int
+        :param checkers: Клетки фигур, объявивших шах
+        :type checkers: list[int]
+        :returns: Коды ходов короля
+        """
+        board = self.board
+        code = board[sq]
+        opp = code >> 3 ^ 1
+        board[sq] = EMPTY
+        # Доска временно изменена, поэтому атака проверяется просмотром лучей, даже если подкласс хранит карты атак
+        moves = [sq | t << 6 for t in KING_TARGETS[sq]
+                 if (not board[t] or board[t] >> 3 == opp) and not Position.is_attacked(self, t, opp)]
+        board[sq] = code
+        return moves
+
+    def _ep_is_safe(self, sq, to, king, opp) -> bool:
+        board = self.board
+        cap_sq = to + 8 if opp == BLACK else to - 8
+        pawn, victim = board[sq], board[cap_sq]
+        board[sq] = board[cap_sq] = EMPTY
+        board[to] = pawn
+        safe = king < 0 or not Position.is_attacked(self, king, opp)
+        board[to] = EMPTY
+        board[sq], board[cap_sq] = pawn, victim
+        return safe
+
+    def in_check(self) -> bool:
+        """
+        Проверяет, находится ли король игрока, чей ход, под шахом
+
+        :returns: True если король под шахом
+        """
+        king = self.kings[self.side]
+        return king >= 0 and self.is_attacked(king, self.side ^ 1)
+
+
+class BoardRow:
+    """
+    Строковое представление одного ряда позиции. Поддерживает чтение, срезы и запись имён фигур
+    """
+    __slots__ = ("position", "start")
+
+    def __init__(self, position, row):
+        self.position = position
+        self.start = row * 8
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [self.position.piece_name(self.start + c) for c in range(8)[col]]
+        if not -8 <= col < 8:
+            raise IndexError("board index out of range")
+        return self.position.piece_name(self.start + col % 8)
+
+    def __setitem__(self, col, name):
+        if not -8 <= col < 8:
+            raise IndexError("board index out of range")
+        self.position.set_square(self.start + col % 8, name)
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other):
+        return self[:] == list(other)
+
+    def __repr__(self):
+        return repr(self[:])
+
+
+class BoardView:
+    """
+    Строковое представление позиции в виде матрицы 8x8 ("p_white", "No_piece", "s_black", ...),
+    совместимое с прежним форматом Chess.board. Запись в клетку изменяет саму позицию
+    """
+    __slots__ = ("position",)
+
+    def __init__(self, position):
+        self.position = position
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [BoardRow(self.position, r) for r in range(8)[row]]
+        if not -8 <= row < 8:
+            raise IndexError("board index out of range")
+        return BoardRow(self.position, row % 8)
+
+    def __len__(self):
+        return 8
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __eq__(self, other):
+        return [row[:] for row in self] == [list(row) for row in other]
+
+    def __repr__(self):
+        return repr(self.position.to_rows())
@@ -0,0 +1,247 @@
+"""
+Профилирование горячих путей игры по полуходам: число вызовов, суммарное и наибольшее время вызова
+и число сгенерированных узлов (ходов или перерисованных клеток) для find_valid_moves, simulate,
+is_square_under_attack, castle и draw_board.
+
+Профилирование включается переменной окружения CHESS_PROFILE (путь к отчёту .json или .csv, "1" — profile.json)
+или флагом командной строки --profile [FILE] в любом её месте (FILE — путь с расширением .json или .csv),
+например python -m chess --profile или python -m chess bench --profile bench.json. Методы оборачиваются только при включении,
+поэтому без профилирования накладных расходов нет. Отчёт записывается по окончании партии и при выходе;
+каждая следующая партия сеанса записывается в свой файл с номером партии (profile-2.json, profile-3.json...).
+При CHESS_PROFILE_OVERLAY=1 итоги последнего полухода выводятся поверх окна доски.
+"""
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+DEFAULT_REPORT = "profile.json"
+FIELDS = ("ply", "function", "calls", "total_ms", "max_ms", "nodes")
+
+
+def _count_targets(valid_moves) -> int:
+    return sum(len(targets) for row in valid_moves for targets in row)
+
+
+def _drawn_squares(game, args, kwargs, result) -> int:
+    squares = kwargs.get("squares", args[1] if len(args) > 1 else None)
+    return 64 if squares is None else len(squares)
+
+
+HOT_PATHS = {
+    "find_valid_moves": lambda game, args, kwargs, result: _count_targets(result),
+    "simulate": lambda game, args, kwargs, result: _count_targets(game.valid_moves),
+    "is_square_under_attack": None,
+    "castle": lambda game, args, kwargs, result: result,
+    "draw_board": _drawn_squares,
+}
+
+active = None
+
+
+class Profiler:
+    """
+    Счётчики горячих путей по полуходам
+
+    :ivar path: Путь к отчёту (.json или .csv)
+    :type path: str
+    :ivar overlay: Выводить итоги полухода поверх окна доски
+    :type overlay: bool
+    :ivar plies: Счётчики по номеру полухода и имени функции: [вызовы, суммарное время, наибольшее время, узлы]
+    :type plies: dict{int: dict{str: list}}
+    :ivar game_number: Номер текущей партии сеанса (с 1)
+    :type game_number: int
+    """
+
+    def __init__(self, path=DEFAULT_REPORT, overlay=False):
+        """
+        :param path: Путь к отчёту
+        :type path: str
+        :param overlay: Выводить итоги полухода поверх окна доски
+        :type overlay: bool
+        """
+        self.path = path
+        self.overlay = overlay
+        self.plies = {}
+        self.game_number = 1
+        self._originals = []
+        self._lock = threading.Lock()
+
+    def wrap(self, name, function, nodes):
+        """
+        Оборачивает метод: время вызова и число узлов добавляются к счётчикам полухода партии,
+        из которой метод вызван
+
+        :param name: Имя функции в отчёте
+        :type name: str
+        :param function: Исходный метод
+        :type function: function
+        :param nodes: Функция подсчёта узлов (объект, аргументы без объекта, именованные аргументы, результат) или None
+        :type nodes: function
+        :returns: Обёрнутый метод
+        """
+        clock = time.perf_counter
+
+        @wraps(function)
+        def wrapper(game, *args, **kwargs):
+            start = clock()
+            result = function(game, *args, **kwargs)
+            elapsed = clock() - start
+            count = nodes(game, args, kwargs, result) if nodes is not None else 0
+            ply = len(game.position.history)
+            with self._lock:
+                record = self.plies.setdefault(ply, {}).get(name)
+                if record is None:
+                    self.plies[ply][name] = [1, elapsed, elapsed, count]
+                else:
+                    record[0] += 1
+                    record[1] += elapsed
+                    record[3] += count
+                    if elapsed > record[2]:
+                        record[2] = elapsed
+            return result
+        return wrapper
+
+    def install(self, *classes):
+        """
+        Оборачивает горячие пути, определённые в классах (унаследованные методы оборачиваются в базовом классе)
+
+        :param classes: Классы игры
+        :type classes: type
+        """
+        for cls in classes:
+            for name, nodes in HOT_PATHS.items():
+                function = cls.__dict__.get(name)
+                if function is not None:
+                    self._originals.append((cls, name, function))
+                    setattr(cls, name, self.wrap(name, function, nodes))
+
+    def uninstall(self):
+        """
+        Возвращает исходные методы
+        """
+        for cls, name, function in reversed(self._originals):
+            setattr(cls, name, function)
+        self._originals = []
+
+    def reset(self):
+        """
+        Очищает счётчики перед новой партией. Отчёт новой партии записывается в отдельный файл
+        """
+        with self._lock:
+            self.plies = {}
+            self.game_number += 1
+
+    def report_path(self) -> str:
+        """
+        Возвращает путь к отчёту текущей партии: для первой партии сеанса — path, для следующих
+        к имени файла добавляется номер партии
+
+        :returns: Путь к отчёту
+        """
+        if self.game_number == 1:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}-{self.game_number}{ext}"
+
+    def rows(self) -> list:
+        """
+        Собирает строки отчёта по полуходам
+
+        :returns: Строки с полями FIELDS
+        """
+        with self._lock:
+            return [{"ply": ply, "function": name, "calls": record[0], "total_ms": round(record[1] * 1000, 4),
+                     "max_ms": round(record[2] * 1000, 4), "nodes": record[3]}
+                    for ply, functions in sorted(self.plies.items()) for name, record in functions.items()]
+
+    def summary(self, ply=None, limit=None) -> str:
+        """
+        Описывает полуход одной строкой: суммарное время функций в порядке убывания
+
+        :param ply: Номер полухода (по умолчанию — последний записанный)
+        :type ply: int
+        :param limit: Наибольшее число функций в описании
+        :type limit: int
+        :returns: Описание полухода
+        """
+        with self._lock:
+            if not self.plies:
+                return ""
+            if ply is None:
+                ply = max(self.plies)
+            functions = sorted(self.plies.get(ply, {}).items(), key=lambda item: -item[1][1])[:limit]
+        return f"Полуход {ply}: " + ", ".join(f"{name} {record[1] * 1000:.2f} мс ×{record[0]}"
+                                               for name, record in functions)
+
+    def dump(self, path=None):
+        """
+        Записывает отчёт в формате JSON или CSV (по расширению файла). Пустой отчёт (партия без единого
+        полухода) не записывается
+
+        :param path: Путь к отчёту (по умолчанию — отчёт текущей партии, см. report_path)
+        :type path: str
+        """
+        path = path or self.report_path()
+        rows = self.rows()
+        if not rows:
+            return
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(file, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump({"plies": rows}, file, ensure_ascii=False, indent=1)
+
+
+def enable(classes, path=None, overlay=None) -> Profiler:
+    """
+    Включает профилирование игры: оборачивает горячие пути классов и записывает отчёт при выходе
+
+    :param classes: Классы игры (Game и Chess)
+    :type classes: tuple(type)
+    :param path: Путь к отчёту (по умолчанию — из CHESS_PROFILE или profile.json)
+    :type path: str
+    :param overlay: Выводить итоги полухода поверх окна доски (по умолчанию — из CHESS_PROFILE_OVERLAY)
+    :type overlay: bool
+    :returns: Включённый профилировщик
+    """
+    global active
+    if active is not None:
+        return active
+    if path is None:
+        path = os.environ.get("CHESS_PROFILE", "1")
+    if overlay is None:
+        overlay = os.environ.get("CHESS_PROFILE_OVERLAY", "") not in ("", "0")
+    active = Profiler(DEFAULT_REPORT if path == "1" else path, overlay)
+    active.install(*classes)
+    atexit.register(active.dump)
+    return active
+
+
+def enable_from_environment(classes) -> Profiler:
+    """
+    Включает профилирование, если задана переменная окружения CHESS_PROFILE
+
+    :param classes: Классы игры
+    :type classes: tuple(type)
+    :returns: Включённый профилировщик или None
+    """
+    if os.environ.get("CHESS_PROFILE", "") in ("", "0"):
+        return None
+    return enable(classes)
+
+
+def disable():
+    """
+    Выключает профилирование и возвращает исходные методы
+    """
+    global active
+    if active is not None:
+        active.uninstall()
+        atexit.unregister(active.dump)
+        active = None
@@ -0,0 +1,169 @@
+"""
+Отрисовка доски на холсте tkinter в сохраняемом режиме: клетки, подписи, фигуры и выделения создаются
+один раз с тегами, а при ходе или выборе фигуры изменяются только затронутые элементы через
+coords/itemconfig. Число элементов холста не растёт с числом ходов
+"""
+from position import UnknownPiece
+
+LIGHT, DARK = "#F0D9B5", "#B58863"
+HIGHLIGHT = "#829769"
+PIECE_IMAGES = {"p": "pawn", "n": "knight", "b": "bishop", "r": "rook", "q": "queen", "k": "king"}
+
+
+class BoardRenderer:
+    """
+    Сохраняемое представление доски на холсте
+
+    :ivar canvas: Холст для рисования доски
+    :type canvas: tk.Canvas
+    :ivar images: Изображения фигур по именам "white_pawn", "black_king", ...
+    :type images: dict{ImageTk.PhotoImage}
+    :ivar cell_size: Размер клетки в пикселях
+    :type cell_size: int
+    :ivar shown: Имена фигур, показанных на каждой клетке
+    :type shown: list[str]
+    :ivar pieces: Элементы холста с изображениями фигур для каждой клетки
+    :type pieces: list[int]
+    :ivar selection: Элемент выделения выбранной фигуры
+    :type selection: int
+    :ivar check: Элемент обводки короля под шахом (None, пока шаха не было)
+    :type check: int
+    :ivar hints: Созданные элементы подсказок по клетке и виду хода
+    :type hints: dict{tuple(int, bool): tuple(int)}
+    """
+
+    def __init__(self, canvas, images, cell_size=80):
+        """
+        Создаёт клетки, подписи координат и элементы фигур (пока скрытые)
+
+        :param canvas: Холст для рисования доски
+        :type canvas: tk.Canvas
+        :param images: Изображения фигур
+        :type images: dict{ImageTk.PhotoImage}
+        :param cell_size: Размер клетки в пикселях
+        :type cell_size: int
+        """
+        self.canvas = canvas
+        self.images = images
+        self.cell_size = cell_size
+        self.shown = ["No_piece"] * 64
+        self.hints = {}
+        self.visible_hints = []
+        size = cell_size
+        for sq in range(64):
+            row, col = sq >> 3, sq & 7
+            color = LIGHT if (row + col) % 2 == 0 else DARK
+            canvas.create_rectangle(col * size, row * size, (col + 1) * size, (row + 1) * size,
+                                    fill=color, outline=color, tags="square")
+        for i in range(8):
+            canvas.create_text(i * size + 3, 8 * size, text=chr(ord('a') + i), font=("Arial", 9),
+                               fill=DARK if i % 2 else LIGHT, anchor='sw', tags="label")
+            canvas.create_text(8 * size - 3, i * size + 3, text=str(8 - i), font=("Arial", 9),
+                               fill=DARK if i % 2 else LIGHT, anchor='ne', tags="label")
+        self.selection = canvas.create_rectangle(0, 0, size, size, fill=HIGHLIGHT, outline=HIGHLIGHT,
+                                                 state="hidden", tags="selection")
+        self.pieces = [canvas.create_image((sq & 7) * size, (sq >> 3) * size, anchor='nw', state="hidden",
+                                           tags="piece") for sq in range(64)]
+        self.check = None
+
+    def set_piece(self, sq, name):
+        """
+        Показывает фигуру на клетке. Элемент холста изменяется, только если фигура на клетке поменялась
+
+        :param sq: Клетка
+        :type sq: int
+        :param name: Имя фигуры ("p_white", "No_piece", "s_black", ...)
+        :type name: str
+        :raises UnknownPiece: Если для фигуры нет изображения
+        """
+        if name[0] == "s":
+            name = "No_piece"
+        if self.shown[sq] == name:
+            return
+        if name == "No_piece":
+            self.canvas.itemconfig(self.pieces[sq], state="hidden")
+        else:
+            try:
+                image = self.images[f"{name[2:]}_{PIECE_IMAGES[name[0]]}"]
+            except KeyError:
+                raise UnknownPiece
+            self.canvas.itemconfig(self.pieces[sq], image=image, state="normal")
+        self.shown[sq] = name
+
+    def select(self, sq):
+        """
+        Выделяет клетку выбранной фигуры или снимает выделение
+
+        :param sq: Клетка (None — снять выделение)
+        :type sq: int
+        """
+        if sq is None:
+            self.canvas.itemconfig(self.selection, state="hidden")
+            return
+        size = self.cell_size
+        x, y = (sq & 7) * size, (sq >> 3) * size
+        self.canvas.coords(self.selection, x, y, x + size, y + size)
+        self.canvas.itemconfig(self.selection, state="normal")
+
+    def _hint(self, sq, capture) -> tuple:
+        key = (sq, capture)
+        items = self.hints.get(key)
+        if items is None:
+            canvas = self.canvas
+            size = self.cell_size
+            x, y = (sq & 7) * size, (sq >> 3) * size
+            if capture:
+                c = 18
+                items = (
+                    canvas.create_polygon(x, y, x + c, y, x, y + c, fill=HIGHLIGHT, outline=HIGHLIGHT, tags="hint"),
+                    canvas.create_polygon(x, y + size, x, y + size - c, x + c, y + size,
+                                          fill=HIGHLIGHT, outline=HIGHLIGHT, tags="hint"),
+                    canvas.create_polygon(x + size, y + size, x + size, y + size - c, x + size - c, y + size,
+                                          fill=HIGHLIGHT, outline=HIGHLIGHT, tags="hint"),
+                    canvas.create_polygon(x + size, y, x + size - c, y, x + size, y + c,
+                                          fill=HIGHLIGHT, outline=HIGHLIGHT, tags="hint"),
+                )
+            else:
+                items = (canvas.create_oval(x + 30, y + 30, x + 50, y + 50, fill=HIGHLIGHT, outline=HIGHLIGHT,
+                                            tags="hint"),)
+            self.hints[key] = items
+        return items
+
+    def show_moves(self, targets):
+        """
+        Показывает возможные ходы выбранной фигуры: точку на свободной клетке и уголки на клетке со взятием.
+        Элементы подсказок создаются один раз для каждой клетки и затем только скрываются и показываются
+
+        :param targets: Пары (клетка, является ли ход взятием)
+        :type targets: list[tuple(int, bool)]
+        """
+        canvas = self.canvas
+        for items in self.visible_hints:
+            for item in items:
+                canvas.itemconfig(item, state="hidden")
+        self.visible_hints = []
+        for sq, capture in targets:
+            items = self._hint(sq, capture)
+            for item in items:
+                canvas.itemconfig(item, state="normal")
+            self.visible_hints.append(items)
+
+    def show_check(self, sq):
+        """
+        Обводит клетку короля под шахом или убирает обводку
+
+        :param sq: Клетка короля (None — шаха нет)
+        :type sq: int
+        """
+        if sq is None:
+            if self.check is not None:
+                self.canvas.itemconfig(self.check, state="hidden")
+            return
+        size = self.cell_size
+        x, y = (sq & 7) * size, (sq >> 3) * size
+        if self.check is None:
+            self.check = self.canvas.create_rectangle(x, y, x + size, y + size, outline='red', width=4,
+                                                      tags="check")
+        else:
+            self.canvas.coords(self.check, x, y, x + size, y + size)
+            self.canvas.itemconfig(self.check, state="normal")
@@ -0,0 +1,213 @@
+"""
+Стандартная алгебраическая нотация (SAN): запись хода ("e4", "Nbd7", "exd6", "O-O", "e8=Q+") и разбор записи
+в код хода. Оба направления используют уже сгенерированный список допустимых ходов позиции, разложенный
+по конечным клеткам, поэтому уточнение исходной клетки и поиск хода не требуют повторной генерации
+"""
+from position import PAWN, KING, PIECE_LETTERS, FLAG_EP, FLAG_CASTLE, square_name, parse_square
+
+SAN_PIECES = {letter.upper(): ptype for ptype, letter in enumerate(PIECE_LETTERS) if ptype > PAWN}
+
+
+class InvalidSan(Exception):
+    """
+    Исключение. Вызывается, если запись хода некорректна или не соответствует ровно одному допустимому ходу
+    """
+    pass
+
+
+class MoveIndex:
+    """
+    Допустимые ходы позиции, разложенные по конечным клеткам
+
+    :ivar position: Позиция
+    :type position: Position
+    :ivar moves: Допустимые ходы позиции
+    :type moves: list[int]
+    :ivar targets: Ходы по конечной клетке
+    :type targets: dict{int: list[int]}
+    """
+    __slots__ = ("position", "moves", "targets")
+
+    def __init__(self, position, moves=None):
+        """
+        :param position: Позиция
+        :type position: Position
+        :param moves: Допустимые ходы позиции (если не заданы, генерируются)
+        :type moves: list[int]
+        """
+        self.position = position
+        self.moves = position.legal_moves() if moves is None else moves
+        targets = {}
+        for move in self.moves:
+            to = move >> 6 & 63
+            if to in targets:
+                targets[to].append(move)
+            else:
+                targets[to] = [move]
+        self.targets = targets
+
+    def san(self, move) -> str:
+        """
+        Записывает ход в SAN без признака шаха. Исходная клетка уточняется только среди ходов фигур того же типа
+        на ту же клетку
+
+        :param move: Код хода
+        :type move: int
+        :returns: Запись хода
+        """
+        if move >> 15 & FLAG_CASTLE:
+            return "O-O" if move >> 6 & 7 == 6 else "O-O-O"
+        board = self.position.board
+        frm, to, promo = move & 63, move >> 6 & 63, move >> 12 & 7
+        ptype = board[frm] & 7
+        capture = board[to] or move >> 15 & FLAG_EP
+        if ptype == PAWN:
+            text = f"{'abcdefgh'[frm & 7]}x{square_name(to)}" if capture else square_name(to)
+            return f"{text}={PIECE_LETTERS[promo].upper()}" if promo else text
+        same_file = same_rank = ambiguous = False
+        for other in self.targets.get(to, ()):
+            sq = other & 63
+            if sq != frm and board[sq] & 7 == ptype:
+                ambiguous = True
+                same_file = same_file or sq & 7 == frm & 7
+                same_rank = same_rank or sq >> 3 == frm >> 3
+        hint = ""
+        if ambiguous:
+            if not same_file:
+                hint = "abcdefgh"[frm & 7]
+            elif not same_rank:
+                hint = str(8 - (frm >> 3))
+            else:
+                hint = square_name(frm)
+        return f"{PIECE_LETTERS[ptype].upper()}{hint}{'x' if capture else ''}{square_name(to)}"
+
+    def parse(self, san) -> int:
+        """
+        Находит допустимый ход, соответствующий записи в SAN. Просматриваются только ходы на указанную клетку
+
+        :param san: Запись хода ("Nf3", "exd5", "O-O-O", "e8=Q#")
+        :type san: str
+        :returns: Код хода
+        :raises InvalidSan: Если запись некорректна, ход недопустим или неоднозначен
+        """
+        text = san.rstrip("+#!?")
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            king = self.position.kings[self.position.side]
+            to = king - 2 if len(text) == 5 else king + 2
+            for move in self.targets.get(to, ()):
+                if move >> 15 & FLAG_CASTLE:
+                    return move
+            raise InvalidSan(f"Недопустимая рокировка: {san}")
+        promo = 0
+        if len(text) > 2 and text[-2] == "=":
+            promo = SAN_PIECES.get(text[-1], 0)
+            if not promo or promo == KING:
+                raise InvalidSan(f"Некорректное превращение: {san}")
+            text = text[:-2]
+        ptype = SAN_PIECES.get(text[:1], PAWN)
+        if ptype != PAWN:
+            text = text[1:]
+        try:
+            to = parse_square(text[-2:])
+        except ValueError:
+            raise InvalidSan(f"Некорректная запись хода: {san}")
+        hint = text[:-2].replace("x", "")
+        if len(hint) > 2 or any(ch not in "abcdefgh12345678" for ch in hint):
+            raise InvalidSan(f"Некорректная запись хода: {san}")
+        board = self.position.board
+        found = None
+        for move in self.targets.get(to, ()):
+            frm = move & 63
+            if board[frm] & 7 != ptype or move >> 12 & 7 != promo:
+                continue
+            if any(ch != ("abcdefgh"[frm & 7] if ch > "8" else str(8 - (frm >> 3))) for ch in hint):
+                continue
+            if found is not None:
+                raise InvalidSan(f"Неоднозначная запись хода: {san}")
+            found = move
+        if found is None:
+            raise InvalidSan(f"Недопустимый ход: {san}")
+        return found
+
+
+def check_suffix(position, moves=None) -> str:
+    """
+    Возвращает признак шаха или мата для позиции после хода
+
+    :param position: Позиция после хода
+    :type position: Position
+    :param moves: Допустимые ходы позиции, если уже сгенерированы
+    :type moves: list[int]
+    :returns: "#", "+" или ""
+    """
+    if not position.in_check():
+        return ""
+    if moves is None:
+        return "+" if position.has_legal_move() else "#"
+    return "+" if moves else "#"
+
+
+def parse_san(position, san, moves=None) -> int:
+    """
+    Находит допустимый ход, соответствующий записи в SAN
+
+    :param position: Позиция
+    :type position: Position
+    :param san: Запись хода
+    :type san: str
+    :param moves: Допустимые ходы позиции (если не заданы, генерируются)
+    :type moves: list[int]
+    :returns: Код хода
+    :raises InvalidSan: Если запись некорректна, ход недопустим или неоднозначен
+    """
+    return MoveIndex(position, moves).parse(san)
+
+
+def move_to_san(position, move, moves=None) -> str:
+    """
+    Записывает ход в SAN с признаком шаха или мата. Позиция временно изменяется и возвращается обратно
+
+    :param position: Позиция до хода
+    :type position: Position
+    :param move: Код допустимого хода
+    :type move: int
+    :param moves: Допустимые ходы позиции (если не заданы, генерируются)
+    :type moves: list[int]
+    :returns: Запись хода
+    """
+    text = MoveIndex(position, moves).san(move)
+    position.make(move)
+    try:
+        return text + check_suffix(position)
+    finally:
+        position.unmake()
+
+
+def moves_to_san(position, moves, legal_moves=None) -> list:
+    """
+    Записывает последовательность ходов в SAN. Для каждого полухода ходы генерируются один раз: этот же список
+    служит для уточнения исходной клетки и для определения мата предыдущим ходом. Позиция возвращается обратно
+
+    :param position: Начальная позиция
+    :type position: Position
+    :param moves: Коды допустимых ходов, сделанных один за другим
+    :type moves: list[int]
+    :param legal_moves: Функция генерации допустимых ходов (по умолчанию метод позиции)
+    :type legal_moves: function
+    :returns: Записи ходов
+    """
+    legal_moves = legal_moves or type(position).legal_moves
+    notation = []
+    made = 0
+    legal = legal_moves(position)
+    try:
+        for move in moves:
+            text = MoveIndex(position, legal).san(move)
+            position.make(move)
+            made += 1
+            legal = legal_moves(position)
+            notation.append(text + check_suffix(position, legal))
+    finally:
+        for _ in range(made):
+            position.unmake()
+    return notation
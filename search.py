@@ -0,0 +1,497 @@
+"""
+Компьютерный соперник: перебор альфа-бета (negamax) с итеративным углублением, форсированным вариантом
+(quiescence) для взятий и упорядочиванием ходов (ход из лучшего варианта предыдущей итерации, взятия
+по принципу MVV-LVA, ходы-убийцы). Перебор выполняет и отменяет ходы в одной позиции Position и не создаёт
+копий доски. После каждой итерации сообщаются глубина, число узлов и скорость перебора.
+
+Запуск: python -m chess search [--fen FEN] [--depth N] [--time SECONDS] [--hash MB] [--workers N] [--speedup]
+"""
+import argparse
+import random
+import time
+from perft import START_FEN
+from position import Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK, FLAG_EP, move_to_uci
+from tt import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE = 100000
+INFINITY = MATE + 1
+MAX_DEPTH = 64
+# Мат из эндшпильных таблиц может быть дальше MAX_DEPTH полуходов от корня
+MATE_BOUND = MATE - MAX_DEPTH * 2 - 256
+HASH_MB = 16
+
+VALUES = (0, 100, 320, 330, 500, 900, 0)
+
+# Таблицы бонусов за положение фигур с точки зрения белых, первая строка — восьмая горизонталь
+PST = {
+    PAWN: (0, 0, 0, 0, 0, 0, 0, 0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+           5, 5, 10, 25, 25, 10, 5, 5,
+           0, 0, 0, 20, 20, 0, 0, 0,
+           5, -5, -10, 0, 0, -10, -5, 5,
+           5, 10, 10, -20, -20, 10, 10, 5,
+           0, 0, 0, 0, 0, 0, 0, 0),
+    KNIGHT: (-50, -40, -30, -30, -30, -30, -40, -50,
+             -40, -20, 0, 0, 0, 0, -20, -40,
+             -30, 0, 10, 15, 15, 10, 0, -30,
+             -30, 5, 15, 20, 20, 15, 5, -30,
+             -30, 0, 15, 20, 20, 15, 0, -30,
+             -30, 5, 10, 15, 15, 10, 5, -30,
+             -40, -20, 0, 5, 5, 0, -20, -40,
+             -50, -40, -30, -30, -30, -30, -40, -50),
+    BISHOP: (-20, -10, -10, -10, -10, -10, -10, -20,
+             -10, 0, 0, 0, 0, 0, 0, -10,
+             -10, 0, 5, 10, 10, 5, 0, -10,
+             -10, 5, 5, 10, 10, 5, 5, -10,
+             -10, 0, 10, 10, 10, 10, 0, -10,
+             -10, 10, 10, 10, 10, 10, 10, -10,
+             -10, 5, 0, 0, 0, 0, 5, -10,
+             -20, -10, -10, -10, -10, -10, -10, -20),
+    ROOK: (0, 0, 0, 0, 0, 0, 0, 0,
+           5, 10, 10, 10, 10, 10, 10, 5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           0, 0, 0, 5, 5, 0, 0, 0),
+    QUEEN: (-20, -10, -10, -5, -5, -10, -10, -20,
+            -10, 0, 0, 0, 0, 0, 0, -10,
+            -10, 0, 5, 5, 5, 5, 0, -10,
+            -5, 0, 5, 5, 5, 5, 0, -5,
+            0, 0, 5, 5, 5, 5, 0, -5,
+            -10, 5, 5, 5, 5, 5, 0, -10,
+            -10, 0, 5, 0, 0, 0, 0, -10,
+            -20, -10, -10, -5, -5, -10, -10, -20),
+    KING: (-30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -20, -30, -30, -40, -40, -30, -30, -20,
+           -10, -20, -20, -20, -20, -20, -20, -10,
+           20, 20, 0, 0, 0, 0, 20, 20,
+           20, 30, 10, 0, 0, 10, 30, 20),
+}
+KING_ENDGAME = (-50, -40, -30, -20, -20, -30, -40, -50,
+                -30, -20, -10, 0, 0, -10, -20, -30,
+                -30, -10, 20, 30, 30, 20, -10, -30,
+                -30, -10, 30, 40, 40, 30, -10, -30,
+                -30, -10, 30, 40, 40, 30, -10, -30,
+                -30, -10, 20, 30, 30, 20, -10, -30,
+                -30, -30, 0, 0, 0, 0, -30, -30,
+                -50, -30, -30, -30, -30, -30, -30, -50)
+
+
+def _score_table(king) -> tuple:
+    table = [(0,) * 64] * 16
+    for ptype in range(PAWN, KING + 1):
+        pst = king if ptype == KING else PST[ptype]
+        table[ptype] = tuple(VALUES[ptype] + pst[sq] for sq in range(64))
+        table[ptype | BLACK << 3] = tuple(-VALUES[ptype] - pst[sq ^ 56] for sq in range(64))
+    return tuple(table)
+
+
+# Оценка фигуры на клетке в пользу белых: материал и бонус за положение (в середине игры и в эндшпиле)
+SCORES = _score_table(PST[KING])
+ENDGAME_SCORES = _score_table(KING_ENDGAME)
+
+
+class SearchStopped(Exception):
+    """
+    Исключение. Вызывается внутри перебора, когда истекло время или поступил сигнал остановки
+    """
+    pass
+
+
+class SearchResult:
+    """
+    Результат завершённой итерации перебора
+
+    :ivar move: Лучший ход (None, если ходов нет)
+    :type move: int
+    :ivar score: Оценка позиции в сантипешках с точки зрения ходящего игрока
+    :type score: int
+    :ivar depth: Глубина итерации
+    :type depth: int
+    :ivar nodes: Число узлов с начала перебора
+    :type nodes: int
+    :ivar time: Время с начала перебора в секундах
+    :type time: float
+    :ivar pv: Лучший вариант
+    :type pv: list[int]
+    """
+    __slots__ = ("move", "score", "depth", "nodes", "time", "pv")
+
+    def __init__(self, move, score, depth, nodes, elapsed, pv):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.time = elapsed
+        self.pv = pv
+
+    @property
+    def nps(self) -> int:
+        """
+        Скорость перебора в узлах в секунду
+        """
+        return int(self.nodes / max(self.time, 1e-9))
+
+    @property
+    def mate(self) -> int:
+        """
+        Число ходов до мата (отрицательное, если мат получает ходящий игрок), None если мат не найден
+        """
+        if abs(self.score) < MATE_BOUND:
+            return None
+        plies = MATE - abs(self.score)
+        return (plies + 1) // 2 if self.score > 0 else -((plies + 1) // 2)
+
+    def __str__(self):
+        score = f"мат {self.mate}" if self.mate is not None else f"{self.score / 100:+.2f}"
+        return (f"глубина {self.depth}, оценка {score}, узлов {self.nodes}, {self.nps} узл/с, "
+                f"вариант {' '.join(move_to_uci(move) for move in self.pv)}")
+
+
+def evaluate(position) -> int:
+    """
+    Оценивает позицию по материалу и положению фигур с точки зрения ходящего игрока
+
+    :param position: Позиция
+    :type position: Position
+    :returns: Оценка в сантипешках
+    """
+    material = position.material
+    scores = ENDGAME_SCORES if not material[QUEEN] and not material[QUEEN | BLACK << 3] else SCORES
+    board = position.board
+    score = 0
+    for sq in position.pieces[0]:
+        score += scores[board[sq]][sq]
+    for sq in position.pieces[1]:
+        score += scores[board[sq]][sq]
+    return -score if position.side else score
+
+
+def plain_position(position) -> Position:
+    """
+    Создаёт копию позиции в виде Position (без карт атак и битбордов) с историей повторений
+
+    :param position: Позиция любого генератора ходов
+    :type position: Position
+    :returns: Независимая копия
+    """
+    if type(position) is Position:
+        return position.copy()
+    plain = Position.from_fen(position.to_fen())
+    plain.repetitions = position.repetitions.copy()
+    return plain
+
+
+class Search:
+    """
+    Перебор альфа-бета с итеративным углублением
+
+    :ivar position: Позиция, в которой выполняются и отменяются ходы перебора
+    :type position: Position
+    :ivar nodes: Число просмотренных узлов
+    :type nodes: int
+    :ivar killers: Два последних тихих хода, вызвавших отсечение, для каждой глубины от корня
+    :type killers: list[list[int]]
+    :ivar stop: Событие остановки перебора из другого потока
+    :type stop: threading.Event
+    :ivar deadline: Момент time.perf_counter(), после которого перебор прерывается
+    :type deadline: float
+    :ivar pv: Лучший вариант последней завершённой итерации
+    :type pv: list[int]
+    :ivar table: Таблица перестановок
+    :type table: TranspositionTable
+    :ivar seed: Номер варианта упорядочивания тихих ходов в корне (0 — без перемешивания)
+    :type seed: int
+    :ivar tablebase: Эндшпильные таблицы, по которым оцениваются позиции из нескольких фигур
+    :type tablebase: tablebase.Tablebase
+    """
+
+    def __init__(self, position, stop=None, table=None, seed=0, tablebase=None):
+        """
+        :param position: Корневая позиция (копируется)
+        :type position: Position
+        :param stop: Событие остановки перебора
+        :type stop: threading.Event
+        :param table: Таблица перестановок (по умолчанию создаётся новая размером HASH_MB)
+        :type table: TranspositionTable
+        :param seed: Номер варианта упорядочивания тихих ходов в корне (для вспомогательных процессов)
+        :type seed: int
+        :param tablebase: Эндшпильные таблицы
+        :type tablebase: tablebase.Tablebase
+        """
+        self.position = plain_position(position)
+        self.stop = stop
+        self.table = table if table is not None else TranspositionTable(HASH_MB)
+        self.nodes = 0
+        self.killers = [[0, 0] for _ in range(MAX_DEPTH + 1)]
+        self.deadline = None
+        self.pv = []
+        self.seed = seed
+        self.tablebase = tablebase
+        self._noise = None
+        self._line = []
+
+    def run(self, depth=None, time_limit=None, on_info=None, start_depth=1) -> SearchResult:
+        """
+        Итеративно углубляет перебор, пока не достигнута глубина или не истекло время.
+        Результат прерванной итерации отбрасывается
+
+        :param depth: Максимальная глубина (None — ограничена только временем)
+        :type depth: int
+        :param time_limit: Ограничение времени в секундах (None — ограничена только глубиной)
+        :type time_limit: float
+        :param on_info: Функция, вызываемая с результатом каждой завершённой итерации
+        :type on_info: function
+        :param start_depth: Глубина первой итерации
+        :type start_depth: int
+        :returns: Результат последней завершённой итерации
+        """
+        position = self.position
+        start = time.perf_counter()
+        self.table.new_search()
+        self.deadline = start + time_limit if time_limit else None
+        depth = min(depth or MAX_DEPTH, MAX_DEPTH)
+        root_history = len(position.history)
+        moves = position.legal_moves()
+        result = SearchResult(moves[0] if moves else None, 0, 0, 0, 0.0, moves[:1])
+        if len(moves) <= 1:
+            return result
+        if self.seed:
+            rng = random.Random(self.seed)
+            self._noise = {move: -rng.randrange(1000) for move in moves}
+        for d in range(min(start_depth, depth), depth + 1):
+            try:
+                score = self.negamax(d, 0, -INFINITY, INFINITY)
+            except SearchStopped:
+                while len(position.history) > root_history:
+                    position.unmake()
+                break
+            elapsed = time.perf_counter() - start
+            result = SearchResult(self.pv[0], score, d, self.nodes, elapsed, self.pv)
+            if on_info is not None:
+                on_info(result)
+            if abs(score) >= MATE_BOUND or self.deadline is not None and elapsed * 2 > time_limit:
+                break
+        result.time = time.perf_counter() - start
+        result.nodes = self.nodes
+        return result
+
+    def _check_stop(self):
+        if self.stop is not None and self.stop.is_set() or \
+                self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchStopped
+
+    def _order(self, moves, ply, pv_move, tt_move=0) -> list:
+        board = self.position.board
+        killers = self.killers[ply]
+        noise = self._noise if ply == 0 else None
+
+        def rank(move):
+            if move == pv_move:
+                return -1000000
+            if move == tt_move:
+                return -900000
+            victim = board[move >> 6 & 63] & 7
+            if victim or move >> 15 & FLAG_EP:
+                return -10000 - VALUES[victim or PAWN] * 10 + (board[move & 63] & 7)
+            if move >> 12 & 7:
+                return -9000
+            if move == killers[0] or move == killers[1]:
+                return -5000
+            return noise[move] if noise else 0
+
+        moves.sort(key=rank)
+        return moves
+
+    def negamax(self, depth, ply, alpha, beta) -> int:
+        """
+        Перебор альфа-бета в форме negamax. На нулевой глубине продолжается форсированный вариант взятий
+
+        :param depth: Оставшаяся глубина
+        :type depth: int
+        :param ply: Расстояние от корня в полуходах
+        :type ply: int
+        :param alpha: Нижняя граница оценки
+        :type alpha: int
+        :param beta: Верхняя граница оценки
+        :type beta: int
+        :returns: Оценка позиции с точки зрения ходящего игрока
+        :raises SearchStopped: Если перебор необходимо прервать
+        """
+        position = self.position
+        self.nodes += 1
+        if self.nodes & 2047 == 0:
+            self._check_stop()
+        self._line = []
+        key = position.key()
+        if ply and (position.halfmove >= 100 or position.repetitions.get(key, 0) > 1):
+            return 0
+        if ply and self.tablebase is not None and len(position.pieces[0]) + len(position.pieces[1]) <= self.tablebase.max_pieces:
+            found = self.tablebase.probe(position)
+            if found is not None:
+                wdl, plies = found
+                return wdl * (MATE - ply - plies)
+        in_check = position.in_check()
+        if in_check:
+            depth += 1
+        if depth <= 0 or ply >= MAX_DEPTH:
+            return self.quiescence(ply, alpha, beta)
+        tt_move = 0
+        entry = self.table.probe(key)
+        if entry is not None:
+            tt_move, score, tt_depth, bound = entry
+            if ply and tt_depth >= depth:
+                if score >= MATE_BOUND:
+                    score -= ply
+                elif score <= -MATE_BOUND:
+                    score += ply
+                if bound == EXACT or bound == LOWER and score >= beta or bound == UPPER and score <= alpha:
+                    return score
+        moves = position.legal_moves()
+        if not moves:
+            return -MATE + ply if in_check else 0
+        pv_move = self.pv[ply] if ply < len(self.pv) else 0
+        alpha_start = alpha
+        best_move = 0
+        best_line = []
+        for move in self._order(moves, ply, pv_move, tt_move):
+            position.make(move)
+            score = -self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            position.unmake()
+            if score > alpha:
+                alpha = score
+                best_move = move
+                best_line = [move] + self._line
+                if score >= beta:
+                    if not position.board[move >> 6 & 63] and not move >> 12 & 7 and not move >> 15 & FLAG_EP:
+                        killers = self.killers[ply]
+                        if killers[0] != move:
+                            killers[1], killers[0] = killers[0], move
+                    break
+        bound = LOWER if alpha >= beta else EXACT if alpha > alpha_start else UPPER
+        stored = alpha + ply if alpha >= MATE_BOUND else alpha - ply if alpha <= -MATE_BOUND else alpha
+        self.table.store(key, best_move, stored, depth, bound)
+        self._line = best_line
+        if ply == 0:
+            self.pv = best_line
+        return alpha
+
+    def quiescence(self, ply, alpha, beta) -> int:
+        """
+        Форсированный вариант: рассматриваются только взятия и превращения, пока позиция не станет спокойной
+
+        :param ply: Расстояние от корня в полуходах
+        :type ply: int
+        :param alpha: Нижняя граница оценки
+        :type alpha: int
+        :param beta: Верхняя граница оценки
+        :type beta: int
+        :returns: Оценка позиции с точки зрения ходящего игрока
+        :raises SearchStopped: Если перебор необходимо прервать
+        """
+        position = self.position
+        self._line = []
+        stand = evaluate(position)
+        if stand >= beta:
+            return stand
+        if stand > alpha:
+            alpha = stand
+        board = position.board
+        captures = [move for move in position.legal_moves()
+                    if board[move >> 6 & 63] or move >> 12 & 7 or move >> 15 & FLAG_EP]
+        for move in self._order(captures, min(ply, MAX_DEPTH), 0):
+            self.nodes += 1
+            if self.nodes & 2047 == 0:
+                self._check_stop()
+            position.make(move)
+            score = -self.quiescence(ply + 1, -beta, -alpha)
+            position.unmake()
+            if score >= beta:
+                self._line = []
+                return score
+            if score > alpha:
+                alpha = score
+        self._line = []
+        return alpha
+
+
+def best_move(position, depth=None, time_limit=None, stop=None, on_info=None, table=None,
+              tablebase=None) -> SearchResult:
+    """
+    Находит лучший ход в позиции
+
+    :param position: Позиция (не изменяется)
+    :type position: Position
+    :param depth: Максимальная глубина
+    :type depth: int
+    :param time_limit: Ограничение времени в секундах
+    :type time_limit: float
+    :param stop: Событие остановки перебора из другого потока
+    :type stop: threading.Event
+    :param on_info: Функция, вызываемая с результатом каждой завершённой итерации
+    :type on_info: function
+    :param table: Таблица перестановок, сохраняемая между ходами
+    :type table: TranspositionTable
+    :param tablebase: Эндшпильные таблицы
+    :type tablebase: tablebase.Tablebase
+    :returns: Результат перебора
+    """
+    if depth is None and time_limit is None:
+        depth = 4
+    return Search(position, stop, table, tablebase=tablebase).run(depth, time_limit, on_info)
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: ищет лучший ход и выводит результат каждой итерации
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess search", description="Поиск лучшего хода")
+    parser.add_argument("--fen", default=START_FEN, help="позиция в записи FEN")
+    parser.add_argument("--depth", type=int, default=None, help="максимальная глубина")
+    parser.add_argument("--time", type=float, default=None, help="ограничение времени в секундах")
+    parser.add_argument("--hash", type=float, default=HASH_MB, help="размер таблицы перестановок в МБ")
+    parser.add_argument("--workers", type=int, default=1, help="число процессов параллельного перебора")
+    parser.add_argument("--tablebase", default=None, help="каталог эндшпильных таблиц")
+    parser.add_argument("--speedup", action="store_true",
+                        help="сравнить время достижения глубины одним процессом и --workers процессами")
+    args = parser.parse_args(argv)
+    tablebase = None
+    if args.tablebase is not None:
+        from tablebase import Tablebase
+        tablebase = Tablebase(args.tablebase)
+    if args.workers > 1 or args.speedup:
+        import smp
+        position = Position.from_fen(args.fen)
+        if args.speedup:
+            depth = args.depth or 5
+            single, parallel, speedup = smp.time_to_depth(position, depth, args.workers, args.hash)
+            print(f"Глубина {depth}\nПроцессов 1: {single.time:.3f} с, {single.nodes} узлов\n"
+                  f"Процессов {args.workers}: {parallel.time:.3f} с, {parallel.nodes} узлов\nУскорение: {speedup:.2f}")
+            return 0
+        result = smp.parallel_search(position, args.depth, args.time, args.workers, args.hash, tablebase=tablebase)
+        print(result)
+        print(f"Лучший ход: {move_to_uci(result.move) if result.move is not None else '-'}")
+        return 0
+    table = TranspositionTable(args.hash)
+    result = best_move(Position.from_fen(args.fen), args.depth, args.time, on_info=print, table=table,
+                       tablebase=tablebase)
+    stats = table.stats()
+    print(f"Лучший ход: {move_to_uci(result.move) if result.move is not None else '-'}\n"
+          f"Узлов: {result.nodes}\nВремя: {result.time:.3f} с\nУзлов в секунду: {result.nps}\n"
+          f"Таблица перестановок: попаданий {stats['hits']}, промахов {stats['misses']}, "
+          f"вытеснений {stats['collisions']}, заполнено {stats['hashfull'] / 10:.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,593 @@
+"""
+Сервер партий на asyncio: один процесс ведёт множество партий без графического интерфейса (для ботов
+или локального лобби). Партия хранит только позицию, часы и таймер флажка, поэтому простаивающая партия
+занимает несколько килобайт; окна Tk и after() не используются, часы отсчитываются по времени цикла событий,
+а падение флажка планируется call_later.
+
+Протокол: по TCP или Unix-сокету передаются строки JSON. Запрос — объект с полем "op" (и необязательным
+"id", который возвращается в ответе), ответ — объект с полем "ok" и состоянием партии или описанием ошибки.
+Клиенты, подписанные на партию, получают сообщения {"event": "update", ...} после каждого хода и при
+окончании партии.
+
+    new {fen, moves, time, increment, delay, watch}  — создать партию (ходы воспроизводятся, длинный список —
+                                                       в пуле потоков, чтобы не задерживать цикл событий)
+    move {game, move}                                — сделать ход ("e2e4", "e7e8q" или SAN "Nf3", "O-O")
+    state {game}, watch {game}, unwatch {game}, close {game}, stats
+
+Часы партии запускаются первым ходом: время на первый ход белых не списывается.
+
+Запуск: python -m chess server [--host 127.0.0.1] [--port 8765 | --unix PATH] [--backend position]
+        python -m chess server --bench 2000
+"""
+import argparse
+import asyncio
+import collections
+import json
+import re
+import time
+import tracemalloc
+from clock import ChessClock
+from perft import BACKENDS, START_FEN, load_backend
+from position import COLOR_NAMES, GameStatus, UnknownPiece, parse_square
+from san import InvalidSan, MoveIndex
+
+UCI_MOVE = re.compile(r"^([a-h][1-8])([a-h][1-8])([qrbn]?)$")
+PROMOTION_LETTERS = {"n": 2, "b": 3, "r": 4, "q": 5}
+THREAD_MOVES = 32
+LATENCY_WINDOW = 10000
+WRITE_BUFFER_LIMIT = 1 << 20
+
+
+class ProtocolError(Exception):
+    """
+    Исключение. Вызывается, если запрос клиента некорректен или ход недопустим
+    """
+    pass
+
+
+class ServerGame:
+    """
+    Партия на сервере
+
+    :ivar id: Номер партии
+    :type id: int
+    :ivar position: Позиция партии
+    :type position: Position
+    :ivar clock: Шахматные часы партии (идут по времени цикла событий)
+    :type clock: ChessClock
+    :ivar timer: Запланированная проверка флажка (None, если часы стоят)
+    :type timer: asyncio.TimerHandle
+    :ivar watchers: Подписанные клиенты (None, если подписчиков нет)
+    :type watchers: set[asyncio.StreamWriter]
+    :ivar result: Результат партии ("1-0", "0-1", "1/2-1/2"; None, если партия не окончена)
+    :type result: str
+    :ivar reason: Причина окончания партии
+    :type reason: str
+    """
+    __slots__ = ("id", "position", "clock", "timer", "watchers", "result", "reason")
+
+    def __init__(self, game_id, position, clock):
+        self.id = game_id
+        self.position = position
+        self.clock = clock
+        self.timer = None
+        self.watchers = None
+        self.result = None
+        self.reason = None
+
+
+def parse_move(position, text, moves) -> int:
+    """
+    Находит допустимый ход по записи в координатах ("e2e4", "e7e8q") или в SAN
+
+    :param position: Позиция
+    :type position: Position
+    :param text: Запись хода
+    :type text: str
+    :param moves: Допустимые ходы позиции
+    :type moves: list[int]
+    :returns: Код хода
+    :raises ProtocolError: Если запись некорректна или ход недопустим
+    """
+    match = UCI_MOVE.match(text)
+    if match:
+        frm, to = parse_square(match.group(1)), parse_square(match.group(2))
+        move = position.build_move(frm, to, PROMOTION_LETTERS.get(match.group(3), 0))
+        if move not in moves:
+            raise ProtocolError(f"Недопустимый ход: {text}")
+        return move
+    try:
+        return MoveIndex(position, moves).parse(text)
+    except InvalidSan as exc:
+        raise ProtocolError(str(exc))
+
+
+def replay_moves(position_class, legal_moves, fen, moves):
+    """
+    Создаёт позицию и воспроизводит в ней ходы. Функция не обращается к состоянию сервера и может
+    выполняться в другом потоке
+
+    :param position_class: Класс позиции
+    :type position_class: type
+    :param legal_moves: Функция генерации допустимых ходов
+    :type legal_moves: function
+    :param fen: Начальная позиция
+    :type fen: str
+    :param moves: Ходы в координатах или SAN
+    :type moves: list[str]
+    :returns: Позиция после ходов
+    :raises ProtocolError: Если позиция или один из ходов некорректны
+    """
+    if not isinstance(fen, str):
+        raise ProtocolError("Позиция должна быть строкой FEN")
+    try:
+        position = position_class.from_fen(fen)
+    except (UnknownPiece, ValueError, IndexError) as exc:
+        raise ProtocolError(f"Некорректная позиция: {exc}")
+    if position.is_attacked(position.kings[position.side ^ 1], position.side):
+        raise ProtocolError("Некорректная позиция: король стороны, которая не ходит, под шахом")
+    for text in moves:
+        position.make(parse_move(position, text, legal_moves(position)))
+    return position
+
+
+class GameServer:
+    """
+    Сервер, ведущий множество партий в одном цикле событий
+
+    :ivar games: Партии по номерам
+    :type games: dict{int: ServerGame}
+    :ivar latencies: Время ответа на последние ходы в секундах (от получения запроса до записи ответа)
+    :type latencies: collections.deque
+    :ivar moves: Число сделанных на сервере ходов
+    :type moves: int
+    """
+
+    def __init__(self, backend="position", loop=None):
+        """
+        :param backend: Генератор ходов: "position", "mailbox" или "bitboard"
+        :type backend: str
+        :param loop: Цикл событий (по умолчанию — запущенный)
+        :type loop: asyncio.AbstractEventLoop
+        :raises ValueError: Если генератор неизвестен
+        :raises RuntimeError: Если цикл не задан и не запущен
+        """
+        self.position_class, self.legal_moves = load_backend(backend)
+        self.loop = loop or asyncio.get_running_loop()
+        self.games = {}
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.moves = 0
+        self._next_id = 1
+
+    def create(self, position, limit=600, increment=0, delay=0) -> ServerGame:
+        """
+        Регистрирует новую партию
+
+        :param position: Начальная позиция
+        :type position: Position
+        :param limit: Время на игрока в секундах
+        :type limit: float
+        :param increment: Добавление Фишера в секундах
+        :type increment: float
+        :param delay: Задержка Бронштейна в секундах
+        :type delay: float
+        :returns: Партия
+        """
+        clock = ChessClock({"white": limit, "black": limit}, increment, delay, now=self.loop.time)
+        game = ServerGame(self._next_id, position, clock)
+        self._next_id += 1
+        self.games[game.id] = game
+        self.check_result(game)
+        return game
+
+    async def new_game(self, fen=START_FEN, moves=(), **clock) -> ServerGame:
+        """
+        Создаёт партию из начальной позиции и ходов. Список длиннее THREAD_MOVES ходов воспроизводится
+        в пуле потоков, чтобы цикл событий продолжал отвечать другим партиям
+
+        :param fen: Начальная позиция
+        :type fen: str
+        :param moves: Сделанные ходы
+        :type moves: list[str]
+        :param clock: Параметры часов (limit, increment, delay)
+        :returns: Партия
+        :raises ProtocolError: Если позиция или ходы некорректны
+        """
+        if len(moves) > THREAD_MOVES:
+            position = await self.loop.run_in_executor(None, replay_moves, self.position_class, self.legal_moves,
+                                                       fen, moves)
+        else:
+            position = replay_moves(self.position_class, self.legal_moves, fen, moves)
+        return self.create(position, **clock)
+
+    def game(self, game_id) -> ServerGame:
+        """
+        Находит партию по номеру
+
+        :param game_id: Номер партии
+        :type game_id: int
+        :returns: Партия
+        :raises ProtocolError: Если номер партии некорректен или партии нет
+        """
+        if isinstance(game_id, bool) or not isinstance(game_id, int):
+            raise ProtocolError(f"Некорректный номер партии: {json.dumps(game_id)}")
+        game = self.games.get(game_id)
+        if game is None:
+            raise ProtocolError(f"Нет партии {game_id}")
+        return game
+
+    def state(self, game, san=None) -> dict:
+        """
+        Описывает состояние партии для ответа клиенту
+
+        :param game: Партия
+        :type game: ServerGame
+        :param san: Последний сделанный ход в SAN
+        :type san: str
+        :returns: Состояние партии
+        """
+        clock = game.clock
+        state = {"game": game.id, "fen": game.position.to_fen(), "side": COLOR_NAMES[game.position.side],
+                 "clock": {player: round(max(clock.left(player), 0.0), 3) for player in ("white", "black")},
+                 "result": game.result, "reason": game.reason}
+        if san is not None:
+            state["san"] = san
+        return state
+
+    def check_result(self, game) -> GameStatus:
+        """
+        Определяет окончание партии по правилам: мат, пат, троекратное повторение, правило 50 ходов
+        и недостаточный материал
+
+        :param game: Партия
+        :type game: ServerGame
+        :returns: Состояние партии для игрока, чей ход
+        """
+        position = game.position
+        status = position.status()
+        if status is GameStatus.CHECKMATE:
+            self.finish(game, "0-1" if position.side == 0 else "1-0", "checkmate")
+        elif status is GameStatus.STALEMATE:
+            self.finish(game, "1/2-1/2", "stalemate")
+        elif position.is_repetition():
+            self.finish(game, "1/2-1/2", "repetition")
+        elif position.is_fifty_moves():
+            self.finish(game, "1/2-1/2", "fifty_moves")
+        elif position.is_insufficient_material():
+            self.finish(game, "1/2-1/2", "insufficient_material")
+        return status
+
+    def finish(self, game, result, reason):
+        """
+        Фиксирует результат партии и останавливает её часы
+
+        :param game: Партия
+        :type game: ServerGame
+        :param result: Результат
+        :type result: str
+        :param reason: Причина окончания
+        :type reason: str
+        """
+        game.result, game.reason = result, reason
+        if game.timer is not None:
+            game.timer.cancel()
+            game.timer = None
+        game.clock.running = None
+
+    def play(self, game, text) -> dict:
+        """
+        Делает ход в партии: проверяет его, переключает часы, проверяет окончание партии и рассылает
+        новое состояние подписчикам (после ответа на сам ход)
+
+        :param game: Партия
+        :type game: ServerGame
+        :param text: Ход в координатах или SAN
+        :type text: str
+        :returns: Состояние партии после хода
+        :raises ProtocolError: Если партия окончена или ход недопустим
+        """
+        if game.result is not None:
+            raise ProtocolError(f"Партия {game.id} окончена")
+        position, clock = game.position, game.clock
+        moves = self.legal_moves(position)
+        move = parse_move(position, text, moves)
+        if clock.running is not None and clock.left(clock.running) <= 0:
+            self.flag(game)
+            raise ProtocolError(f"Время вышло в партии {game.id}")
+        san = MoveIndex(position, moves).san(move)
+        clock.stop()
+        position.make(move)
+        self.moves += 1
+        status = self.check_result(game)
+        if status is GameStatus.CHECKMATE:
+            san += "#"
+        elif status is GameStatus.CHECK:
+            san += "+"
+        if game.result is None:
+            clock.start(COLOR_NAMES[position.side])
+            self.arm_timer(game)
+        state = self.state(game, san)
+        if game.watchers:
+            self.loop.call_soon(self.broadcast, game, state)
+        return state
+
+    def arm_timer(self, game):
+        """
+        Планирует проверку флажка на момент, когда у игрока, чей ход, выйдет время
+
+        :param game: Партия
+        :type game: ServerGame
+        """
+        if game.timer is not None:
+            game.timer.cancel()
+        game.timer = self.loop.call_later(max(game.clock.left(game.clock.running), 0.0), self.flag, game)
+
+    def flag(self, game):
+        """
+        Засчитывает поражение по времени. Если из-за неточности таймера время ещё не вышло,
+        проверка переносится
+
+        :param game: Партия
+        :type game: ServerGame
+        """
+        game.timer = None
+        player = game.clock.running
+        if game.result is not None or player is None:
+            return
+        if game.clock.left(player) > 0:
+            self.arm_timer(game)
+            return
+        game.clock.stop()
+        self.finish(game, "0-1" if player == "white" else "1-0", "time")
+        self.broadcast(game, self.state(game))
+
+    def broadcast(self, game, state):
+        """
+        Рассылает состояние партии подписчикам. Подписчик, не успевающий читать сообщения, отключается
+        от партии
+
+        :param game: Партия
+        :type game: ServerGame
+        :param state: Состояние партии
+        :type state: dict
+        """
+        if not game.watchers:
+            return
+        line = json.dumps({"event": "update", **state}).encode() + b"\n"
+        for writer in list(game.watchers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                game.watchers.discard(writer)
+            else:
+                writer.write(line)
+
+    def close_game(self, game):
+        """
+        Удаляет партию с сервера
+
+        :param game: Партия
+        :type game: ServerGame
+        """
+        if game.timer is not None:
+            game.timer.cancel()
+        del self.games[game.id]
+
+    def stats(self) -> dict:
+        """
+        Собирает статистику сервера: число партий и ходов, время ответа на ход (медиана и 99-й процентиль)
+
+        :returns: Статистика
+        """
+        latencies = sorted(self.latencies)
+        stats = {"games": len(self.games), "moves": self.moves}
+        if latencies:
+            stats["latency_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 3)
+            stats["latency_p99_ms"] = round(latencies[min(len(latencies) * 99 // 100, len(latencies) - 1)] * 1000, 3)
+        return stats
+
+    async def dispatch(self, request, writer) -> dict:
+        """
+        Выполняет запрос клиента
+
+        :param request: Запрос
+        :type request: dict
+        :param writer: Поток записи клиента (для подписки на партии)
+        :type writer: asyncio.StreamWriter
+        :returns: Ответ без полей "ok" и "id"
+        :raises ProtocolError: Если запрос некорректен
+        """
+        op = request.get("op")
+        if op == "new":
+            try:
+                clock = {"limit": float(request.get("time", 600)), "increment": float(request.get("increment", 0)),
+                         "delay": float(request.get("delay", 0))}
+            except (TypeError, ValueError):
+                raise ProtocolError("Некорректные параметры часов")
+            moves = request.get("moves", [])
+            if not isinstance(moves, list) or not all(isinstance(text, str) for text in moves):
+                raise ProtocolError("Ходы должны быть списком строк")
+            game = await self.new_game(request.get("fen", START_FEN), moves, **clock)
+            if request.get("watch"):
+                game.watchers = {writer}
+            return self.state(game)
+        if op == "stats":
+            return self.stats()
+        if op not in ("move", "state", "watch", "unwatch", "close"):
+            raise ProtocolError(f"Неизвестная операция: {op}")
+        game = self.game(request.get("game"))
+        if op == "move":
+            return self.play(game, str(request.get("move", "")))
+        if op == "watch":
+            if game.watchers is None:
+                game.watchers = set()
+            game.watchers.add(writer)
+        elif op == "unwatch" and game.watchers:
+            game.watchers.discard(writer)
+        elif op == "close":
+            self.close_game(game)
+        return self.state(game)
+
+    async def respond(self, request, writer) -> dict:
+        """
+        Выполняет запрос и составляет ответ. Непредвиденное исключение при выполнении запроса возвращается
+        клиенту как ошибка запроса, соединение при этом не закрывается
+
+        :param request: Запрос
+        :type request: dict
+        :param writer: Поток записи клиента
+        :type writer: asyncio.StreamWriter
+        :returns: Ответ без поля "id"
+        """
+        try:
+            return {"ok": True, **await self.dispatch(request, writer)}
+        except ProtocolError as exc:
+            return {"ok": False, "error": str(exc)}
+        except Exception as exc:
+            return {"ok": False, "error": f"Ошибка выполнения запроса: {type(exc).__name__}: {exc}"}
+
+    async def handle(self, reader, writer):
+        """
+        Обслуживает соединение клиента: читает запросы построчно и отвечает на каждый
+
+        :param reader: Поток чтения клиента
+        :type reader: asyncio.StreamReader
+        :param writer: Поток записи клиента
+        :type writer: asyncio.StreamWriter
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                request = {}
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    response = {"ok": False, "error": "Некорректный JSON"}
+                else:
+                    if isinstance(data, dict):
+                        request = data
+                        response = await self.respond(request, writer)
+                    else:
+                        response = {"ok": False, "error": "Запрос должен быть объектом JSON"}
+                if "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response).encode() + b"\n")
+                if request.get("op") == "move":
+                    self.latencies.append(time.perf_counter() - start)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game in self.games.values():
+                if game.watchers:
+                    game.watchers.discard(writer)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None) -> asyncio.AbstractServer:
+        """
+        Запускает приём соединений по TCP или через Unix-сокет
+
+        :param host: Адрес TCP
+        :type host: str
+        :param port: Порт TCP (0 — свободный порт)
+        :type port: int
+        :param path: Путь Unix-сокета (если задан, TCP не используется)
+        :type path: str
+        :returns: Запущенный сервер asyncio
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def _bench_client(host, port, game_ids, moves, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for text in moves:
+        for game_id in game_ids:
+            start = time.perf_counter()
+            writer.write(json.dumps({"op": "move", "game": game_id, "move": text}).encode() + b"\n")
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            if not response["ok"]:
+                raise ProtocolError(response["error"])
+    writer.close()
+
+
+async def bench(games=2000, clients=50, backend="position") -> dict:
+    """
+    Измеряет память простаивающей партии и время ответа на ход: создаёт партии, после чего клиенты
+    одновременно играют в них дебют по TCP
+
+    :param games: Число партий
+    :type games: int
+    :param clients: Число одновременных соединений
+    :type clients: int
+    :param backend: Генератор ходов
+    :type backend: str
+    :returns: Результаты (память на партию в байтах, медиана и 99-й процентиль времени ответа в миллисекундах)
+    """
+    server = GameServer(backend)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(games):
+        server.create(server.position_class.from_fen(START_FEN))
+    memory = (tracemalloc.get_traced_memory()[0] - before) / games
+    tracemalloc.stop()
+    listener = await server.serve(port=0)
+    host, port = listener.sockets[0].getsockname()[:2]
+    latencies = []
+    ids = list(server.games)
+    moves = ("e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7")
+    start = time.perf_counter()
+    await asyncio.gather(*(_bench_client(host, port, ids[i::clients], moves, latencies) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    listener.close()
+    await listener.wait_closed()
+    latencies.sort()
+    return {"games": games, "memory_per_game": round(memory), "moves": len(latencies),
+            "moves_per_second": round(len(latencies) / elapsed),
+            "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+            "latency_p99_ms": round(latencies[len(latencies) * 99 // 100] * 1000, 3)}
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: запускает сервер партий или замер его производительности
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess server", description="Сервер партий без интерфейса")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес TCP")
+    parser.add_argument("--port", type=int, default=8765, help="порт TCP")
+    parser.add_argument("--unix", default=None, help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--backend", choices=BACKENDS, default="position", help="генератор ходов")
+    parser.add_argument("--bench", type=int, default=None, metavar="GAMES",
+                        help="измерить память партии и время ответа на ход для заданного числа партий")
+    parser.add_argument("--clients", type=int, default=50, help="число соединений при замере")
+    args = parser.parse_args(argv)
+    if args.bench is not None:
+        result = asyncio.run(bench(args.bench, args.clients, args.backend))
+        print(f"Партий: {result['games']}, память простаивающей партии: {result['memory_per_game']} байт\n"
+              f"Ходов: {result['moves']} ({result['moves_per_second']} в секунду), время ответа: "
+              f"медиана {result['latency_p50_ms']} мс, 99-й процентиль {result['latency_p99_ms']} мс")
+        return 0
+
+    async def run():
+        server = GameServer(args.backend)
+        listener = await server.serve(args.host, args.port, args.unix)
+        print(f"Сервер партий запущен: {args.unix or f'{args.host}:{args.port}'}")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
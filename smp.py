@@ -0,0 +1,124 @@
+"""
+Параллельный перебор в стиле Lazy SMP. Несколько процессов перебирают одну и ту же корневую позицию
+и обмениваются результатами только через общую таблицу перестановок в multiprocessing.shared_memory.
+Вспомогательные процессы начинают итеративное углубление с разной глубины и по-разному упорядочивают
+тихие ходы в корне, поэтому заполняют таблицу записями, которые ускоряют основной перебор.
+
+Записи таблицы пишутся без блокировок: ключ хранится сложенным по XOR с данными, и запись, которую
+одновременно изменили два процесса, при чтении просто не совпадает с ключом позиции.
+Процессы запускаются методом spawn, поэтому перебор можно начинать из потока графического интерфейса
+"""
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+from search import Search, SearchResult, HASH_MB, best_move, plain_position
+from tt import TranspositionTable, table_bytes
+
+
+def _worker(index, position, depth, time_limit, name, size, stop, results, tablebase):
+    memory = shared_memory.SharedMemory(name=name)
+    view = memory.buf[:size]
+    words = view.cast("Q")
+    if tablebase is not None:
+        from tablebase import Tablebase
+        tablebase = Tablebase(tablebase)
+    try:
+        search = Search(position, stop, TranspositionTable(table=words), seed=index, tablebase=tablebase)
+        result = search.run(depth, time_limit, start_depth=1 + index % 2)
+        results.put((index, result))
+    finally:
+        words.release()
+        view.release()
+        memory.close()
+        if tablebase is not None:
+            tablebase.close()
+
+
+def parallel_search(position, depth=None, time_limit=None, workers=2, hash_mb=HASH_MB, stop=None,
+                    tablebase=None) -> SearchResult:
+    """
+    Ищет лучший ход несколькими процессами с общей таблицей перестановок. Перебор заканчивается, когда
+    основной процесс (номер 0) достиг глубины или истекло время; берётся результат самой глубокой
+    завершённой итерации, при равной глубине — основного процесса
+
+    :param position: Позиция (не изменяется)
+    :type position: Position
+    :param depth: Максимальная глубина
+    :type depth: int
+    :param time_limit: Ограничение времени в секундах
+    :type time_limit: float
+    :param workers: Число процессов (1 — перебор в текущем процессе)
+    :type workers: int
+    :param hash_mb: Размер общей таблицы перестановок в мегабайтах
+    :type hash_mb: float
+    :param stop: Событие остановки перебора из другого потока
+    :type stop: threading.Event
+    :param tablebase: Эндшпильные таблицы (каждый процесс открывает тот же каталог)
+    :type tablebase: tablebase.Tablebase
+    :returns: Результат перебора: время — время основного процесса, узлы — сумма по всем процессам
+    """
+    if depth is None and time_limit is None:
+        depth = 4
+    if workers <= 1:
+        return best_move(position, depth, time_limit, stop, table=TranspositionTable(hash_mb), tablebase=tablebase)
+    position = plain_position(position)
+    context = multiprocessing.get_context("spawn")
+    size = table_bytes(hash_mb)
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    done = context.Event()
+    results = context.Queue()
+    directory = tablebase.directory if tablebase is not None else None
+    processes = [context.Process(target=_worker, args=(i, position, depth, time_limit, memory.name, size, done, results,
+                                                       directory), daemon=True) for i in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        found = {}
+        while 0 not in found:
+            try:
+                index, result = results.get(timeout=0.05)
+            except queue.Empty:
+                if stop is not None and stop.is_set():
+                    done.set()
+                if not processes[0].is_alive() and results.empty():
+                    raise RuntimeError("Основной процесс перебора завершился без результата")
+                continue
+            found[index] = result
+        done.set()
+        while len(found) < workers and any(process.is_alive() for process in processes[1:]) or not results.empty():
+            try:
+                index, result = results.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            found[index] = result
+    finally:
+        done.set()
+        for process in processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        memory.close()
+        memory.unlink()
+    main = found[0]
+    best = max(found.values(), key=lambda result: (result.depth, result is main))
+    return SearchResult(best.move, best.score, best.depth, sum(result.nodes for result in found.values()),
+                        main.time, best.pv)
+
+
+def time_to_depth(position, depth, workers, hash_mb=HASH_MB) -> tuple:
+    """
+    Сравнивает время достижения глубины одним процессом и несколькими
+
+    :param position: Позиция
+    :type position: Position
+    :param depth: Глубина
+    :type depth: int
+    :param workers: Число процессов параллельного перебора
+    :type workers: int
+    :param hash_mb: Размер таблицы перестановок в мегабайтах
+    :type hash_mb: float
+    :returns: (результат одного процесса, результат параллельного перебора, ускорение)
+    """
+    single = best_move(position, depth, table=TranspositionTable(hash_mb))
+    parallel = parallel_search(position, depth, workers=workers, hash_mb=hash_mb)
+    return single, parallel, single.time / max(parallel.time, 1e-9)
@@ -0,0 +1,116 @@
+"""
+Кэш изображений фигур. Двенадцать PNG из директории декодируются и масштабируются один раз для каждой пары
+(директория, размер клетки) и сохраняются на диск одним атласом. Ключ атласа включает время изменения
+исходных файлов, поэтому после замены изображений атлас строится заново. Декодированные изображения
+хранятся в памяти процесса, а объекты PhotoImage — для каждого интерпретатора Tk.
+
+Pillow импортируется только при загрузке изображений
+"""
+import hashlib
+import os
+
+COLORS = ("white", "black")
+PIECE_NAMES = ("pawn", "knight", "bishop", "rook", "queen", "king")
+SPRITE_NAMES = tuple(f"{color}_{piece}" for color in COLORS for piece in PIECE_NAMES)
+
+_sprites = {}
+_photos = {}
+
+
+def cache_dir() -> str:
+    """
+    Возвращает директорию для атласов изображений ($XDG_CACHE_HOME/chess или ~/.cache/chess)
+
+    :returns: Путь к директории кэша
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "chess")
+
+
+def sprite_key(path, size) -> str:
+    """
+    Вычисляет ключ набора изображений по директории, размеру клетки и времени изменения исходных файлов
+
+    :param path: Директория с изображениями фигур
+    :type path: str
+    :param size: Размер клетки в пикселях
+    :type size: int
+    :returns: Ключ набора изображений
+    :raises FileNotFoundError: Если одного из изображений нет в директории
+    """
+    digest = hashlib.sha1(f"{os.path.abspath(path)}|{size}".encode())
+    for name in SPRITE_NAMES:
+        stat = os.stat(os.path.join(path, f"{name}.png"))
+        digest.update(f"|{name}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def _build_atlas(path, size):
+    from PIL import Image
+    atlas = Image.new("RGBA", (size * len(SPRITE_NAMES), size))
+    for i, name in enumerate(SPRITE_NAMES):
+        with Image.open(os.path.join(path, f"{name}.png")) as img:
+            atlas.paste(img.convert("RGBA").resize((size, size), Image.LANCZOS), (i * size, 0))
+    return atlas
+
+
+def load_sprites(path, size=80, directory=None) -> dict:
+    """
+    Возвращает масштабированные изображения фигур: из памяти процесса, из атласа на диске
+    или, если атласа ещё нет, декодирует исходные PNG и сохраняет атлас
+
+    :param path: Директория с изображениями фигур
+    :type path: str
+    :param size: Размер клетки в пикселях
+    :type size: int
+    :param directory: Директория атласов (по умолчанию cache_dir())
+    :type directory: str
+    :returns: Изображения PIL по именам "white_pawn", "black_king", ...
+    :raises FileNotFoundError: Если одного из изображений нет в директории
+    """
+    key = sprite_key(path, size)
+    sprites = _sprites.get(key)
+    if sprites is not None:
+        return sprites
+    from PIL import Image
+    directory = directory or cache_dir()
+    atlas_path = os.path.join(directory, f"atlas_{key}.png")
+    try:
+        with Image.open(atlas_path) as img:
+            atlas = img.convert("RGBA")
+    except (OSError, ValueError):
+        atlas = _build_atlas(path, size)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{atlas_path}.{os.getpid()}.tmp"
+            atlas.save(tmp_path, "PNG")
+            os.replace(tmp_path, atlas_path)
+        except OSError:
+            pass
+    sprites = {name: atlas.crop((i * size, 0, (i + 1) * size, size)) for i, name in enumerate(SPRITE_NAMES)}
+    _sprites[key] = sprites
+    return sprites
+
+
+def photo_images(path, size, master) -> dict:
+    """
+    Возвращает изображения фигур для Tk. Объекты PhotoImage создаются один раз для интерпретатора окна
+    и используются повторно при перерисовке, в окне превращения пешки и при повторной загрузке
+
+    :param path: Директория с изображениями фигур
+    :type path: str
+    :param size: Размер клетки в пикселях
+    :type size: int
+    :param master: Окно, в интерпретаторе которого будут показаны изображения
+    :type master: tk.Tk
+    :returns: Изображения ImageTk.PhotoImage по именам "white_pawn", "black_king", ...
+    :raises FileNotFoundError: Если одного из изображений нет в директории
+    """
+    key = sprite_key(path, size)
+    cached = _photos.get(key)
+    if cached is not None and cached[0] is master.tk:
+        return cached[1]
+    from PIL import ImageTk
+    photos = {name: ImageTk.PhotoImage(img, master=master) for name, img in load_sprites(path, size).items()}
+    _photos[key] = (master.tk, photos)
+    return photos
@@ -0,0 +1,602 @@
+"""
+Эндшпильные таблицы для окончаний из трёх и четырёх фигур (считая королей), построенные ретроградным анализом.
+
+Таблица окончания (например, KQvK) — массив байтов, по одному на каждую позицию. Номер позиции складывается
+из очереди хода, клетки белого короля и клеток остальных фигур; симметрии доски (без пешек — восемь,
+с пешками — отражение по вертикали) сводят белого короля к 10 или 32 клеткам. Байт хранит результат
+с точки зрения ходящего: 0 — ничья, n > 0 — до мата n - 1 полуходов (нечётное число — ходящий ставит мат,
+чётное — получает мат), INVALID — невозможная позиция. Таблицы сохраняются в файлы <окончание>.tb
+и при чтении отображаются в память через mmap, поэтому обращение к таблице — вычисление номера и чтение байта.
+
+Таблицы не учитывают права на рокировку, взятие на проходе и правило 50 ходов: такие позиции не ищутся.
+
+Запуск: python -m chess tablebase DIR generate KQvK KRvK ... | python -m chess tablebase DIR probe --fen FEN
+"""
+import argparse
+import itertools
+import mmap
+import os
+import time
+from position import (Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, PIECE_LETTERS, PROMOTIONS,
+                      KING_TARGETS, KNIGHT_TARGETS, RAYS, PAWN_ATTACKS, ROOK_DIRS, BISHOP_DIRS)
+
+MAX_PIECES = 4
+INVALID = 255
+LETTER_TO_TYPE = {PIECE_LETTERS[ptype].upper(): ptype for ptype in range(PAWN, KING + 1)}
+
+KING_MASKS = tuple(sum(1 << t for t in KING_TARGETS[sq]) for sq in range(64))
+KNIGHT_MASKS = tuple(sum(1 << t for t in KNIGHT_TARGETS[sq]) for sq in range(64))
+PAWN_MASKS = tuple(tuple(sum(1 << t for t in attacks[sq]) for sq in range(64)) for attacks in PAWN_ATTACKS)
+# Тип линии между клетками (ROOK — вертикаль или горизонталь, BISHOP — диагональ) и клетки между ними
+LINES = bytearray(4096)
+BETWEEN = [0] * 4096
+for _frm in range(64):
+    for _d in range(8):
+        _mask = 0
+        for _to in RAYS[_frm][_d]:
+            LINES[_frm << 6 | _to] = ROOK if _d in ROOK_DIRS else BISHOP
+            BETWEEN[_frm << 6 | _to] = _mask
+            _mask |= 1 << _to
+SLIDER_DIRS = {BISHOP: BISHOP_DIRS, ROOK: ROOK_DIRS, QUEEN: ROOK_DIRS + BISHOP_DIRS}
+
+
+def _transform(flip_file, flip_rank, transpose) -> tuple:
+    squares = []
+    for sq in range(64):
+        row, col = sq >> 3, sq & 7
+        if flip_file:
+            col = 7 - col
+        if flip_rank:
+            row = 7 - row
+        if transpose:
+            row, col = col, row
+        squares.append(row * 8 + col)
+    return tuple(squares)
+
+
+# Клетки белого короля: треугольник a1-d1-d4 без пешек и вертикали a-d с пешками
+TRIANGLE = tuple(sq for sq in range(64) if sq & 7 <= 3 and sq >> 3 >= 4 and sq & 7 >= 7 - (sq >> 3))
+HALF = tuple(sq for sq in range(64) if sq & 7 <= 3)
+TRANSFORMS = tuple(_transform(*flags) for flags in itertools.product((False, True), repeat=3))
+
+
+def _king_transforms(region, transforms) -> tuple:
+    return tuple(tuple(t for t in transforms if t[sq] in region) for sq in range(64))
+
+
+KING_TRANSFORMS = (_king_transforms(TRIANGLE, TRANSFORMS), _king_transforms(HALF, TRANSFORMS[:1] + TRANSFORMS[4:5]))
+
+
+def normalize(white, black) -> tuple:
+    """
+    Упорядочивает фигуры окончания: в каждой стороне король первым, далее по убыванию силы; сильнейшая
+    сторона считается белыми
+
+    :param white: Типы фигур белых
+    :type white: Iterable[int]
+    :param black: Типы фигур чёрных
+    :type black: Iterable[int]
+    :returns: (название окончания, поменялись ли стороны)
+    """
+    white, black = tuple(sorted(white, reverse=True)), tuple(sorted(black, reverse=True))
+    flipped = black > white
+    if flipped:
+        white, black = black, white
+    return "".join(PIECE_LETTERS[t].upper() for t in white) + "v" + "".join(PIECE_LETTERS[t].upper() for t in black), \
+        flipped
+
+
+class Layout:
+    """
+    Расположение позиций окончания в таблице
+
+    :ivar name: Название окончания ("KQvK")
+    :type name: str
+    :ivar codes: Коды фигур в порядке клеток номера позиции
+    :type codes: tuple[int]
+    :ivar pawns: Есть ли в окончании пешки
+    :type pawns: bool
+    :ivar kings: Клетки белого короля
+    :type kings: tuple[int]
+    :ivar half: Число позиций с одной очередью хода
+    :type half: int
+    :ivar size: Размер таблицы в байтах
+    :type size: int
+    """
+    __slots__ = ("name", "codes", "pawns", "kings", "half", "size", "_king_index", "_transforms", "_pairs")
+
+    def __init__(self, name):
+        """
+        :param name: Название окончания ("KQvK", "KRvKB", "KPvK")
+        :type name: str
+        :raises ValueError: Если название некорректно или фигур больше MAX_PIECES
+        """
+        sides = name.split("v")
+        if (len(sides) != 2 or any(not side or side[0] != "K" or side.count("K") != 1 for side in sides)
+                or any(letter not in LETTER_TO_TYPE for side in sides for letter in side)
+                or len(sides[0]) + len(sides[1]) > MAX_PIECES):
+            raise ValueError(f"Некорректное окончание: {name}")
+        name, _ = normalize(*([LETTER_TO_TYPE[letter] for letter in side] for side in sides))
+        white, black = name.split("v")
+        self.name = name
+        self.codes = tuple(LETTER_TO_TYPE[letter] for letter in white) + \
+            tuple(LETTER_TO_TYPE[letter] | BLACK << 3 for letter in black)
+        self.pawns = "P" in name
+        self.kings = HALF if self.pawns else TRIANGLE
+        self.half = len(self.kings) * 64 ** (len(self.codes) - 1)
+        self.size = 2 * self.half
+        self._king_index = {sq: i for i, sq in enumerate(self.kings)}
+        self._transforms = KING_TRANSFORMS[self.pawns]
+        self._pairs = tuple(i for i in range(1, len(self.codes) - 1) if self.codes[i] == self.codes[i + 1])
+
+    def index(self, squares, side) -> int:
+        """
+        Вычисляет номер позиции. Из симметричных расстановок выбирается расстановка с наименьшим номером,
+        поэтому все они получают один номер
+
+        :param squares: Клетки фигур в порядке codes
+        :type squares: Sequence[int]
+        :param side: Очередь хода
+        :type side: int
+        :returns: Номер позиции в таблице
+        """
+        transforms = self._transforms[squares[0]]
+        if len(transforms) == 1 and not self._pairs:
+            transform = transforms[0]
+            index = self._king_index[transform[squares[0]]]
+            for sq in squares[1:]:
+                index = index << 6 | transform[sq]
+            return side * self.half + index
+        best = -1
+        for transform in transforms:
+            mapped = [transform[sq] for sq in squares]
+            for i in self._pairs:
+                if mapped[i] > mapped[i + 1]:
+                    mapped[i], mapped[i + 1] = mapped[i + 1], mapped[i]
+            index = self._king_index[mapped[0]]
+            for sq in mapped[1:]:
+                index = index << 6 | sq
+            if best < 0 or index < best:
+                best = index
+        return side * self.half + best
+
+    def squares(self, index) -> tuple:
+        """
+        Восстанавливает расстановку по номеру позиции
+
+        :param index: Номер позиции
+        :type index: int
+        :returns: (клетки фигур в порядке codes, очередь хода)
+        """
+        side, index = divmod(index, self.half)
+        squares = []
+        for _ in range(len(self.codes) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.kings[index])
+        squares.reverse()
+        return squares, side
+
+
+_layouts = {}
+
+
+def layout(name) -> Layout:
+    """
+    Возвращает расположение окончания (создаётся один раз)
+
+    :param name: Название окончания
+    :type name: str
+    :returns: Расположение позиций окончания
+    :raises ValueError: Если название некорректно
+    """
+    found = _layouts.get(name)
+    if found is None:
+        found = _layouts[name] = Layout(name)
+    return found
+
+
+def decode(value) -> tuple:
+    """
+    Переводит байт таблицы в результат
+
+    :param value: Байт таблицы
+    :type value: int
+    :returns: (1 — ходящий ставит мат, -1 — получает мат, 0 — ничья; число полуходов до мата)
+    """
+    if not value:
+        return 0, 0
+    plies = value - 1
+    return (1 if plies & 1 else -1), plies
+
+
+def _attacked(target, codes, squares, by, occupied) -> bool:
+    for code, sq in zip(codes, squares):
+        if code >> 3 != by:
+            continue
+        ptype = code & 7
+        if ptype == KNIGHT:
+            hit = KNIGHT_MASKS[sq] >> target & 1
+        elif ptype == KING:
+            hit = KING_MASKS[sq] >> target & 1
+        elif ptype == PAWN:
+            hit = PAWN_MASKS[by][sq] >> target & 1
+        else:
+            line = LINES[sq << 6 | target]
+            hit = line and (ptype == QUEEN or ptype == line) and not BETWEEN[sq << 6 | target] & occupied
+        if hit:
+            return True
+    return False
+
+
+def _is_legal(codes, squares, side) -> bool:
+    """
+    Проверяет, что расстановка возможна: фигуры на разных клетках, пешки не на крайних горизонталях,
+    король не ходящей стороны не под ударом
+    """
+    occupied = 0
+    for code, sq in zip(codes, squares):
+        if occupied >> sq & 1 or code & 7 == PAWN and sq >> 3 in (0, 7):
+            return False
+        occupied |= 1 << sq
+    king = next(sq for code, sq in zip(codes, squares) if code == KING | (side ^ 1) << 3)
+    return not _attacked(king, codes, squares, side, occupied)
+
+
+def _children(codes, squares, side):
+    """
+    Перечисляет допустимые ходы: для каждого — коды и клетки фигур после хода
+    """
+    occupied = 0
+    owner = {}
+    for i, sq in enumerate(squares):
+        occupied |= 1 << sq
+        owner[sq] = i
+    king = codes.index(KING | side << 3)
+    for i, (code, frm) in enumerate(zip(codes, squares)):
+        if code >> 3 != side:
+            continue
+        ptype = code & 7
+        targets = []
+        if ptype == PAWN:
+            step = -8 if side == WHITE else 8
+            to = frm + step
+            if not occupied >> to & 1:
+                targets.append(to)
+                if frm >> 3 == (6 if side == WHITE else 1) and not occupied >> to + step & 1:
+                    targets.append(to + step)
+            targets.extend(to for to in PAWN_ATTACKS[side][frm] if occupied >> to & 1)
+        elif ptype == KNIGHT or ptype == KING:
+            targets = KING_TARGETS[frm] if ptype == KING else KNIGHT_TARGETS[frm]
+        else:
+            for d in SLIDER_DIRS[ptype]:
+                for to in RAYS[frm][d]:
+                    targets.append(to)
+                    if occupied >> to & 1:
+                        break
+        for to in targets:
+            captured = owner.get(to, -1)
+            if captured >= 0 and codes[captured] >> 3 == side:
+                continue
+            new_squares = list(squares)
+            new_squares[i] = to
+            new_codes = codes
+            if captured >= 0:
+                new_codes = codes[:captured] + codes[captured + 1:]
+                del new_squares[captured]
+            moved = i - (0 <= captured < i)
+            new_occupied = occupied & ~(1 << frm) | 1 << to
+            if _attacked(new_squares[king - (0 <= captured < king)], new_codes, new_squares, side ^ 1, new_occupied):
+                continue
+            if ptype == PAWN and to >> 3 in (0, 7):
+                for promo in PROMOTIONS:
+                    promoted = list(new_codes)
+                    promoted[moved] = promo | side << 3
+                    yield tuple(promoted), new_squares
+            else:
+                yield new_codes, new_squares
+
+
+def _unmoves(codes, squares, side):
+    """
+    Перечисляет расстановки, из которых ход стороны side без взятия и превращения ведёт в данную
+    """
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    for i, (code, to) in enumerate(zip(codes, squares)):
+        if code >> 3 != side:
+            continue
+        ptype = code & 7
+        origins = []
+        if ptype == PAWN:
+            step = 8 if side == WHITE else -8
+            frm = to + step
+            if frm >> 3 not in (0, 7) and not occupied >> frm & 1:
+                origins.append(frm)
+                if to >> 3 == (4 if side == WHITE else 3) and not occupied >> frm + step & 1:
+                    origins.append(frm + step)
+        elif ptype == KNIGHT or ptype == KING:
+            origins = [frm for frm in (KING_TARGETS[to] if ptype == KING else KNIGHT_TARGETS[to])
+                       if not occupied >> frm & 1]
+        else:
+            for d in SLIDER_DIRS[ptype]:
+                for frm in RAYS[to][d]:
+                    if occupied >> frm & 1:
+                        break
+                    origins.append(frm)
+        for frm in origins:
+            new_squares = list(squares)
+            new_squares[i] = frm
+            yield new_squares
+
+
+def _value(tables, codes, squares, side) -> int:
+    """
+    Читает результат позиции другого окончания (после взятия или превращения), при необходимости строя его таблицу
+    """
+    white = [code & 7 for code in codes if code >> 3 == WHITE]
+    black = [code & 7 for code in codes if code >> 3 == BLACK]
+    if len(white) + len(black) == 2:
+        return 0
+    name, flipped = normalize(white, black)
+    if flipped:
+        codes = [code ^ 8 for code in codes]
+        squares = [sq ^ 56 for sq in squares]
+        side ^= 1
+    target = layout(name)
+    order = sorted(range(len(codes)), key=lambda i: (codes[i] >> 3, -(codes[i] & 7)))
+    table = tables.get(name)
+    if table is None:
+        table = tables[name] = generate(name, tables)
+    return table[target.index([squares[i] for i in order], side)]
+
+
+def generate(name, tables=None) -> bytearray:
+    """
+    Строит таблицу окончания ретроградным анализом. Сначала для каждой позиции перечисляются ходы: маты,
+    паты и ходы в другие окончания (взятия и превращения) дают известные результаты. Затем позиции
+    разрешаются по возрастанию числа полуходов до мата: при разрешении позиции её предшественники
+    (ходы назад без взятий) либо получают выигрыш на полуход длиннее, либо, когда все их ходы ведут
+    к выигрышу соперника, проигрыш. Оставшиеся позиции — ничьи
+
+    :param name: Название окончания
+    :type name: str
+    :param tables: Уже построенные таблицы по названиям окончаний; недостающие таблицы окончаний после
+        взятий и превращений строятся и добавляются сюда
+    :type tables: dict{str: bytes}
+    :returns: Таблица окончания
+    :raises ValueError: Если название некорректно
+    """
+    target = layout(name)
+    tables = {} if tables is None else tables
+    codes, size = target.codes, target.size
+    values = bytearray([INVALID]) * size
+    done = bytearray(size)
+    remaining = bytearray(size)
+    longest = bytearray(size)
+    buckets = [[] for _ in range(INVALID)]
+    index = target.index
+    i = 0
+    for side in WHITE, BLACK:
+        for king in target.kings:
+            unique = len(target._transforms[king]) == 1 and not target._pairs
+            for rest in itertools.product(range(64), repeat=len(codes) - 1):
+                squares = (king,) + rest
+                position_index = i
+                i += 1
+                if not unique and index(squares, side) != position_index or not _is_legal(codes, squares, side):
+                    continue
+                values[position_index] = 0
+                children = set()
+                count = 0
+                can_draw = False
+                win, lose = INVALID, -1
+                for child_codes, child_squares in _children(codes, squares, side):
+                    count += 1
+                    if child_codes is codes:
+                        children.add(index(child_squares, side ^ 1))
+                        continue
+                    value = _value(tables, child_codes, child_squares, side ^ 1)
+                    if not value:
+                        can_draw = True
+                    elif value & 1:
+                        win = min(win, value)
+                    else:
+                        lose = max(lose, value - 1)
+                if not count:
+                    if _attacked(squares[codes.index(KING | side << 3)], codes, squares, side ^ 1,
+                                 sum(1 << sq for sq in squares)):
+                        buckets[0].append(position_index)
+                    else:
+                        done[position_index] = 1
+                    continue
+                if win != INVALID:
+                    buckets[win].append(position_index)
+                remaining[position_index] = len(children) + (can_draw or win != INVALID)
+                if lose >= 0:
+                    longest[position_index] = lose
+                if not remaining[position_index]:
+                    buckets[lose + 1].append(position_index)
+    squares_of = target.squares
+    for plies, bucket in enumerate(buckets):
+        for position_index in bucket:
+            if done[position_index]:
+                continue
+            done[position_index] = 1
+            values[position_index] = plies + 1
+            squares, side = squares_of(position_index)
+            previous = {index(origin, side ^ 1) for origin in _unmoves(codes, squares, side ^ 1)}
+            for j in previous:
+                if done[j] or values[j] == INVALID:
+                    continue
+                if plies & 1:
+                    remaining[j] -= 1
+                    if plies > longest[j]:
+                        longest[j] = plies
+                    if not remaining[j]:
+                        buckets[longest[j] + 1].append(j)
+                else:
+                    buckets[plies + 1].append(j)
+        bucket.clear()
+    tables[target.name] = values
+    return values
+
+
+def save(directory, name, table):
+    """
+    Сохраняет таблицу окончания в файл <окончание>.tb
+
+    :param directory: Каталог таблиц
+    :type directory: str
+    :param name: Название окончания
+    :type name: str
+    :param table: Таблица
+    :type table: bytes
+    """
+    with open(os.path.join(directory, layout(name).name + ".tb"), "wb") as file:
+        file.write(table)
+
+
+class Tablebase:
+    """
+    Каталог эндшпильных таблиц. Таблицы отображаются в память при первом обращении к окончанию
+
+    :ivar directory: Каталог с файлами <окончание>.tb
+    :type directory: str
+    """
+    max_pieces = MAX_PIECES
+
+    def __init__(self, directory):
+        """
+        :param directory: Каталог с файлами таблиц
+        :type directory: str
+        :raises OSError: Если каталог не существует
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Каталог таблиц не найден: {directory}")
+        self.directory = directory
+        self._tables = {}
+        self._files = []
+
+    def close(self):
+        """
+        Закрывает отображённые таблицы
+        """
+        for file, table in self._files:
+            table.close()
+            file.close()
+        self._files = []
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def table(self, name):
+        """
+        Возвращает таблицу окончания, отображая файл в память при первом обращении
+
+        :param name: Нормализованное название окончания
+        :type name: str
+        :returns: Таблица или None, если файла нет
+        :raises ValueError: Если размер файла не соответствует окончанию
+        """
+        if name in self._tables:
+            return self._tables[name]
+        path = os.path.join(self.directory, name + ".tb")
+        table = None
+        if os.path.exists(path):
+            if os.path.getsize(path) != layout(name).size:
+                raise ValueError(f"Файл не является таблицей окончания {name}: {path}")
+            file = open(path, "rb")
+            table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._files.append((file, table))
+        self._tables[name] = table
+        return table
+
+    def probe(self, position) -> tuple:
+        """
+        Находит результат позиции в таблицах
+
+        :param position: Позиция
+        :type position: Position
+        :returns: (1 — ходящий ставит мат, -1 — получает мат, 0 — ничья; число полуходов до мата) или None,
+            если фигур больше MAX_PIECES, таблицы нет, есть права на рокировку или возможно взятие на проходе
+        """
+        white, black = position.pieces
+        if len(white) + len(black) > MAX_PIECES or position.castling:
+            return None
+        if len(white) + len(black) == 2:
+            return 0, 0
+        board, side = position.board, position.side
+        if position.ep >= 0 and any(board[sq] == PAWN | side << 3 for sq in PAWN_ATTACKS[side ^ 1][position.ep]):
+            return None
+        white = sorted(white, key=lambda sq: -board[sq])
+        black = sorted(black, key=lambda sq: -board[sq])
+        name, flipped = normalize([board[sq] & 7 for sq in white], [board[sq] & 7 for sq in black])
+        if flipped:
+            white, black = [sq ^ 56 for sq in black], [sq ^ 56 for sq in white]
+            side ^= 1
+        table = self.table(name)
+        if table is None:
+            return None
+        value = table[layout(name).index(white + black, side)]
+        return decode(value) if value != INVALID else None
+
+    def mate_in(self, position) -> int:
+        """
+        Находит число ходов до мата по таблицам
+
+        :param position: Позиция
+        :type position: Position
+        :returns: Число ходов до мата (отрицательное, если мат получает ходящий игрок), 0 при ничьей,
+            None если позиции нет в таблицах
+        """
+        found = self.probe(position)
+        if found is None:
+            return None
+        wdl, plies = found
+        return wdl * ((plies + 1) // 2)
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа командной строки: строит таблицы или выводит результат позиции
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str]
+    :returns: Код завершения (1, если позиции нет в таблицах)
+    """
+    parser = argparse.ArgumentParser(prog="python -m chess tablebase", description="Эндшпильные таблицы")
+    parser.add_argument("directory", help="каталог таблиц")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="построить таблицы окончаний")
+    build.add_argument("names", nargs="+", help="окончания, например KQvK KRvK KPvK KQvKR")
+    probe = commands.add_parser("probe", help="найти позицию в таблицах")
+    probe.add_argument("--fen", required=True, help="позиция в записи FEN")
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        os.makedirs(args.directory, exist_ok=True)
+        tables = {}
+        for name in args.names:
+            start = time.perf_counter()
+            generate(name, tables)
+            print(f"{layout(name).name}: {time.perf_counter() - start:.1f} с")
+        for name, table in tables.items():
+            save(args.directory, name, table)
+        return 0
+    with Tablebase(args.directory) as tablebase:
+        found = tablebase.probe(Position.from_fen(args.fen))
+    if found is None:
+        print("Позиции нет в таблицах")
+        return 1
+    wdl, plies = found
+    print("Ничья" if not wdl else f"{'Выигрыш' if wdl > 0 else 'Проигрыш'}: мат через {plies} полуходов")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
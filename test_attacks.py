@@ -0,0 +1,44 @@
+import random
+from attacks import AttackMapPosition
+from position import Position, WHITE, BLACK
+
+
+def test_initial_attacks():
+    position = AttackMapPosition.initial()
+    assert position.attacks[WHITE][40] == 2
+    assert position.attacks[WHITE][59] == 1
+    assert position.attacks[BLACK][36] == 0
+    assert not position.is_attacked(36, WHITE)
+
+def test_incremental_matches_rebuild():
+    rng = random.Random(11)
+    for _ in range(10):
+        position = AttackMapPosition.initial()
+        for _ in range(80):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make(rng.choice(moves))
+            assert position.attacks == AttackMapPosition.from_position(position).attacks
+        while position.history:
+            position.unmake()
+            assert position.attacks == AttackMapPosition.from_position(position).attacks
+
+def test_same_moves_as_scan():
+    rng = random.Random(5)
+    position = AttackMapPosition.initial()
+    for _ in range(120):
+        moves = position.legal_moves()
+        plain = Position.from_rows(position.to_rows(), position.side, position.castling)
+        plain.ep = position.ep
+        assert sorted(moves) == sorted(plain.legal_moves())
+        if not moves:
+            break
+        position.make(rng.choice(moves))
+
+def test_king_cannot_step_back_along_check():
+    position = AttackMapPosition()
+    position.set_square(60, "k_white")
+    position.set_square(4, "r_black")
+    position.set_square(0, "k_black")
+    assert sorted(m >> 6 & 63 for m in position.legal_moves()) == [51, 53, 59, 61]
@@ -0,0 +1,34 @@
+import os
+import pytest
+import bench
+
+MODE = os.environ.get("CHESS_BENCH", "")
+
+
+def test_render_counts():
+    for name, kind, fen in bench.CORPUS:
+        counts = bench.render_counts(fen)
+        assert counts["items_initial"] == 145, name
+        assert counts["items_per_move"] <= 1 and counts["canvas_calls_per_move"] <= 6, name
+
+
+def test_compare():
+    baseline = {"start": {"simulate_us": 100, "items_per_move": 0, "kind": "opening"}}
+    assert bench.compare({"start": {"simulate_us": 120, "items_per_move": 0, "kind": "opening"}}, baseline) == []
+    regressions = bench.compare({"start": {"simulate_us": 130, "items_per_move": 1}, "new": {"simulate_us": 1}},
+                                baseline, threshold=0.25)
+    assert regressions == ["start.simulate_us: 100 -> 130 (+30%)", "start.items_per_move: 0 -> 1 (+100%)"]
+    assert bench.compare({"start": {"simulate_us": 130}}, baseline, threshold=0.5) == []
+
+
+@pytest.mark.skipif(MODE in ("", "0"), reason="замер производительности включается переменной CHESS_BENCH=1 (save — сохранить)")
+def test_baseline():
+    path = os.environ.get("CHESS_BENCH_BASELINE", bench.DEFAULT_BASELINE)
+    results = bench.run()
+    if MODE == "save" or not os.path.exists(path):
+        bench.save(path, results)
+        pytest.skip(f"базовый замер сохранён: {path}")
+    threshold = float(os.environ.get("CHESS_BENCH_THRESHOLD", bench.THRESHOLD))
+    count_threshold = float(os.environ.get("CHESS_BENCH_COUNT_THRESHOLD", bench.COUNT_THRESHOLD))
+    regressions = bench.compare(results, bench.load(path), threshold, count_threshold)
+    assert not regressions, "\n".join(regressions)
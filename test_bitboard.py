@@ -0,0 +1,38 @@
+import random
+import bitboard
+from bitboard import BitboardPosition, rook_attacks, bishop_attacks
+from position import Position
+
+
+def count_moves(position, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in bitboard.legal_moves(position):
+        position.make(move)
+        nodes += count_moves(position, depth - 1)
+        position.unmake()
+    return nodes
+
+def test_slider_tables():
+    assert rook_attacks(0, 0) == sum(1 << s for s in range(1, 8)) | sum(1 << s for s in range(8, 64, 8))
+    assert rook_attacks(0, 1 << 2 | 1 << 16) == 1 << 1 | 1 << 2 | 1 << 8 | 1 << 16
+    assert bishop_attacks(27, 1 << 18) == bishop_attacks(27, 0) & ~(1 << 9 | 1 << 0)
+
+def test_initial_moves():
+    assert count_moves(Position.initial(), 3) == 8902
+    assert count_moves(BitboardPosition.initial(), 3) == 8902
+
+def test_same_moves_as_mailbox():
+    rng = random.Random(7)
+    for _ in range(20):
+        position = BitboardPosition.initial()
+        for _ in range(60):
+            moves = position.legal_moves()
+            assert sorted(bitboard.legal_moves(position)) == sorted(moves)
+            if not moves:
+                break
+            position.make(rng.choice(moves))
+        while position.history:
+            position.unmake()
+        assert position.bb == BitboardPosition.initial().bb
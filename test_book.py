@@ -0,0 +1,29 @@
+import random
+from book import OpeningBook, write_book, encode_move, decode_move
+from perft import START_FEN
+from position import Position, move_to_uci
+
+
+def test_move_encoding():
+    position = Position.from_fen("r3k2r/1P6/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    for move in position.legal_moves():
+        assert decode_move(position, encode_move(position, move)) == move
+    castles = {move_to_uci(move): encode_move(position, move) for move in position.legal_moves()}
+    assert castles["e1g1"] == 0x107 and castles["e1c1"] == 0x100
+
+
+def test_find(tmp_path):
+    start = Position.from_fen(START_FEN)
+    moves = {move_to_uci(move): move for move in start.legal_moves()}
+    e4, d4 = encode_move(start, moves["e2e4"]), encode_move(start, moves["d2d4"])
+    path = tmp_path / "book.bin"
+    write_book(path, [(start.key(), d4, 1), (start.key(), e4, 3), (start.key() + 1, e4, 5), (start.key() - 1, d4, 5)])
+    with OpeningBook(path) as book:
+        assert book.count == 4
+        assert [entry.weight for entry in book.entries(start)] == [3, 1]
+        assert book.find(start, best=True) == moves["e2e4"]
+        rng = random.Random(1)
+        picks = [book.find(start, rng=rng) for _ in range(400)]
+        assert 250 < picks.count(moves["e2e4"]) < 350
+        start.make(moves["e2e4"])
+        assert book.find(start) is None
@@ -2,6 +2,7 @@ import pytest
 import tkinter as tk
 from unittest.mock import Mock, MagicMock, call
 from chess import Chess, PieceNotOnBoard
+from position import GameStatus
 
 def test_path():
     chess = Chess('pc')
@@ -233,4 +234,130 @@ def test_is_stalemate():
     chess.show_end_game_dialog = Mock()
     assert chess.is_stalemate()
     assert chess.stop_timer.called
-    assert chess.show_end_game_dialog.called
\ No newline at end of file
+    assert chess.show_end_game_dialog.called
+
+
+def test_simulate_pinned_piece():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[7][4] = "k_white"
+    chess.board[6][4] = "r_white"
+    chess.board[0][4] = "r_black"
+    chess.board[0][0] = "k_black"
+    chess.w_king_pos, chess.b_king_pos = (7, 4), (0, 0)
+    chess.find_valid_moves()
+    chess.simulate("w")
+    assert sorted(chess.valid_moves[6][4]) == [(r, 4) for r in range(6)]
+
+
+def test_simulate_check_block():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[7][4] = "k_white"
+    chess.board[7][0] = "r_white"
+    chess.board[3][4] = "q_black"
+    chess.board[0][0] = "k_black"
+    chess.w_king_pos, chess.b_king_pos = (7, 4), (0, 0)
+    chess.find_valid_moves()
+    chess.simulate("w")
+    assert chess.valid_moves[7][0] == []
+    assert (7, 4) not in chess.valid_moves[7][4]
+    assert (6, 4) not in chess.valid_moves[7][4]
+    assert sorted(chess.valid_moves[7][4]) == [(6, 3), (6, 5), (7, 3), (7, 5)]
+
+
+def test_simulate_en_passant_pin():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[3][0] = "k_white"
+    chess.board[3][1] = "p_white"
+    chess.board[3][2] = "p_black"
+    chess.board[2][2] = "s_black"
+    chess.board[3][7] = "r_black"
+    chess.board[0][7] = "k_black"
+    chess.w_king_pos, chess.b_king_pos = (3, 0), (0, 7)
+    chess.find_valid_moves()
+    assert (2, 2) in chess.valid_moves[3][1]
+    chess.simulate("w")
+    assert chess.valid_moves[3][1] == [(2, 1)]
+
+
+def test_castle_through_check():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[7][4] = "k_white"
+    chess.board[7][0] = "r_white"
+    chess.board[7][7] = "r_white"
+    chess.board[0][5] = "r_black"
+    chess.board[0][0] = "k_black"
+    chess.w_king_pos, chess.b_king_pos = (7, 4), (0, 0)
+    chess.find_valid_moves()
+    chess.simulate("w")
+    chess.castle()
+    assert (7, 2) in chess.valid_moves[7][4]
+    assert (7, 6) not in chess.valid_moves[7][4]
+
+
+def test_bitboard_backend():
+    chess = Chess(backend="bitboard")
+    chess.board[4][4] = "q_white"
+    chess.find_valid_moves()
+    reference = Chess()
+    reference.board[4][4] = "q_white"
+    reference.find_valid_moves()
+    assert [[sorted(m) for m in row] for row in chess.valid_moves] == \
+           [[sorted(m) for m in row] for row in reference.valid_moves]
+    chess.simulate("w")
+    reference.simulate("w")
+    assert [[sorted(m) for m in row] for row in chess.valid_moves] == \
+           [[sorted(m) for m in row] for row in reference.valid_moves]
+    with pytest.raises(ValueError):
+        Chess(backend="magic")
+
+
+def test_game_status_computed_once_per_ply():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[0][0] = "k_black"
+    chess.board[2][2] = "q_white"
+    chess.board[7][7] = "k_white"
+    chess.w_king_pos, chess.b_king_pos = (7, 7), (0, 0)
+    chess.selected_piece_pos = (2, 2)
+    chess.canvas = Mock()
+    chess.draw_board = Mock()
+    chess.start_timer = Mock()
+    chess.show_end_game_dialog = Mock()
+    chess.no_moves = Mock(wraps=chess.no_moves)
+    chess.make_move(2, 1)
+    assert chess.status is GameStatus.STALEMATE
+    assert chess.no_moves.call_count == 1
+    assert not chess.canvas.create_rectangle.called
+    assert chess.show_end_game_dialog.call_args[0][0] == "Пат! Ничья"
+
+
+def test_is_draw_repetition():
+    chess = Chess()
+    chess.canvas = Mock()
+    chess.draw_board = Mock()
+    chess.start_timer = Mock()
+    chess.show_end_game_dialog = Mock()
+    for _ in range(2):
+        for frm, to in ((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6)):
+            assert not chess.show_end_game_dialog.called
+            chess.selected_piece_pos = frm
+            chess.make_move(*to)
+    assert chess.show_end_game_dialog.call_args[0][0] == "Ничья! Троекратное повторение позиции"
+
+
+def test_is_draw_insufficient_material():
+    chess = Chess()
+    chess.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    chess.board[0][0] = "k_black"
+    chess.board[7][7] = "k_white"
+    chess.board[4][4] = "b_white"
+    chess.show_end_game_dialog = Mock()
+    chess.simulate("w")
+    assert chess.is_draw()
+    assert chess.show_end_game_dialog.call_args[0][0] == "Ничья! Недостаточно материала"
+    chess.board[1][1] = "p_black"
+    assert not chess.is_draw()
@@ -0,0 +1,54 @@
+import pytest
+from clock import ChessClock
+
+
+class FakeTime:
+    def __init__(self):
+        self.value = 100.0
+
+    def __call__(self):
+        return self.value
+
+
+def test_charges_elapsed_time():
+    now = FakeTime()
+    clock = ChessClock({"white": 60, "black": 60}, now=now)
+    clock.start("white")
+    now.value += 2.7
+    assert clock.left("white") == pytest.approx(57.3)
+    assert clock.next_change() == pytest.approx(0.3)
+    assert clock.stop() == pytest.approx(2.7)
+    clock.start("black")
+    now.value += 0.4
+    clock.stop()
+    assert clock.remaining == pytest.approx({"white": 57.3, "black": 59.6})
+    assert clock.stop() == 0
+
+
+def test_increment_and_delay():
+    now = FakeTime()
+    clock = ChessClock({"white": 60, "black": 60}, increment=2, delay=3, now=now)
+    clock.start("white")
+    now.value += 1
+    clock.stop()
+    clock.start("black")
+    now.value += 10
+    clock.stop()
+    assert clock.remaining == pytest.approx({"white": 62, "black": 55})
+    clock.start("white")
+    now.value += 70
+    assert clock.left("white") < 0 and clock.next_change() == 0
+    clock.stop()
+    assert clock.remaining["white"] == 0
+
+
+def test_restore():
+    now = FakeTime()
+    clock = ChessClock({"white": 60, "black": 60}, increment=2, delay=3, now=now)
+    clock.start("white")
+    now.value += 5
+    clock.restore()
+    assert clock.remaining == {"white": 55, "black": 60} and clock.running is None
+    clock.start("black")
+    clock.restore({"white": 60, "black": 60})
+    assert clock.remaining == {"white": 60, "black": 60} and clock.running is None
@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+import pytest
+from game import Game, IllegalMove
+from position import GameStatus
+
+
+def test_fools_mate():
+    game = Game()
+    for frm, to in ((6, 5), (5, 5)), ((1, 4), (3, 4)), ((6, 6), (4, 6)), ((0, 3), (4, 7)):
+        game.play(frm, to)
+    assert game.status is GameStatus.CHECKMATE
+    assert game.result == "Мат! Победили Чёрные"
+    with pytest.raises(IllegalMove):
+        game.play((6, 0), (5, 0))
+
+def test_illegal_move():
+    game = Game(backend="bitboard")
+    with pytest.raises(IllegalMove):
+        game.play((6, 4), (3, 4))
+    with pytest.raises(IllegalMove):
+        game.play((1, 4), (3, 4))
+    game.play((6, 4), (4, 4))
+    assert game.current_player == "black"
+
+def test_promotion():
+    game = Game()
+    game.board = [["No_piece" for _ in range(8)] for _ in range(8)]
+    game.board[1][0] = "p_white"
+    game.board[7][7] = "k_white"
+    game.board[0][7] = "k_black"
+    game.w_king_pos, game.b_king_pos = (7, 7), (0, 7)
+    game.update_moves()
+    game.play((1, 0), (0, 0), promotion="knight")
+    assert game.board[0][0] == "n_white"
+    assert game.result == "Ничья! Недостаточно материала"
+
+def test_no_gui_imports():
+    code = "import sys, chess, game; print(any(m.split('.')[0] in ('tkinter', 'PIL') for m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert output.strip() == "False"
+
+@pytest.mark.parametrize("backend", ["mailbox", "bitboard"])
+def test_from_fen(backend):
+    fen = "r3k2r/8/8/3pP3/8/8/8/4K2R w Kq d6 0 20"
+    game = Game.from_fen(fen, backend=backend)
+    assert game.to_fen() == fen
+    assert game.w_king_pos == (7, 4) and game.b_king_pos == (0, 4)
+    assert game.king_moved == [False, False]
+    assert game.rook_moved == [[False, True], [True, False]]
+    assert game.en_passant_target == (3, 3)
+    assert game.board[2][3] == "s_black"
+    assert (2, 3) in game.valid_moves[3][4]
+    assert (7, 6) in game.valid_moves[7][4]
+    assert (7, 2) not in game.valid_moves[7][4]
+    game.play((7, 4), (7, 6))
+    assert game.to_fen() == "r3k2r/8/8/3pP3/8/8/8/5RK1 b q - 1 20"
+    assert (0, 2) in game.valid_moves[0][4]
+    assert (0, 6) not in game.valid_moves[0][4]
+
+def test_notation():
+    game = Game()
+    for san in "e4", "e5", "Nf3", "Nc6", "Bc4", "Nf6", "Ng5", "d5", "exd5", "Nxd5", "Nxf7", "Kxf7", "Qf3+", "Ke6":
+        game.play_san(san)
+    game.play((7, 1), (5, 2))
+    assert game.notation[-3:] == ["Qf3+", "Ke6", "Nc3"]
+    with pytest.raises(IllegalMove):
+        game.play_san("Nxe5")
+    game.play_san("Ncb4")
+    assert game.notation[-1] == "Nb4"
+    game = Game.from_fen("7k/P7/8/8/8/8/8/K7 w - - 0 1")
+    game.play_san("a8=R+")
+    assert game.notation == ["a8=R+"]
+    assert game.board[0][0] == "r_white"
+
+@pytest.mark.parametrize("backend", ["mailbox", "bitboard"])
+def test_undo_redo(backend):
+    start = "r3k2r/1P6/8/3pP3/8/8/8/R3K2R w KQkq d6 0 20"
+    game = Game.from_fen(start, backend=backend)
+    for san in "exd6", "O-O", "bxa8=Q", "Kg7", "Qxf8+", "Kxf8", "Ra6":
+        game.play_san(san)
+    end, notation = game.to_fen(), game.notation[:]
+    king_moved, rook_moved = game.king_moved[:], [flags[:] for flags in game.rook_moved]
+    while game.undo() is not None:
+        pass
+    assert game.to_fen() == start and game.notation == []
+    assert game.w_king_pos == (7, 4) and game.b_king_pos == (0, 4)
+    assert game.king_moved == [False, False] and game.rook_moved == [[False, False], [False, False]]
+    assert game.en_passant_target == (3, 3)
+    assert (2, 3) in game.valid_moves[3][4] and (7, 6) in game.valid_moves[7][4]
+    while game.redo() is not None:
+        pass
+    assert game.to_fen() == end and game.notation == notation
+    assert game.king_moved == king_moved and game.rook_moved == rook_moved
+    game.undo()
+    game.undo()
+    game.play_san("Kg6")
+    assert game.redo() is None
+    assert game.notation[-2:] == ["Qxf8+", "Kg6"]
+
+def test_en_passant_target_cleared():
+    game = Game()
+    game.play_san("e4")
+    assert game.en_passant_target == (4, 4)
+    game.play_san("Nf6")
+    assert game.en_passant_target is None
+    game.play_san("e5")
+    game.play_san("d5")
+    assert game.en_passant_target == (3, 3)
+    game.play_san("exd6")
+    assert game.en_passant_target is None
+
+def test_from_fen_rejects_en_passant_without_pawn():
+    with pytest.raises(ValueError):
+        Game.from_fen("4k3/8/8/8/8/8/2PP4/4K3 w - d3 0 1")
+    assert Game.from_fen("4k3/8/8/8/3P4/8/8/4K3 b - d3 0 1").to_fen() == "4k3/8/8/8/3P4/8/8/4K3 b - d3 0 1"
@@ -0,0 +1,101 @@
+import random
+import time
+from unittest.mock import Mock
+import pytest
+import journal
+from game import Game
+
+
+def play_random(game, plies, seed=1):
+    rng = random.Random(seed)
+    while len(game.notation) < plies and game.result is None:
+        game.push_move(rng.choice(game.legal))
+        game.after_move()
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / "game.journal")
+    game = Game()
+    log = journal.Journal.create(path, game.to_fen(), 300, increment=2)
+    for san, white, black in ("e4", 298.5, 300), ("e5", 298.5, 297), ("Nf3", 295.25, 297):
+        game.play_san(san)
+        log.write(journal.MOVE, game.undo_stack[-1].move, game.notation[-1], white, black)
+    log.write(journal.UNDO, game.undo().move, "Nf3", 295.25, 296)
+    game.play_san("Qh5")
+    log.write(journal.MOVE, game.undo_stack[-1].move, "Qh5", 295.25, 296)
+    log.close()
+
+    data = journal.read_journal(path)
+    assert (data.limit, data.increment, data.delay) == (300, 2, 0)
+    assert [entry.kind for entry in data.entries] == [journal.MOVE] * 3 + [journal.UNDO, journal.MOVE]
+    assert data.clocks() == (295.25, 296)
+    restored = Game()
+    journal.replay(restored, data)
+    assert restored.to_fen() == game.to_fen() and restored.notation == ["e4", "e5", "Qh5"]
+    assert restored.valid_moves == game.valid_moves and restored.redo_stack == []
+    assert restored.undo().san == "Qh5"
+
+
+def test_torn_tail(tmp_path):
+    path = str(tmp_path / "game.journal")
+    game = Game()
+    log = journal.Journal.create(path, game.to_fen(), 60, sync_records=1)
+    game.play_san("d4")
+    log.write(journal.MOVE, game.undo_stack[-1].move, "d4", 59, 60)
+    log.write(journal.MOVE, game.undo_stack[-1].move, "d5", 59, 58)
+    log.close()
+    with open(path, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 5)
+    assert len(journal.read_journal(path).entries) == 1
+    log = journal.Journal(path)
+    log.write(journal.MOVE, 0, "", 1, 2)
+    log.close()
+    assert journal.read_journal(path).clocks() == (1, 2)
+    with open(path, "wb") as file:
+        file.write(b"not a journal")
+    with pytest.raises(ValueError):
+        journal.read_journal(path)
+
+
+def test_long_game(tmp_path):
+    path = str(tmp_path / "game.journal")
+    game = Game()
+    log = journal.Journal.create(path, game.to_fen(), 600)
+    for seed in range(1, 20):
+        game = Game()
+        play_random(game, 300, seed)
+        if len(game.notation) >= 200:
+            break
+    for record in game.undo_stack:
+        log.write(journal.MOVE, record.move, record.san, 600, 600)
+    log.close()
+    restored = Game()
+    start = time.perf_counter()
+    journal.replay(restored, journal.read_journal(path))
+    assert time.perf_counter() - start < 0.5
+    assert restored.to_fen() == game.to_fen() and restored.notation == game.notation
+
+
+def test_replay_restores_clocks(tmp_path):
+    from chess import Chess
+    from clock import ChessClock
+    path = str(tmp_path / "game.journal")
+    game = Game()
+    log = journal.Journal.create(path, game.to_fen(), 300, increment=2)
+    for san, white, black in ("e4", 300, 300), ("e5", 300, 297), ("Nf3", 295.25, 297):
+        game.play_san(san)
+        log.write(journal.MOVE, game.undo_stack[-1].move, san, white, black)
+    log.close()
+    data = journal.read_journal(path)
+    chess = Chess()
+    journal.replay(chess, data)
+    assert [record.clock for record in chess.undo_stack] == [
+        {"white": 300, "black": 300}, {"white": 300, "black": 300}, {"white": 300, "black": 297}]
+    chess.player_time = dict(zip(("white", "black"), data.clocks()))
+    chess.clock = ChessClock(chess.player_time, data.increment, now=lambda: 50.0)
+    chess.board_window, chess.canvas = Mock(), None
+    chess.timer_labels = {"white": Mock(), "black": Mock()}
+    chess.draw_board = Mock()
+    chess.start_timer()
+    chess.undo_move()
+    assert chess.player_time == {"white": 300, "black": 297} and chess.clock.running == "white"
@@ -0,0 +1,20 @@
+import pytest
+from perft import perft, divide, load_backend, REFERENCE_POSITIONS, START_FEN
+
+
+@pytest.mark.parametrize("backend", ["position", "mailbox", "bitboard"])
+def test_reference_positions(backend):
+    position_class, legal_moves = load_backend(backend)
+    for name, fen, expected in REFERENCE_POSITIONS:
+        assert perft(position_class.from_fen(fen), 2, legal_moves) == expected[1], name
+
+def test_divide_process_pool():
+    counts = divide(START_FEN, 3, jobs=2)
+    assert len(counts) == 20
+    assert counts["e2e4"] == 600
+    assert sum(counts.values()) == 8902
+    assert counts == divide(START_FEN, 3, jobs=1)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_backend("magic")
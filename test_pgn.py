@@ -0,0 +1,54 @@
+import io
+from pgn import read_games, replay, validate
+
+PGN = """[Event "Opera"]
+[White "Morphy"]
+[Black "Duke & Count"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {Это слабый ход} 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7
+8. Nc3 (8. Qxb7 Qb4+) 8... c6 9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7
+14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ $1 Nxb8 17. Rd8# 1-0
+
+[Event "Broken"]
+
+1. e4 e5 2. Ke3 1/2-1/2
+
+[Event "Promotion"]
+[SetUp "1"]
+[FEN "8/P6k/8/8/8/8/8/K7 w - - 0 1"]
+
+1. a8=Q Kg6 ; комментарий до конца строки
+2. Qb8 *
+"""
+
+
+def test_read_games():
+    games = list(read_games(io.StringIO(PGN)))
+    assert [game.headers["Event"] for game in games] == ["Opera", "Broken", "Promotion"]
+    assert len(games[0].moves) == 33
+    assert games[0].moves[14] == "Nc3" and games[0].moves[15] == "c6"
+    assert games[0].result == "1-0"
+    assert games[2].moves == ["a8=Q", "Kg6", "Qb8"]
+    assert [game.index for game in games] == [0, 1, 2]
+
+
+def test_replay():
+    morphy, broken, promotion = read_games(io.StringIO(PGN))
+    report = replay(morphy, positions=True)
+    assert report.ok and report.plies == 33
+    assert report.fen == "1n1Rkb1r/p4ppp/4q3/4p1B1/4P3/8/PPP2PPP/2K5 b k - 1 17"
+    assert report.positions[-1] == report.fen
+    report = replay(broken, backend="bitboard")
+    assert not report.ok and report.plies == 2
+    assert "Ke3" in report.error
+    assert replay(promotion, backend="mailbox").fen == "1Q6/8/6k1/8/8/8/8/K7 b - - 2 2"
+
+
+def test_validate_pool():
+    games = list(read_games(io.StringIO(PGN))) * 20
+    serial = [(r.index, r.plies, r.error) for r in validate(games, jobs=1)]
+    ordered = [(r.index, r.plies, r.error) for r in validate(iter(games), jobs=2, chunksize=4)]
+    assert ordered == serial
+    unordered = [(r.index, r.plies, r.error) for r in validate(iter(games), jobs=2, chunksize=4, ordered=False)]
+    assert sorted(unordered) == sorted(serial)
+    assert sum(not r.ok for r in validate(iter(games), jobs=2, chunksize=1)) == 20
@@ -0,0 +1,152 @@
+import pytest
+from position import Position, BoardView, GameStatus, UnknownPiece, WHITE, BLACK, CASTLE_WK, FLAG_EP
+
+
+def count_moves(position, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in position.legal_moves():
+        position.make(move)
+        nodes += count_moves(position, depth - 1)
+        position.unmake()
+    return nodes
+
+def test_initial_moves():
+    position = Position.initial()
+    assert len(position.legal_moves()) == 20
+    assert count_moves(position, 3) == 8902
+
+def test_make_unmake_restores_position():
+    position = Position.initial()
+    board, pieces, castling = bytearray(position.board), sorted(position.pieces[WHITE]), position.castling
+    for move in position.legal_moves():
+        position.make(move)
+        position.unmake()
+    assert position.board == board
+    assert sorted(position.pieces[WHITE]) == pieces
+    assert position.castling == castling
+    assert position.side == WHITE
+
+def test_piece_lists():
+    position = Position.initial()
+    assert len(position.pieces[WHITE]) == 16
+    assert position.kings == [60, 4]
+    position.set_square(60, "No_piece")
+    assert len(position.pieces[WHITE]) == 15
+    assert position.kings[WHITE] == -1
+    assert not position.castling & CASTLE_WK
+
+def test_board_view():
+    position = Position.initial()
+    board = BoardView(position)
+    assert board[0][1] == "n_black"
+    assert board[7][1:4] == ["n_white", "b_white", "q_white"]
+    board[4][4] = "q_white"
+    assert position.board[36] == position.board[59]
+    assert Position.from_rows(position.to_rows()).board == position.board
+    with pytest.raises(UnknownPiece):
+        board[4][4] = "x_white"
+
+def test_en_passant_marker():
+    position = Position.initial()
+    position.make(position.build_move(52, 36))
+    position.make(position.build_move(8, 16))
+    position.make(position.build_move(36, 28))
+    position.make(position.build_move(11, 27))
+    assert position.piece_name(19) == "s_black"
+    capture = [m for m in position.legal_moves() if m >> 15 & FLAG_EP]
+    assert len(capture) == 1
+    position.make(capture[0])
+    assert position.board[27] == 0
+    position.unmake()
+    assert position.piece_name(27) == "p_black"
+    assert position.side == WHITE
+
+def test_castling_rights_lost():
+    position = Position.initial()
+    for frm, to in (52, 36), (12, 28), (62, 45), (1, 18), (61, 34), (6, 21), (60, 61):
+        position.make(position.build_move(frm, to))
+    assert position.castling == 12
+    assert position.side == BLACK
+
+def test_iter_legal_moves():
+    position = Position.initial()
+    assert sorted(position.iter_legal_moves()) == sorted(position.legal_moves())
+    moves = position.iter_legal_moves()
+    first = next(moves)
+    position.make(first)
+    position.unmake()
+    assert sorted([first, *moves]) == sorted(position.legal_moves())
+
+def test_status():
+    rows = [["No_piece"] * 8 for _ in range(8)]
+    rows[0][0], rows[2][1], rows[7][7] = "k_black", "q_white", "k_white"
+    position = Position.from_rows(rows, BLACK)
+    assert position.status() is GameStatus.STALEMATE
+    assert not position.has_legal_move()
+    position.set_square(56, "r_white")
+    assert position.status() is GameStatus.CHECKMATE
+    assert position.status().is_over
+    position.set_square(17, "No_piece")
+    assert position.status() is GameStatus.CHECK
+    assert position.status().in_check
+    assert Position.initial().status() is GameStatus.ONGOING
+
+def test_zobrist_key():
+    position = Position.initial()
+    assert position.key() == 0x463B96181691FC9C
+    for frm, to in (52, 36), (11, 27), (36, 28), (13, 29):
+        position.make(position.build_move(frm, to))
+    assert position.key() == 0x22A48B5A8E47FF78
+    other = Position.initial()
+    for frm, to in (62, 45), (1, 18), (45, 62), (18, 1):
+        other.make(other.build_move(frm, to))
+    assert other.key() == Position.initial().key()
+    assert other.is_repetition(2) and not other.is_repetition()
+    while other.history:
+        other.unmake()
+    assert other.repetitions == {other.key(): 1}
+
+def test_from_fen():
+    position = Position.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+    assert position.ep == 21
+    assert position.piece_name(21) == "s_black"
+    assert position.castling == 15
+    assert position.fullmove == 3
+    assert position.key() == 0x22A48B5A8E47FF78
+    assert Position.from_fen("7k/8/8/8/8/8/8/R3K3 w KQ - 0 1").castling == 2
+    with pytest.raises(ValueError):
+        Position.from_fen("8/8/8 w - -")
+    with pytest.raises(UnknownPiece):
+        Position.from_fen("x7/8/8/8/8/8/8/8 w - - 0 1")
+
+@pytest.mark.parametrize("fen", [
+    "9/8/8/8/8/8/8/4K2k w - - 0 1",
+    "7/8/8/8/8/8/8/4K2k w - - 0 1",
+    "8p/8/8/8/8/8/8/4K2k w - - 0 1",
+    "rnbqkbnrp/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "8/8/8/8/8/8/8/8 w - - 0 1",
+    "8/8/8/8/8/8/8/4K3 w - - 0 1",
+    "k6k/8/8/8/8/8/8/4K3 w - - 0 1",
+    "7k/8/8/8/8/8/8/K3K3 w - - 0 1",
+    "P6k/8/8/8/8/8/8/4K3 w - - 0 1",
+    "7k/8/8/8/8/8/8/p3K3 b - - 0 1",
+    "4k3/8/8/8/8/8/2PP4/4K3 w - d3 0 1",
+    "4k3/8/8/8/3p4/8/8/4K3 w - d6 0 1",
+    "4k3/8/8/3P4/8/8/8/4K3 w - d6 0 1",
+    "4k3/3p4/8/3p4/8/8/8/4K3 w - d6 0 1",
+    "4k3/8/8/8/3P4/8/8/4K3 b - d6 0 1",
+])
+def test_from_fen_invalid(fen):
+    with pytest.raises(ValueError):
+        Position.from_fen(fen)
+
+def test_to_fen():
+    from perft import REFERENCE_POSITIONS
+    for _, fen, _ in REFERENCE_POSITIONS:
+        assert Position.from_fen(fen).to_fen() == " ".join(fen.split()[:6])
+    position = Position.initial()
+    position.make(position.build_move(52, 36))
+    assert position.to_fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+    assert Position.from_fen(position.to_fen()).key() == position.key()
@@ -0,0 +1,53 @@
+import csv
+import json
+import profiler
+from game import Game
+
+
+def test_profile_report(tmp_path):
+    simulate = Game.simulate
+    path = str(tmp_path / "profile.json")
+    active = profiler.enable((Game,), path, overlay=False)
+    try:
+        assert Game.simulate is not simulate and Game.simulate.__wrapped__ is simulate
+        game = Game()
+        for san in "e4", "e5", "Nf3", "Nc6", "Bc4", "Bc5":
+            game.play_san(san)
+        game.find_valid_moves()
+        assert game.is_square_under_attack(7, 4, "white") is False
+        active.dump()
+        active.dump(str(tmp_path / "profile.csv"))
+    finally:
+        profiler.disable()
+    assert Game.simulate is simulate and profiler.active is None
+
+    rows = json.loads((tmp_path / "profile.json").read_text(encoding="utf-8"))["plies"]
+    by_key = {(row["ply"], row["function"]): row for row in rows}
+    assert by_key[0, "simulate"]["calls"] == 1 and by_key[0, "simulate"]["nodes"] == 20
+    assert by_key[6, "castle"]["nodes"] == 1
+    assert by_key[6, "find_valid_moves"]["nodes"] > by_key[6, "simulate"]["nodes"]
+    assert by_key[6, "is_square_under_attack"]["calls"] >= 1
+    assert all(row["max_ms"] <= row["total_ms"] for row in rows)
+    with open(tmp_path / "profile.csv", encoding="utf-8") as file:
+        assert next(csv.DictReader(file))["function"] == "simulate"
+    assert active.summary(6, limit=1).startswith("Полуход 6: ")
+
+
+def test_castle_nodes_and_reports_per_game(tmp_path):
+    active = profiler.enable((Game,), str(tmp_path / "profile.json"), overlay=False)
+    try:
+        Game.from_fen("4k3/8/8/8/8/8/8/R3Q1K1 w - - 0 1")
+        active.dump()
+        active.reset()
+        game = Game.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        game.play_san("Kf1")
+        active.dump()
+        active.reset()
+        active.dump()
+    finally:
+        profiler.disable()
+    first = json.loads((tmp_path / "profile.json").read_text(encoding="utf-8"))["plies"]
+    second = json.loads((tmp_path / "profile-2.json").read_text(encoding="utf-8"))["plies"]
+    assert not (tmp_path / "profile-3.json").exists()
+    assert [row["nodes"] for row in first if row["function"] == "castle"] == [0]
+    assert {row["ply"]: row["nodes"] for row in second if row["function"] == "castle"} == {0: 2, 1: 2}
@@ -0,0 +1,280 @@
+import pytest
+from unittest.mock import Mock
+from chess import Chess
+from game import StaleMoves
+from renderer import BoardRenderer
+from sprites import SPRITE_NAMES
+from position import Position, move_to_uci
+
+
+class FakeCanvas:
+    def __init__(self):
+        self.items = {}
+        self.calls = 0
+
+    def _create(self, kind, *coords, **options):
+        self.calls += 1
+        item = len(self.items) + 1
+        self.items[item] = dict(options, kind=kind, coords=coords)
+        return item
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", *coords, **options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", *coords, **options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", *coords, **options)
+
+    def create_oval(self, *coords, **options):
+        return self._create("oval", *coords, **options)
+
+    def create_polygon(self, *coords, **options):
+        return self._create("polygon", *coords, **options)
+
+    def itemconfig(self, item, **options):
+        self.calls += 1
+        self.items[item].update(options)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        self.items[item]["coords"] = coords
+
+    def visible(self, kind):
+        return [item for item in self.items.values() if item["kind"] == kind and item.get("state") != "hidden"]
+
+
+def make_chess():
+    chess = Chess()
+    chess.canvas = FakeCanvas()
+    chess.piece_images = {name: name for name in SPRITE_NAMES}
+    chess.board_window = Mock()
+    chess.player_time = {"white": 600, "black": 600}
+    chess.timer_labels = {"white": Mock(), "black": Mock()}
+    chess.show_end_game_dialog = Mock()
+    chess.draw_board()
+    return chess
+
+def click(chess, row, col):
+    chess.on_click(Mock(x=col * 80 + 40, y=row * 80 + 40))
+
+def test_initial_render():
+    chess = make_chess()
+    assert len(chess.canvas.visible("image")) == 32
+    assert len(chess.canvas.visible("rectangle")) == 64
+    assert isinstance(chess.renderer, BoardRenderer)
+
+def test_items_do_not_grow():
+    chess = make_chess()
+    for _ in range(3):
+        for frm, to in ((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6)):
+            click(chess, *frm)
+            click(chess, *to)
+    count = len(chess.canvas.items)
+    for frm, to in ((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6)):
+        click(chess, *frm)
+        click(chess, *to)
+    assert len(chess.canvas.items) == count
+    assert not chess.canvas.visible("oval")
+
+def test_move_updates_only_changed_squares():
+    chess = make_chess()
+    click(chess, 6, 4)
+    assert len(chess.canvas.visible("oval")) == 2
+    calls = chess.canvas.calls
+    click(chess, 4, 4)
+    assert chess.board[4][4] == "p_white"
+    assert chess.renderer.shown[36] == "p_white" and chess.renderer.shown[52] == "No_piece"
+    assert chess.canvas.calls - calls < 10
+    assert len(chess.canvas.visible("image")) == 32
+
+def test_background_analysis():
+    chess = make_chess()
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    assert chess.board[4][4] == "p_white"
+    assert chess.pending is not None
+    click(chess, 1, 4)
+    assert chess.selected_piece_pos != (1, 4)
+    while chess.pending is not None:
+        func, args = callbacks.pop(0)
+        func(*args)
+    assert chess.valid_moves[1][4] == [(2, 4), (3, 4)]
+    click(chess, 1, 4)
+    assert chess.selected_piece_pos == (1, 4)
+
+def test_background_analysis_san():
+    chess = make_chess()
+    chess.set_fen("rnbqkbnr/pppppppp/8/8/8/5N2/PPP1PPPP/RNBQKB1R w KQkq - 0 1")
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    for frm, to in ((6, 0), (5, 0)), ((1, 0), (2, 0)):
+        click(chess, *frm)
+        click(chess, *to)
+        with pytest.raises(StaleMoves):
+            chess.push_move(chess.position.build_move(57, 51))
+        while chess.pending is not None:
+            func, args = callbacks.pop(0)
+            func(*args)
+    assert chess.legal_key == chess.position.key()
+    chess.push_move(chess.position.build_move(57, 51))
+    assert chess.notation == ["a3", "a6", "Nbd2"]
+
+def test_engine_reply():
+    chess = make_chess()
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    chess.engine_side = "black"
+    chess.engine_depth, chess.engine_time = 2, None
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    while chess.current_player == "black" or chess.pending is not None:
+        func, args = callbacks.pop(0)
+        func(*args)
+    assert len(chess.notation) == 2
+    assert "глубина 2" in chess.board_window.title.call_args[0][0]
+    assert sum(name != "No_piece" for row in chess.board for name in row) == 32
+
+
+def test_engine_book_reply(tmp_path):
+    from book import write_book, encode_move
+    position = Position.from_fen("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+    reply = next(move for move in position.legal_moves() if move_to_uci(move) == "c7c5")
+    write_book(tmp_path / "book.bin", [(position.key(), encode_move(position, reply), 1)])
+    chess = make_chess()
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    chess.engine_side = "black"
+    chess.engine_depth, chess.engine_time = 2, None
+    chess.engine_book_path = str(tmp_path / "book.bin")
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    while chess.current_player == "black" or chess.pending is not None:
+        func, args = callbacks.pop(0)
+        func(*args)
+    assert chess.notation == ["e4", "c5"]
+    assert "книги" in chess.board_window.title.call_args[0][0]
+    chess.engine_book.close()
+
+
+def test_restart_closes_engine_files(tmp_path):
+    from book import write_book
+    write_book(tmp_path / "book.bin", [])
+    chess = make_chess()
+    chess.setting = Mock()
+    chess.path = "pc"
+    chess.engine_book_path, chess.tablebase_path = str(tmp_path / "book.bin"), str(tmp_path)
+    book, tablebase = chess.open_book(), chess.open_tablebase()
+    book_file = book._file
+    chess.restart_game(chess.board_window)
+    assert book_file.closed and tablebase._files == []
+    assert chess.engine_book is None and chess.tablebase is None
+    assert chess.engine_book_path == str(tmp_path / "book.bin") and chess.tablebase_path == str(tmp_path)
+    assert chess.path == "pc" and chess.setting.called
+
+
+def test_clock_refreshes_on_display_change():
+    from clock import ChessClock
+    now = [0.0]
+    chess = make_chess()
+    chess.clock = ChessClock(chess.player_time, increment=5, now=lambda: now[0])
+    chess.board_window.after = Mock(return_value="tick")
+    chess.start_timer()
+    assert chess.board_window.after.call_args[0][0] == 1000
+    now[0] = 0.25
+    chess.update_timer()
+    assert chess.board_window.after.call_args[0][0] == 750
+    assert chess.timer_labels["white"].config.call_count == 1
+    now[0] = 1.5
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    assert chess.player_time["white"] == pytest.approx(603.5)
+    assert chess.timer_labels["white"].config.call_args[1]["text"] == "10:04"
+    assert chess.clock.running == "black"
+    now[0] = 1000
+    chess.update_timer()
+    assert chess.show_end_game_dialog.call_args[0][0] == "Время вышло! Победили Белые"
+
+
+def test_undo_restores_clock():
+    from clock import ChessClock
+    now = [0.0]
+    chess = make_chess()
+    chess.clock = ChessClock(chess.player_time, increment=5, now=lambda: now[0])
+    now[0] = 1
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    now[0] = 3
+    click(chess, 1, 4)
+    click(chess, 3, 4)
+    now[0] = 4
+    click(chess, 7, 6)
+    click(chess, 5, 5)
+    assert chess.player_time == pytest.approx({"white": 604, "black": 603})
+    now[0] = 10
+    chess.undo_move()
+    assert chess.player_time == pytest.approx({"white": 600, "black": 603})
+    assert chess.clock.running == "white" and chess.timer_running
+    chess.undo_move()
+    assert chess.player_time == pytest.approx({"white": 600, "black": 600})
+    assert chess.clock.running == "black"
+
+
+def test_timeout_ends_game(tmp_path):
+    import journal
+    from clock import ChessClock
+    now = [0.0]
+    chess = make_chess()
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    chess.engine_side = "black"
+    chess.engine_depth, chess.engine_time = 4, None
+    chess.clock = ChessClock(chess.player_time, now=lambda: now[0])
+    chess.journal_path = str(tmp_path / "game.journal")
+    chess.journal = journal.Journal.create(chess.journal_path, chess.to_fen(), 600)
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    while chess.engine_stop is None:
+        func, args = callbacks.pop(0)
+        func(*args)
+    stop, pending = chess.engine_stop, chess.pending
+    now[0] = 1000
+    chess.update_timer()
+    assert chess.result == "Время вышло! Победили Белые" and stop.is_set()
+    assert chess.show_end_game_dialog.call_args[0][0] == chess.result
+    assert chess.journal is None and not (tmp_path / "game.journal").exists()
+    pending.put(pending.get(timeout=10))
+    while chess.pending is not None:
+        func, args = callbacks.pop(0)
+        if func != chess.update_timer:
+            func(*args)
+    assert chess.notation == ["e4"] and not chess.timer_running
+
+
+def test_undo_with_engine():
+    chess = make_chess()
+    callbacks = []
+    chess.board_window.after = lambda delay, func, *args: callbacks.append((func, args))
+    chess.threaded = True
+    chess.engine_side = "black"
+    chess.engine_depth, chess.engine_time = 1, None
+    click(chess, 6, 4)
+    click(chess, 4, 4)
+    while chess.current_player == "black" or chess.pending is not None:
+        func, args = callbacks.pop(0)
+        func(*args)
+    chess.undo_move()
+    assert chess.notation == [] and chess.current_player == "white"
+    assert chess.to_fen() == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    images = {item["coords"] for item in chess.canvas.visible("image")}
+    assert len(images) == 32 and (4 * 80, 6 * 80) in images
+    chess.redo_move()
+    assert chess.notation == ["e4"]
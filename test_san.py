@@ -0,0 +1,58 @@
+import io
+import pytest
+from perft import REFERENCE_POSITIONS
+from pgn import read_games
+from position import Position, parse_square
+from san import InvalidSan, MoveIndex, move_to_san, moves_to_san, parse_san
+from test_pgn import PGN
+
+
+def move(position, frm, to, promo=0):
+    return position.build_move(parse_square(frm), parse_square(to), promo)
+
+
+def test_disambiguation():
+    position = Position.from_fen("3k4/8/8/R6R/8/8/8/R2K4 w - - 0 1")
+    index = MoveIndex(position)
+    assert index.san(move(position, "a5", "d5")) == "Rad5"
+    assert index.san(move(position, "a1", "a3")) == "R1a3"
+    assert index.san(move(position, "a5", "a3")) == "R5a3"
+    assert index.san(move(position, "h5", "h8")) == "Rh8"
+    position = Position.from_fen("k7/8/8/8/8/2N3N1/8/2N1K3 w - - 0 1")
+    assert MoveIndex(position).san(move(position, "c3", "e2")) == "Nc3e2"
+
+
+def test_special_moves():
+    position = Position.from_fen("r3k2r/1P6/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1")
+    assert move_to_san(position, move(position, "e5", "d6")) == "exd6"
+    assert move_to_san(position, move(position, "b7", "a8", 5)) == "bxa8=Q+"
+    assert move_to_san(position, move(position, "e1", "c1")) == "O-O-O"
+    assert parse_san(position, "O-O") == move(position, "e1", "g1")
+    assert parse_san(position, "b8=N") == move(position, "b7", "b8", 2)
+    for san in "Ke3", "b8", "Rb1b2", "Qz9", "e8=K":
+        with pytest.raises(InvalidSan):
+            parse_san(position, san)
+    position = Position.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    assert move_to_san(position, move(position, "a1", "a8")) == "Ra8#"
+
+
+def test_round_trip():
+    for _, fen, _ in REFERENCE_POSITIONS:
+        position = Position.from_fen(fen)
+        index = MoveIndex(position)
+        notation = [index.san(m) for m in index.moves]
+        assert len(set(notation)) == len(notation)
+        assert [index.parse(san) for san in notation] == index.moves
+
+
+def test_moves_to_san():
+    game = next(read_games(io.StringIO(PGN)))
+    position = Position.initial()
+    moves = []
+    for san in game.moves:
+        moves.append(parse_san(position, san))
+        position.make(moves[-1])
+    for _ in moves:
+        position.unmake()
+    assert moves_to_san(position, moves) == game.moves
+    assert position.to_fen() == Position.initial().to_fen()
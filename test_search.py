@@ -0,0 +1,54 @@
+import threading
+from position import Position, move_to_uci
+from search import Search, best_move, evaluate
+from tt import TranspositionTable
+
+
+def test_evaluate_symmetric():
+    assert evaluate(Position.initial()) == 0
+    position = Position.from_fen("4k3/8/8/8/8/8/8/3QK3 w - - 0 1")
+    assert evaluate(position) > 800
+    position.side = 1
+    assert evaluate(position) < -800
+
+
+def test_mate_in_two():
+    position = Position.from_fen("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 10")
+    result = best_move(position, depth=4)
+    assert move_to_uci(result.move) == "d5f6"
+    assert result.mate == 2
+    assert position.to_fen() == "r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 10"
+
+
+def test_wins_material():
+    result = best_move(Position.from_fen("4k3/8/8/3q4/8/8/3R4/3RK3 w - - 0 1"), depth=3)
+    assert move_to_uci(result.move) == "d2d5"
+    result = best_move(Position.from_fen("4k3/8/2n5/8/3P4/8/8/4K3 w - - 0 1"), depth=2)
+    assert move_to_uci(result.move) == "d4d5"
+
+
+def test_iterations_reported():
+    infos = []
+    result = best_move(Position.initial(), depth=3, on_info=infos.append)
+    assert [info.depth for info in infos] == [1, 2, 3]
+    assert result.nodes >= infos[-1].nodes and result.nps > 0
+    assert len(result.pv) == 3
+
+
+def test_stop():
+    stop = threading.Event()
+    stop.set()
+    position = Position.initial()
+    result = Search(position, stop).run(depth=20)
+    assert result.depth < 5 and result.move is not None
+    result = best_move(position, time_limit=0.2)
+    assert result.time < 1 and result.depth >= 1
+
+
+def test_transposition_table():
+    table = TranspositionTable(1)
+    first = best_move(Position.initial(), depth=4, table=table)
+    assert table.hits > 0
+    second = best_move(Position.initial(), depth=4, table=table)
+    assert second.move == first.move and second.score == first.score
+    assert second.nodes < first.nodes
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import pytest
+import server
+
+
+async def request(reader, writer, **fields):
+    writer.write(json.dumps(fields).encode() + b"\n")
+    return json.loads(await reader.readline())
+
+
+def run_with_server(scenario, backend="position"):
+    async def run():
+        games = server.GameServer(backend)
+        listener = await games.serve(port=0)
+        host, port = listener.sockets[0].getsockname()[:2]
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            await scenario(games, reader, writer)
+        finally:
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", ["position", "bitboard"])
+def test_play(backend):
+    async def scenario(games, reader, writer):
+        state = await request(reader, writer, op="new", time=60, increment=1, id=7)
+        assert state["ok"] and state["id"] == 7 and state["side"] == "white"
+        game = state["game"]
+        state = await request(reader, writer, op="move", game=game, move="f2f3")
+        assert state["san"] == "f3" and state["clock"] == {"white": 60, "black": 60}
+        for text in "e5", "g2g4":
+            state = await request(reader, writer, op="move", game=game, move=text)
+        assert state["clock"]["black"] > 60 and state["result"] is None
+        error = await request(reader, writer, op="move", game=game, move="Qh5")
+        assert not error["ok"] and "Qh5" in error["error"]
+        state = await request(reader, writer, op="move", game=game, move="Qh4")
+        assert state["san"] == "Qh4#" and state["result"] == "0-1" and state["reason"] == "checkmate"
+        assert not (await request(reader, writer, op="move", game=game, move="a3"))["ok"]
+        stats = await request(reader, writer, op="stats")
+        assert stats["games"] == 1 and stats["moves"] == 4 and stats["latency_p99_ms"] >= 0
+        assert (await request(reader, writer, op="close", game=game))["ok"]
+        assert not (await request(reader, writer, op="state", game=game))["ok"]
+    run_with_server(scenario, backend)
+
+
+def test_watch_and_flag():
+    async def scenario(games, reader, writer):
+        moves = ["e4", "e5", "Nf3", "Nc6"] * 1 + ["Ng1", "Nb8", "Nf3", "Nc6"] * 8
+        state = await request(reader, writer, op="new", moves=moves, time=0.2, watch=True)
+        assert state["fen"].startswith("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w")
+        assert state["result"] == "1/2-1/2" and state["reason"] == "repetition"
+        state = await request(reader, writer, op="new", fen="7k/8/8/8/8/8/6R1/K7 w - - 0 1", time=0.2, watch=True)
+        game = state["game"]
+        await request(reader, writer, op="move", game=game, move="Rh2+")
+        update = json.loads(await reader.readline())
+        assert update["event"] == "update" and update["san"] == "Rh2+"
+        update = json.loads(await asyncio.wait_for(reader.readline(), 2))
+        assert update["result"] == "1-0" and update["reason"] == "time" and update["clock"]["black"] == 0
+    run_with_server(scenario)
+
+
+def test_bad_requests():
+    async def scenario(games, reader, writer):
+        game = (await request(reader, writer, op="new"))["game"]
+        for game_id in [game], {"id": game}, None, True, str(game):
+            error = await request(reader, writer, op="state", game=game_id, id=1)
+            assert not error["ok"] and "Некорректный номер партии" in error["error"] and error["id"] == 1
+        error = await request(reader, writer, op="state", game=game + 1)
+        assert not error["ok"] and error["error"] == f"Нет партии {game + 1}"
+        for moves in "e4", ["e4", 5], {"e4": 1}:
+            error = await request(reader, writer, op="new", moves=moves)
+            assert not error["ok"] and "списком строк" in error["error"]
+        for fen in "8/8/8/8/8/8/8/8 w - - 0 1", "k6R/8/8/8/8/8/8/K7 w - - 0 1", "4k3/8/8/8/8/8/2PP4/4K3 w - d3 0 1", 7:
+            error = await request(reader, writer, op="new", fen=fen)
+            assert not error["ok"] and "озиция" in error["error"]
+        games.dispatch = None
+        error = await request(reader, writer, op="stats")
+        assert not error["ok"] and "TypeError" in error["error"]
+        writer.write(b"[1]\n")
+        assert not json.loads(await reader.readline())["ok"]
+        assert len(games.games) == 1
+    run_with_server(scenario)
+
+
+def test_bench():
+    result = asyncio.run(server.bench(games=200, clients=10))
+    assert result["moves"] == 2000 and 0 < result["memory_per_game"] < 20000
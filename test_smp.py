@@ -0,0 +1,17 @@
+import threading
+from position import Position, move_to_uci
+from smp import parallel_search
+
+
+def test_parallel_mate_in_two():
+    position = Position.from_fen("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 10")
+    result = parallel_search(position, depth=4, workers=2, hash_mb=1)
+    assert move_to_uci(result.move) == "d5f6"
+    assert result.mate == 2 and result.nodes > 0
+
+
+def test_parallel_stop():
+    stop = threading.Event()
+    threading.Timer(0.5, stop.set).start()
+    result = parallel_search(Position.initial(), depth=30, workers=2, hash_mb=1, stop=stop)
+    assert 1 <= result.depth < 30 and result.move is not None
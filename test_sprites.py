@@ -0,0 +1,36 @@
+import os
+import shutil
+import pytest
+import sprites
+
+
+@pytest.fixture
+def pieces(tmp_path, monkeypatch):
+    monkeypatch.setattr(sprites, "_sprites", {})
+    monkeypatch.setattr(sprites, "_photos", {})
+    path = tmp_path / "pieces"
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), "pieces"), path)
+    return str(path)
+
+def test_atlas_reused(pieces, tmp_path):
+    cache = str(tmp_path / "cache")
+    images = sprites.load_sprites(pieces, 40, cache)
+    assert sorted(images) == sorted(sprites.SPRITE_NAMES)
+    assert images["white_king"].size == (40, 40)
+    assert len(os.listdir(cache)) == 1
+    assert sprites.load_sprites(pieces, 40, cache) is images
+    sprites._sprites.clear()
+    os.remove(os.path.join(pieces, "white_king.png"))
+    with pytest.raises(FileNotFoundError):
+        sprites.load_sprites(pieces, 40, cache)
+
+def test_atlas_rebuilt_on_change(pieces, tmp_path):
+    cache = str(tmp_path / "cache")
+    key = sprites.sprite_key(pieces, 40)
+    sprites.load_sprites(pieces, 40, cache)
+    stat = os.stat(os.path.join(pieces, "black_pawn.png"))
+    os.utime(os.path.join(pieces, "black_pawn.png"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert sprites.sprite_key(pieces, 40) != key
+    assert sprites.sprite_key(pieces, 80) != sprites.sprite_key(pieces, 40)
+    sprites.load_sprites(pieces, 40, cache)
+    assert len(os.listdir(cache)) == 2
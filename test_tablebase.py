@@ -0,0 +1,45 @@
+import pytest
+from position import Position, move_to_uci
+from search import best_move
+from tablebase import Tablebase, Layout, generate, save, decode, INVALID
+
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tablebase")
+    save(directory, "KQvK", generate("KvKQ"))
+    with Tablebase(str(directory)) as tablebase:
+        yield tablebase
+
+
+def test_generate(tablebase):
+    table = tablebase.table("KQvK")
+    values = [decode(value) for value in table[:] if value != INVALID]
+    assert len(values) == 46137
+    assert max(plies for wdl, plies in values) == 20
+    assert {wdl for wdl, plies in values if plies % 2} == {1}
+    with pytest.raises(ValueError):
+        Layout("KQvKRN")
+    with pytest.raises(ValueError):
+        Layout("QKvK")
+
+
+def test_probe(tablebase):
+    assert tablebase.probe(Position.from_fen("7k/8/6K1/8/8/8/Q7/8 w - - 0 1")) == (1, 1)
+    assert tablebase.probe(Position.from_fen("8/q7/8/8/8/6k1/8/7K b - - 0 1")) == (1, 1)
+    assert tablebase.probe(Position.from_fen("Q6k/8/6K1/8/8/8/8/8 b - - 0 1")) == (-1, 0)
+    assert tablebase.probe(Position.from_fen("8/8/8/8/8/8/1q6/K6k w - - 0 1")) == (0, 0)
+    assert tablebase.mate_in(Position.from_fen("8/8/8/4k3/8/8/8/3QK3 b - - 0 1")) == -8
+    assert tablebase.probe(Position.from_fen("7k/8/6K1/8/8/8/8/R7 w - - 0 1")) is None
+    assert tablebase.probe(Position.from_fen("4k3/8/8/8/8/8/8/3QK2R w K - 0 1")) is None
+
+
+def test_search(tablebase):
+    position = Position.from_fen("8/8/8/4k3/8/8/8/3QK3 w - - 0 1")
+    mate = tablebase.mate_in(position)
+    result = best_move(position, depth=1, tablebase=tablebase)
+    assert result.mate == mate
+    position.make(result.move)
+    assert tablebase.mate_in(position) == 1 - mate
+    result = best_move(Position.from_fen("7k/8/6K1/8/8/8/Q7/8 w - - 0 1"), depth=1, tablebase=tablebase)
+    assert result.mate == 1 and move_to_uci(result.move)[2:] in ("a8", "b8", "c8", "d8", "e8", "f8")
@@ -0,0 +1,33 @@
+import pytest
+from tt import TranspositionTable, EXACT, LOWER, UPPER
+
+
+def test_store_probe():
+    table = TranspositionTable(1)
+    assert table.size == 65536
+    assert table.probe(0x1234) is None
+    table.store(0x1234, 0x8ABC, -99990, 7, LOWER)
+    assert table.probe(0x1234) == (0x8ABC, -99990, 7, LOWER)
+    table.store(0x1234, 0, 15, 8, UPPER)
+    assert table.probe(0x1234) == (0x8ABC, 15, 8, UPPER)
+    assert table.probe(0x1234 + (1 << 40)) is None
+    assert (table.hits, table.misses) == (2, 2)
+
+
+def test_replacement():
+    table = TranspositionTable(0.001)
+    buckets = table.mask + 1
+    deep, shallow, other = 5, 5 + buckets, 5 + 2 * buckets
+    table.store(deep, 1, 10, 9, EXACT)
+    table.store(shallow, 2, 20, 1, EXACT)
+    assert table.probe(deep)[0] == 1 and table.probe(shallow)[0] == 2
+    table.store(other, 3, 30, 2, EXACT)
+    assert table.probe(deep)[0] == 1 and table.probe(shallow) is None and table.probe(other)[0] == 3
+    assert table.collisions == 1
+    table.new_search()
+    table.store(shallow, 2, 20, 1, EXACT)
+    assert table.probe(deep) is None and table.probe(shallow)[0] == 2
+    table.clear()
+    assert table.probe(other) is None and table.stats()["hashfull"] == 0
+    with pytest.raises(ValueError):
+        TranspositionTable(0.00001)
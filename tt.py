@@ -0,0 +1,168 @@
+"""
+Таблица перестановок фиксированного размера для перебора и анализа.
+
+Таблица — заранее выделенный массив array('Q'), разбитый на корзины по две записи: первая запись заменяется,
+только если новая оценка получена на не меньшей глубине или запись осталась от прошлого перебора,
+вторая заменяется всегда. Запись занимает два 64-битных слова: ключ позиции, сложенный по XOR с данными,
+и сами данные (лучший ход, оценка, глубина, тип оценки и номер перебора). Чтение не создаёт объектов
+для каждой записи, а объём памяти не растёт во время перебора
+"""
+from array import array
+
+EXACT, LOWER, UPPER = 1, 2, 3
+
+SLOT_WORDS = 2
+BUCKET_SLOTS = 2
+BUCKET_BYTES = SLOT_WORDS * BUCKET_SLOTS * 8
+
+MOVE_BITS = 18
+SCORE_BITS = 20
+SCORE_OFFSET = 1 << SCORE_BITS - 1
+MOVE_MASK = (1 << MOVE_BITS) - 1
+SCORE_MASK = (1 << SCORE_BITS) - 1
+SCORE_SHIFT = MOVE_BITS
+DEPTH_SHIFT = SCORE_SHIFT + SCORE_BITS
+BOUND_SHIFT = DEPTH_SHIFT + 8
+AGE_SHIFT = BOUND_SHIFT + 2
+
+
+def table_bytes(size_mb) -> int:
+    """
+    Вычисляет размер массива таблицы: наибольшее число корзин, равное степени двойки и умещающееся в size_mb
+
+    :param size_mb: Размер таблицы в мегабайтах
+    :type size_mb: float
+    :returns: Размер массива в байтах
+    :raises ValueError: Если размер меньше одной корзины
+    """
+    buckets = int(size_mb * 1024 * 1024) // BUCKET_BYTES
+    if buckets < 1:
+        raise ValueError(f"Слишком маленький размер таблицы: {size_mb} МБ")
+    return (1 << buckets.bit_length() - 1) * BUCKET_BYTES
+
+
+class TranspositionTable:
+    """
+    Таблица перестановок с корзинами из записи с заменой по глубине и записи с постоянной заменой
+
+    :ivar table: Слова записей: для каждой записи ключ XOR данные и данные
+    :type table: array
+    :ivar mask: Маска номера корзины (число корзин — степень двойки)
+    :type mask: int
+    :ivar age: Номер текущего перебора (младшие 8 бит)
+    :type age: int
+    :ivar hits: Число найденных записей
+    :type hits: int
+    :ivar misses: Число обращений, для которых запись не найдена
+    :type misses: int
+    :ivar collisions: Число записей другой позиции, вытесненных при сохранении
+    :type collisions: int
+    """
+
+    def __init__(self, size_mb=16, table=None):
+        """
+        :param size_mb: Размер таблицы в мегабайтах (округляется вниз до степени двойки корзин)
+        :type size_mb: float
+        :param table: Готовый массив слов (например, в общей памяти), вместо выделения нового
+        :type table: array | memoryview
+        :raises ValueError: Если размер меньше одной корзины
+        """
+        if table is None:
+            table = array("Q", bytes(table_bytes(size_mb)))
+        buckets = len(table) // (SLOT_WORDS * BUCKET_SLOTS)
+        self.table = table
+        self.mask = buckets - 1
+        self.age = 0
+        self.hits = self.misses = self.collisions = 0
+
+    @property
+    def size(self) -> int:
+        """
+        Число записей в таблице
+        """
+        return (self.mask + 1) * BUCKET_SLOTS
+
+    def new_search(self):
+        """
+        Начинает новый перебор: записи прошлых переборов уступают место в первой записи корзины
+        """
+        self.age = self.age + 1 & 0xFF
+
+    def clear(self):
+        """
+        Очищает таблицу и статистику
+        """
+        self.table[:] = array("Q", bytes(len(self.table) * 8))
+        self.age = 0
+        self.hits = self.misses = self.collisions = 0
+
+    def probe(self, key) -> tuple:
+        """
+        Ищет запись позиции
+
+        :param key: 64-битный ключ позиции
+        :type key: int
+        :returns: (лучший ход, оценка, глубина, тип оценки) или None, если записи нет
+        """
+        table = self.table
+        i = (key & self.mask) * 4
+        data = table[i + 1]
+        if table[i] ^ data != key or not data:
+            data = table[i + 3]
+            if table[i + 2] ^ data != key or not data:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return (data & MOVE_MASK, (data >> SCORE_SHIFT & SCORE_MASK) - SCORE_OFFSET,
+                data >> DEPTH_SHIFT & 0xFF, data >> BOUND_SHIFT & 3)
+
+    def store(self, key, move, score, depth, bound):
+        """
+        Сохраняет запись позиции. Первая запись корзины заменяется, если она относится к той же позиции,
+        получена на меньшей глубине или в прошлом переборе; иначе новая запись занимает вторую
+
+        :param key: 64-битный ключ позиции
+        :type key: int
+        :param move: Лучший ход (0, если неизвестен)
+        :type move: int
+        :param score: Оценка
+        :type score: int
+        :param depth: Глубина перебора
+        :type depth: int
+        :param bound: Тип оценки (EXACT, LOWER, UPPER)
+        :type bound: int
+        """
+        table = self.table
+        j = (key & self.mask) * 4
+        old = table[j + 1]
+        if old and table[j] ^ old != key and old >> AGE_SHIFT == self.age and depth < old >> DEPTH_SHIFT & 0xFF:
+            j += 2
+            old = table[j + 1]
+        if old:
+            if table[j] ^ old != key:
+                self.collisions += 1
+            elif not move:
+                move = old & MOVE_MASK
+        data = (move | score + SCORE_OFFSET << SCORE_SHIFT | max(depth, 0) << DEPTH_SHIFT | bound << BOUND_SHIFT |
+                self.age << AGE_SHIFT)
+        table[j] = key ^ data
+        table[j + 1] = data
+
+    def hashfull(self) -> int:
+        """
+        Оценивает заполненность таблицы записями текущего перебора по первой тысяче записей
+
+        :returns: Заполненность в промилле
+        """
+        table = self.table
+        count = min(self.size, 1000)
+        used = sum(1 for i in range(count) if table[i * 2 + 1] and table[i * 2 + 1] >> AGE_SHIFT == self.age)
+        return used * 1000 // count
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику обращений к таблице
+
+        :returns: Число попаданий, промахов, вытеснений и заполненность в промилле
+        """
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "hashfull": self.hashfull()}